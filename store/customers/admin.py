@@ -1,17 +1,19 @@
 from django.contrib import admin
+
+from store.counterparties import CounterpartyTotalsAdminMixin
 from .models import Customer
 
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
-    list_display = ('name', 'phone', 'email_short', 'notes_short')
+class CustomerAdmin(CounterpartyTotalsAdminMixin, admin.ModelAdmin):
+    list_display = ('name', 'phone', 'email_short', 'open_quantity', 'delivered_value', 'notes_short')
     search_fields = ('name', 'phone', 'email')
     list_filter = ('name',)
 
     fieldsets = (
         (None, {
             'fields': ('name', 'phone'),
-            'description': 'Обязательные поля: Наименование и Телефон'
+            'description': 'Только поле "Наименование" является обязательным'
         }),
         ('Дополнительная информация', {
             'fields': ('email', 'notes'),
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:26
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='phone',
+            field=models.CharField(blank=True, default='', max_length=20, validators=[django.core.validators.RegexValidator(message='Формат: +999999999. До 15 цифр.', regex='^\\+?1?\\d{9,15}$')], verbose_name='Телефон'),
+        ),
+    ]
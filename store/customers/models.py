@@ -1,6 +1,13 @@
 from django.db import models
 from django.core.validators import RegexValidator
 
+from store.counterparties import CounterpartyQuerySetMixin
+
+
+class CustomerQuerySet(CounterpartyQuerySetMixin, models.QuerySet):
+    counterparty_field = 'customer'
+
+
 class Customer(models.Model):
     """Клиент (покупатель)"""
     name = models.CharField(
@@ -11,6 +18,8 @@ class Customer(models.Model):
     phone = models.CharField(
         'Телефон',
         max_length=20,
+        blank=True,  # у покупателей, перенесённых из текстовых полей заявок, телефона нет
+        default='',
         validators=[
             RegexValidator(
                 regex=r'^\+?1?\d{9,15}$',
@@ -31,6 +40,8 @@ class Customer(models.Model):
         help_text='Дополнительная информация'
     )
 
+    objects = CustomerQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Клиент'
         verbose_name_plural = 'Клиенты'
@@ -41,4 +52,4 @@ class Customer(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.name} ({self.phone})"
\ No newline at end of file
+        return f"{self.name} ({self.phone})" if self.phone else self.name
\ No newline at end of file
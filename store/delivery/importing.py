@@ -0,0 +1,230 @@
+# app delivery/importing
+"""
+Массовый импорт поставок из накладных поставщика (CSV или XLSX).
+
+Файл читается построчно общим reader'ом store.importing.read_rows. Строки
+обрабатываются пачками: для пачки одним запросом выбираются открытые
+позиции заявок по кодам товаров, количество проверяется по остатку
+в памяти, затем поставки создаются bulk_create, delivered_quantity
+сдвигается одним UPDATE на позицию, а единицы товара выпускает
+issue_units. Каждая пачка — отдельная транзакция. Если остаток позиции
+за время импорта выбрала параллельная поставка, пачка откатывается,
+а импорт прерывается ValidationError (записанные раньше пачки остаются).
+
+Ошибки строк не прерывают импорт: они передаются в on_error и не
+накапливаются, поэтому память не зависит от размера файла.
+Строку с количеством больше остатка одной позиции распределяем по
+открытым позициям этого товара, начиная с самой старой заявки.
+"""
+from collections import defaultdict, namedtuple
+from datetime import date, datetime
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from delivery.models import Delivery
+from request.models import Request, RequestItem
+from store.importing import RowError, read_rows as _read_rows
+from store.instrumentation import get_logger, timed
+from unit.issuing import issue_units
+
+logger = get_logger('delivery.importing')
+
+IMPORT_BATCH_SIZE = 500
+
+# Допустимые заголовки столбцов (регистр и пробелы по краям не важны)
+COLUMN_ALIASES = {
+    'code': ('code', 'код', 'артикул', 'код товара'),
+    'quantity': ('quantity', 'количество', 'кол-во', 'qty'),
+    'delivery_date': ('delivery_date', 'дата', 'дата поставки', 'date'),
+    'request': ('request', 'заявка', 'request_id', 'номер заявки'),
+    'notes': ('notes', 'примечания', 'комментарий'),
+}
+REQUIRED_COLUMNS = ('code', 'quantity')
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%d/%m/%Y')
+
+ImportLine = namedtuple('ImportLine', 'line code quantity delivery_date request_id notes')
+class ImportResult:
+    """Итоги импорта — только счётчики, без списков строк"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.imported_rows = 0
+        self.deliveries = 0
+        self.units = 0
+        self.errors = 0
+
+    def __str__(self):
+        prefix = 'Проверка без записи: ' if self.dry_run else ''
+        return (f"{prefix}строк {self.rows}, принято {self.imported_rows}, ошибок {self.errors}, "
+                f"поставок {self.deliveries}, единиц товара {self.units}")
+
+
+def read_rows(stream, filename, encoding='utf-8-sig'):
+    """Построчно читает накладную: пары (номер строки, значения по COLUMN_ALIASES)"""
+    return _read_rows(stream, filename, COLUMN_ALIASES, REQUIRED_COLUMNS, encoding)
+
+
+def parse_date(value):
+    """Дата из ячейки XLSX (datetime) или строки вида 2024-05-31 / 31.05.2024"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), date_format).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Не удалось разобрать дату «{value}»")
+
+
+def _parse_int(value, name):
+    try:
+        number = float(str(value).strip().replace(',', '.'))
+    except ValueError:
+        raise ValueError(f"{name}: ожидается целое число, получено «{value}»")
+    if not number.is_integer():
+        raise ValueError(f"{name}: ожидается целое число, получено «{value}»")
+    return int(number)
+
+
+def parse_line(line, values, default_date):
+    """Приводит значения строки к типам. Бросает ValueError с понятным сообщением"""
+    code = str(values.get('code') or '').strip()
+    if not code:
+        raise ValueError("Не указан код товара")
+    if values.get('quantity') in (None, ''):
+        raise ValueError("Не указано количество")
+    quantity = _parse_int(values['quantity'], 'Количество')
+    if quantity < 1:
+        raise ValueError("Количество не может быть меньше 1")
+    raw_date = values.get('delivery_date')
+    delivery_date = parse_date(raw_date) if raw_date not in (None, '') else default_date
+    raw_request = values.get('request')
+    request_id = _parse_int(raw_request, 'Заявка') if raw_request not in (None, '') else None
+    notes = str(values.get('notes') or '').strip()
+    return ImportLine(line, code, quantity, delivery_date, request_id, notes)
+
+
+class _Batch:
+    """Одна пачка строк: разбор, распределение по позициям заявок и запись"""
+
+    def __init__(self, lines, consumed, on_error, result):
+        self.lines = lines
+        # Сколько уже распределено на позицию, но ещё не записано в БД (только в режиме проверки)
+        self.consumed = consumed
+        self.on_error = on_error
+        self.result = result
+
+    def error(self, line, code, message):
+        self.result.errors += 1
+        self.on_error(RowError(line, code, message))
+
+    def open_items(self):
+        """Открытые позиции по кодам пачки, старые заявки первыми — один запрос"""
+        items = defaultdict(list)
+        queryset = (RequestItem.objects.select_for_update()
+                    .filter(product__code__in={line.code for line in self.lines},
+                            request__status__in=[Request.Status.IN_REQUEST, Request.Status.EXTRA],
+                            delivered_quantity__lt=F('quantity'))
+                    .select_related('request', 'product')
+                    .order_by('request__created_at', 'id'))
+        for item in queryset:
+            items[item.product.code].append(item)
+        return items
+
+    def remaining(self, item):
+        return item.quantity - item.delivered_quantity - self.consumed.get(item.pk, 0)
+
+    def allocate(self, line, candidates):
+        """Делит строку по позициям. Возвращает [(позиция, количество)] или бросает ValueError"""
+        candidates = [item for item in candidates
+                      if (line.request_id is None or item.request_id == line.request_id)
+                      and item.request.created_at.date() < line.delivery_date]
+        if not candidates:
+            if line.request_id is not None:
+                raise ValueError(f"В заявке #{line.request_id} нет открытой позиции с этим товаром "
+                                 f"и датой раньше {line.delivery_date}")
+            raise ValueError(f"Нет открытых позиций заявок с датой раньше {line.delivery_date}")
+        available = sum(max(self.remaining(item), 0) for item in candidates)
+        if line.quantity > available:
+            raise ValueError(f"Количество {line.quantity} больше остатка по заявкам ({available})")
+
+        parts = []
+        left = line.quantity
+        for item in candidates:
+            take = min(left, self.remaining(item))
+            if take > 0:
+                parts.append((item, take))
+                self.consumed[item.pk] = self.consumed.get(item.pk, 0) + take
+                left -= take
+            if not left:
+                break
+        return parts
+
+    def run(self, dry_run):
+        with transaction.atomic():
+            items = self.open_items()
+            deliveries = []
+            for line in self.lines:
+                candidates = items.get(line.code)
+                if not candidates:
+                    self.error(line.line, line.code, "Нет открытых позиций заявок с этим товаром")
+                    continue
+                try:
+                    parts = self.allocate(line, candidates)
+                except ValueError as e:
+                    self.error(line.line, line.code, str(e))
+                    continue
+                self.result.imported_rows += 1
+                for item, quantity in parts:
+                    delivery = Delivery(request_item=item, delivery_date=line.delivery_date,
+                                        quantity=quantity, notes=line.notes)
+                    delivery.fill_from_request_item(item)
+                    delivery.product = item.product
+                    deliveries.append(delivery)
+
+            self.result.deliveries += len(deliveries)
+            self.result.units += sum(delivery.quantity for delivery in deliveries)
+            if dry_run or not deliveries:
+                return
+
+            Delivery.objects.bulk_create(deliveries)
+            for item_id, quantity in self.consumed.items():
+                Delivery._shift_delivered_quantity(item_id, quantity, within_quantity=True)
+            self.consumed.clear()
+            for delivery in deliveries:
+                issue_units(delivery)
+
+
+def import_deliveries(rows, dry_run=False, batch_size=IMPORT_BATCH_SIZE, default_date=None, on_error=None):
+    """
+    Импортирует строки из read_rows(). В режиме dry_run всё проверяется,
+    но ничего не записывается. on_error(RowError) вызывается для каждой отклонённой строки.
+    Возвращает ImportResult.
+    """
+    default_date = default_date or timezone.localdate()
+    on_error = on_error or (lambda error: None)
+    result = ImportResult(dry_run=dry_run)
+    consumed = {}
+
+    with timed(logger, 'import_deliveries', dry_run=dry_run):
+        lines = []
+        for line, values in rows:
+            result.rows += 1
+            try:
+                lines.append(parse_line(line, values, default_date))
+            except ValueError as e:
+                result.errors += 1
+                on_error(RowError(line, str(values.get('code') or '').strip(), str(e)))
+            if len(lines) >= batch_size:
+                _Batch(lines, consumed, on_error, result).run(dry_run)
+                lines = []
+        if lines:
+            _Batch(lines, consumed, on_error, result).run(dry_run)
+
+    logger.info("Импорт поставок: %s", result)
+    return result
@@ -0,0 +1,64 @@
+# delivery/management/commands/import_deliveries.py
+import csv
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from delivery.importing import IMPORT_BATCH_SIZE, import_deliveries, parse_date, read_rows
+from store.importing import ImportFormatError
+
+
+class Command(BaseCommand):
+    help = ("Импортирует поставки из накладной поставщика (CSV или XLSX). "
+            "Обязательные столбцы: code, quantity; необязательные: delivery_date, request, notes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл накладной .csv или .xlsx')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только проверить файл, ничего не записывая')
+        parser.add_argument('--date', help='Дата поставки для строк без даты (по умолчанию сегодня)')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Строк в одной транзакции')
+        parser.add_argument('--encoding', default='utf-8-sig', help='Кодировка CSV (например, cp1251)')
+        parser.add_argument('--errors', help='Записать отчёт об ошибках в CSV-файл вместо вывода')
+
+    def handle(self, *args, **options):
+        default_date = None
+        if options['date']:
+            try:
+                default_date = parse_date(options['date'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        report = open(options['errors'], 'w', newline='', encoding='utf-8') if options['errors'] else None
+        try:
+            if report:
+                writer = csv.writer(report)
+                writer.writerow(['line', 'code', 'error'])
+                on_error = writer.writerow
+            else:
+                def on_error(error):
+                    self.stderr.write(f"Строка {error.line} ({error.code or '-'}): {error.message}")
+
+            with open(options['path'], 'rb') as stream:
+                result = import_deliveries(
+                    read_rows(stream, options['path'], encoding=options['encoding']),
+                    dry_run=options['dry_run'],
+                    batch_size=options['batch_size'],
+                    default_date=default_date,
+                    on_error=on_error,
+                )
+        except (ImportFormatError, OSError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+        except ValidationError as e:
+            raise CommandError(f"Импорт прерван: {'; '.join(e.messages)}. Записанные ранее пачки сохранены")
+        finally:
+            if report:
+                report.close()
+
+        style = self.style.WARNING if result.errors else self.style.SUCCESS
+        self.stdout.write(style(str(result)))
+        if result.errors and report:
+            self.stdout.write(f"Отчёт об ошибках: {options['errors']}")
+        if result.errors and options['dry_run']:
+            raise CommandError(f"Файл содержит ошибки: {result.errors}")
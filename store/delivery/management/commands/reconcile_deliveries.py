@@ -0,0 +1,51 @@
+# delivery/management/commands/reconcile_deliveries.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from delivery.models import Delivery
+from request.models import RequestItem
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает RequestItem.delivered_quantity и is_completed по сумме поставок. "
+            "С --check только выводит расхождения.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Только проверить расхождения, ничего не изменяя')
+
+    def handle(self, *args, **options):
+        delivered = (Delivery.objects.filter(request_item=OuterRef('pk')).order_by()
+                     .values('request_item').annotate(total=Sum('quantity')).values('total'))
+        items = RequestItem.objects.annotate(actual=Coalesce(Subquery(delivered), Value(0)))
+        drift = items.filter(
+            ~Q(delivered_quantity=F('actual'))
+            | Q(is_completed=True, actual__lt=F('quantity'))
+            | Q(is_completed=False, actual__gte=F('quantity'))
+        )
+
+        rows = list(drift.values_list('id', 'delivered_quantity', 'is_completed', 'actual', 'quantity'))
+        for pk, stored, completed, actual, quantity in rows:
+            self.stdout.write(
+                f"Позиция #{pk}: поставлено {stored} (выполнено: {completed}), "
+                f"по поставкам {actual} из {quantity}"
+            )
+
+        if options['check']:
+            if rows:
+                raise CommandError(f"Расхождения найдены у {len(rows)} позиций")
+            self.stdout.write(self.style.SUCCESS("Учёт поставок совпадает с позициями заявок"))
+            return
+
+        with transaction.atomic():
+            # Один UPDATE на все расходящиеся позиции
+            updated = RequestItem.objects.filter(pk__in=[row[0] for row in rows]).update(
+                delivered_quantity=Coalesce(Subquery(delivered), Value(0)),
+                is_completed=Case(
+                    When(quantity__lte=Coalesce(Subquery(delivered), Value(0)), then=Value(True)),
+                    default=Value(False),
+                ),
+            )
+        self.stdout.write(self.style.SUCCESS(f"Исправлено позиций: {updated}"))
@@ -0,0 +1,102 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:30
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, OuterRef, Subquery, Value, When
+
+SUPPLIER_PLACEHOLDERS = ('неизвестный поставщик',)
+CUSTOMER_PLACEHOLDERS = ('покупатель',)
+
+# Сопоставление заморожено в миграции и не зависит от текущего кода приложения.
+# Одной записью справочника считаются только названия, совпавшие после нормализации
+# (регистр, ё/е, пунктуация, ООО/ИП/АО...); похожие названия становятся отдельными записями —
+# возможные дубли потом выводит команда find_similar_counterparties.
+LEGAL_FORMS_RE = re.compile(r'\b(?:ооо|оао|зао|пао|ао|ип|нко|llc|ltd|inc)\b')
+PUNCTUATION_RE = re.compile(r'[^\w\s]+')
+BATCH_SIZE = 500
+
+
+def normalize_name(name):
+    name = (name or '').casefold().replace('ё', 'е')
+    return ' '.join(LEGAL_FORMS_RE.sub(' ', PUNCTUATION_RE.sub(' ', name)).split())
+
+
+def link_by_name(model, name_field, fk_field, target, ignore=()):
+    """Проставляет model.fk_field по тексту model.name_field; ненайденные названия добавляются в target"""
+    ignored = {normalize_name(name) for name in ignore}
+    by_key = {}
+    for pk, name in target.objects.order_by('pk').values_list('pk', 'name'):
+        by_key.setdefault(normalize_name(name), pk)
+    names = [name for name in model.objects.order_by().values_list(name_field, flat=True).distinct()
+             if normalize_name(name) and normalize_name(name) not in ignored]
+
+    new = {}
+    for name in names:
+        key = normalize_name(name)
+        if key not in by_key and key not in new:
+            new[key] = target(name=name.strip()[:255])
+    target.objects.bulk_create(new.values())
+    by_key.update((key, record.pk) for key, record in new.items())
+
+    for start in range(0, len(names), BATCH_SIZE):
+        chunk = names[start:start + BATCH_SIZE]
+        model.objects.filter(**{f'{name_field}__in': chunk}).update(**{fk_field: Case(
+            *(When(**{name_field: name}, then=Value(by_key[normalize_name(name)])) for name in chunk),
+        )})
+
+
+def link_counterparties(apps, schema_editor):
+    # Справочники уже дополнены миграцией позиций заявок — поставки сопоставляются с теми же записями
+    Delivery = apps.get_model('delivery', 'Delivery')
+    link_by_name(Delivery, 'supplier_name', 'supplier', apps.get_model('suppliers', 'Supplier'),
+                 ignore=SUPPLIER_PLACEHOLDERS)
+    link_by_name(Delivery, 'customer_name', 'customer', apps.get_model('customers', 'Customer'),
+                 ignore=CUSTOMER_PLACEHOLDERS)
+
+
+def restore_names(apps, schema_editor):
+    Delivery = apps.get_model('delivery', 'Delivery')
+    for field, model in (('supplier', 'suppliers.Supplier'), ('customer', 'customers.Customer')):
+        names = apps.get_model(model).objects.filter(pk=OuterRef(f'{field}_id')).values('name')[:1]
+        Delivery.objects.filter(**{f'{field}__isnull': False}).update(**{f'{field}_name': Subquery(names)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+        ('delivery', '0001_initial'),
+        ('request', '0003_requestitem_supplier_customer_fk'),
+        ('suppliers', '0002_alter_supplier_contact_person_alter_supplier_phone'),
+    ]
+
+    operations = [
+        migrations.RenameField(model_name='delivery', old_name='supplier', new_name='supplier_name'),
+        migrations.RenameField(model_name='delivery', old_name='customer', new_name='customer_name'),
+        # Значение по умолчанию нужно только для отката: поля восстанавливаются на заполненной таблице
+        migrations.AlterField(
+            model_name='delivery',
+            name='supplier_name',
+            field=models.CharField(default='', editable=False, max_length=255, verbose_name='Поставщик'),
+        ),
+        migrations.AlterField(
+            model_name='delivery',
+            name='customer_name',
+            field=models.CharField(default='', editable=False, max_length=255, verbose_name='Покупатель'),
+        ),
+        migrations.AddField(
+            model_name='delivery',
+            name='supplier',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='deliveries', to='suppliers.supplier', verbose_name='Поставщик'),
+        ),
+        migrations.AddField(
+            model_name='delivery',
+            name='customer',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='deliveries', to='customers.customer', verbose_name='Покупатель'),
+        ),
+        migrations.RunPython(link_counterparties, restore_names),
+        migrations.RemoveField(model_name='delivery', name='supplier_name'),
+        migrations.RemoveField(model_name='delivery', name='customer_name'),
+    ]
@@ -1,10 +1,16 @@
 #app delivery/models
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from request.models import Request, RequestItem
 from goods.models import Product
+from unit.models import ProductStock, ProductUnit
+from store.instrumentation import get_logger, timed
+
+logger = get_logger('delivery')
 
 
 class Delivery(models.Model):
@@ -29,8 +35,10 @@ class Delivery(models.Model):
     notes = models.TextField(_('Примечания'), blank=True)
 
     # Автозаполняемые поля
-    supplier = models.CharField(_('Поставщик'), max_length=255, editable=False)
-    customer = models.CharField(_('Покупатель'), max_length=255, editable=False)
+    supplier = models.ForeignKey('suppliers.Supplier', on_delete=models.PROTECT, null=True, blank=True,
+                                 editable=False, related_name='deliveries', verbose_name=_('Поставщик'))
+    customer = models.ForeignKey('customers.Customer', on_delete=models.PROTECT, null=True, blank=True,
+                                 editable=False, related_name='deliveries', verbose_name=_('Покупатель'))
     product = models.ForeignKey(Product, on_delete=models.PROTECT, verbose_name=_('Товар'), editable=False)
     request_date = models.DateField(_('Дата заявки'), editable=False)
     extra_request = models.BooleanField(_('Экстра заявка'), editable=False)
@@ -44,11 +52,25 @@ class Delivery(models.Model):
     def __str__(self):
         return f"Поставка #{self.id} - {self.product.name if self.product_id else '?'}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Количество на момент загрузки — чтобы clean() не перечитывал строку
+        instance._loaded_quantity = instance.__dict__.get('quantity')
+        return instance
+
+    def _get_request_item(self):
+        """Позиция заявки вместе с заявкой — одним запросом, если они ещё не загружены"""
+        if not Delivery.request_item.is_cached(self) or not RequestItem.request.is_cached(self.request_item):
+            self.request_item = RequestItem.objects.select_related('request').get(pk=self.request_item_id)
+        return self.request_item
+
+    @timed(logger, 'delivery.clean')
     def clean(self):
         if not self.request_item_id:
             raise ValidationError(_('Необходимо выбрать позицию заявки'))
 
-        request_item = self.request_item
+        request_item = self._get_request_item()
 
         if self.delivery_date <= request_item.request.created_at.date():
             raise ValidationError({'delivery_date': _('Дата поставки должна быть позже даты заявки')})
@@ -63,20 +85,44 @@ class Delivery(models.Model):
         remaining = request_item.quantity - request_item.delivered_quantity
         # Если редактируем существующую поставку — учитываем старое количество
         if self.pk:
-            old_quantity = Delivery.objects.get(pk=self.pk).quantity
+            old_quantity = getattr(self, '_loaded_quantity', None)
+            if old_quantity is None:
+                old_quantity = Delivery.objects.filter(pk=self.pk).values_list('quantity', flat=True).get()
             remaining += old_quantity
         if self.quantity > remaining:
             raise ValidationError({'quantity': _('Максимально можно поставить {} единиц').format(remaining)})
         if remaining <= 0:
             raise ValidationError({'request_item': _('Заявка по этой позиции уже выполнена')})
 
-    def save(self, *args, **kwargs):
-        request_item = self.request_item
-
-        # Заполняем поля из заявки
-        self.supplier = request_item.supplier
-        self.customer = request_item.customer
-        self.product = request_item.product
+    @staticmethod
+    def _shift_delivered_quantity(request_item_id, delta, within_quantity=False):
+        """
+        Атомарно сдвигает delivered_quantity позиции и пересчитывает is_completed в том же UPDATE.
+        В SET используется значение столбца до обновления, поэтому условие считается от него.
+        Поставка сверх заказа допустима (статус OVER). within_quantity=True — для импорта,
+        который распределяет строки по остаткам: увеличение проходит, только если поставленное
+        не превысит заказанное, иначе ValidationError — параллельная поставка уже выбрала остаток.
+        """
+        if not delta:
+            return
+        items = RequestItem.objects.filter(pk=request_item_id)
+        if delta > 0 and within_quantity:
+            items = items.filter(delivered_quantity__lte=F('quantity') - delta)
+        updated = items.update(
+            delivered_quantity=Greatest(F('delivered_quantity') + delta, 0),
+            is_completed=Case(
+                When(quantity__lte=F('delivered_quantity') + delta, then=Value(True)),
+                default=Value(False),
+            ),
+        )
+        if delta > 0 and within_quantity and not updated:
+            raise ValidationError({'quantity': _('Количество превышает остаток по позиции заявки')})
+
+    def fill_from_request_item(self, request_item):
+        """Заполняет поля поставки из позиции заявки (она должна быть загружена вместе с request)"""
+        self.supplier_id = request_item.supplier_id
+        self.customer_id = request_item.customer_id
+        self.product_id = request_item.product_id
         self.request_date = request_item.request.created_at.date()
         self.extra_request = (request_item.request.status == Request.Status.EXTRA)
         self.price_per_unit = request_item.price_per_unit
@@ -96,23 +142,37 @@ class Delivery(models.Model):
             else:
                 self.status = Delivery.Status.FULL
 
-        # Если редактируем — пересчитать delivered_quantity
-        if self.pk:
-            old_quantity = Delivery.objects.get(pk=self.pk).quantity
-            request_item.delivered_quantity += self.quantity - old_quantity
-        else:
-            request_item.delivered_quantity += self.quantity
-
-        # Обновляем флаг выполнения
-        request_item.is_completed = request_item.delivered_quantity >= request_item.quantity
-        request_item.save()
-
-        super().save(*args, **kwargs)
-
+    @timed(logger, 'delivery.save')
+    def save(self, *args, **kwargs):
+        self.fill_from_request_item(self._get_request_item())
+
+        with transaction.atomic():
+            # Старое количество читаем под блокировкой строки (где СУБД это поддерживает),
+            # чтобы параллельное редактирование той же поставки не потеряло изменение
+            old_quantity = 0
+            old_request_item_id = self.request_item_id
+            if self.pk:
+                old = (Delivery.objects.select_for_update()
+                       .filter(pk=self.pk).values_list('quantity', 'request_item_id').first())
+                if old:
+                    old_quantity, old_request_item_id = old
+
+            if old_request_item_id != self.request_item_id:
+                self._shift_delivered_quantity(old_request_item_id, -old_quantity)
+                old_quantity = 0
+            self._shift_delivered_quantity(self.request_item_id, self.quantity - old_quantity)
+
+            super().save(*args, **kwargs)
+        self._loaded_quantity = self.quantity
+
+    @timed(logger, 'delivery.delete')
     def delete(self, *args, **kwargs):
-        request_item = self.request_item
-        request_item.delivered_quantity -= self.quantity
-        if request_item.delivered_quantity < request_item.quantity:
-            request_item.is_completed = False
-        request_item.save()
-        super().delete(*args, **kwargs)
+        with transaction.atomic():
+            quantity = (Delivery.objects.select_for_update()
+                        .filter(pk=self.pk).values_list('quantity', flat=True).first())
+            self._shift_delivered_quantity(self.request_item_id, -(quantity or 0))
+            # Единицы товара удаляются каскадно, минуя ProductUnit.delete
+            units_count = self.product_units.exclude(state=ProductUnit.State.WRITTEN_OFF).count()
+            result = super().delete(*args, **kwargs)
+            ProductStock.register_receipt(self.product_id, -units_count)
+        return result
@@ -1,3 +1,169 @@
-from django.test import TestCase
+import io
+import threading
+import time
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from delivery.importing import import_deliveries, read_rows
+from delivery.models import Delivery
+from goods.models import Product
+from request.models import Request, RequestItem
+from unit.issuing import issue_units
+from unit.models import ProductStock
+
+
+def make_request_item(quantity):
+    product = Product.objects.create(code=f'RF-{Product.objects.count()}', name='Ключ')
+    request = Request.objects.create(status=Request.Status.IN_REQUEST)
+    Request.objects.filter(pk=request.pk).update(created_at=timezone.now() - timedelta(days=1))
+    return RequestItem.objects.create(request=request, product=product, quantity=quantity, price_per_unit=100)
+
+
+class DeliveryAccountingTests(TestCase):
+    def setUp(self):
+        self.item = make_request_item(10)
+
+    def deliver(self, quantity):
+        delivery = Delivery(request_item=self.item, quantity=quantity, delivery_date=timezone.now().date())
+        delivery.save()
+        return delivery
+
+    def test_save_edit_and_delete_keep_item_in_sync(self):
+        first = self.deliver(4)
+        second = self.deliver(6)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.delivered_quantity, self.item.is_completed), (10, True))
+
+        second = Delivery.objects.get(pk=second.pk)
+        second.quantity = 2
+        second.save()
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.delivered_quantity, self.item.is_completed), (6, False))
+
+        first.delete()
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.delivered_quantity, 2)
+
+    def test_over_delivery_is_recorded(self):
+        delivery = self.deliver(12)
+        self.assertEqual(delivery.status, Delivery.Status.OVER)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.delivered_quantity, self.item.is_completed), (12, True))
+
+    def test_import_shift_refuses_quantity_taken_by_concurrent_delivery(self):
+        # Импорт распределил остаток, а параллельная поставка успела выбрать его часть
+        RequestItem.objects.filter(pk=self.item.pk).update(delivered_quantity=5)
+        with self.assertRaises(ValidationError):
+            Delivery._shift_delivered_quantity(self.item.pk, 7, within_quantity=True)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.delivered_quantity, self.item.is_completed), (5, False))
+
+    def test_admin_bulk_delete_goes_through_model_delete(self):
+        first, second = self.deliver(4), self.deliver(3)
+        issue_units(first)
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+        self.client.post(reverse('admin:delivery_delivery_changelist'), {
+            'action': 'delete_selected', 'post': 'yes', '_selected_action': [first.pk, second.pk],
+        })
+        self.assertFalse(Delivery.objects.exists())
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.delivered_quantity, 0)
+        self.assertEqual(ProductStock.objects.get(product_id=self.item.product_id).received, 0)
+
+    def test_reconcile_fixes_drift(self):
+        self.deliver(3)
+        RequestItem.objects.filter(pk=self.item.pk).update(delivered_quantity=9, is_completed=True)
+        with self.assertRaises(CommandError):
+            call_command('reconcile_deliveries', check=True, stdout=io.StringIO())
+        call_command('reconcile_deliveries', stdout=io.StringIO())
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.delivered_quantity, self.item.is_completed), (3, False))
+
+
+class DeliveryImportTests(TestCase):
+    def setUp(self):
+        self.older = make_request_item(5)
+        self.newer = RequestItem.objects.create(request=Request.objects.create(status=Request.Status.EXTRA),
+                                                product=self.older.product, quantity=5, price_per_unit=120)
+        Request.objects.filter(pk=self.older.request_id).update(created_at=timezone.now() - timedelta(days=3))
+        Request.objects.filter(pk=self.newer.request_id).update(created_at=timezone.now() - timedelta(days=2))
+
+    def run_import(self, text, **kwargs):
+        errors = []
+        rows = read_rows(io.BytesIO(text.encode('utf-8')), 'invoice.csv')
+        result = import_deliveries(rows, on_error=errors.append, batch_size=2, **kwargs)
+        return result, errors
+
+    def test_rows_are_split_over_open_items_and_units_issued(self):
+        code = self.older.product.code
+        result, errors = self.run_import(f"Код;Количество;Примечания\n{code};7;счёт 12\nNOPE;1;\n{code};x;\n")
+        self.assertEqual([(error.line, error.code) for error in errors], [(3, 'NOPE'), (4, code)])
+        self.assertEqual((result.rows, result.imported_rows, result.deliveries, result.units), (3, 1, 2, 7))
+
+        self.older.refresh_from_db()
+        self.newer.refresh_from_db()
+        self.assertEqual((self.older.delivered_quantity, self.older.is_completed), (5, True))
+        self.assertEqual(self.newer.delivered_quantity, 2)
+        self.assertEqual(sorted(Delivery.objects.values_list('quantity', 'status')),
+                         [(2, Delivery.Status.PARTIAL), (5, Delivery.Status.FULL)])
+        self.assertEqual(self.older.product.units.count(), 7)
+        self.assertEqual(self.older.product.stock.on_hand, 7)
+
+    def test_dry_run_validates_remaining_across_batches_without_writing(self):
+        code = self.older.product.code
+        result, errors = self.run_import(f"code,quantity\n{code},6\n{code},3\n{code},2\n", dry_run=True)
+        self.assertEqual([error.line for error in errors], [4])
+        self.assertIn('больше остатка', errors[0].message)
+        self.assertEqual(result.units, 9)
+        self.assertFalse(Delivery.objects.exists())
+        self.older.refresh_from_db()
+        self.assertEqual(self.older.delivered_quantity, 0)
+
+
+class ConcurrentDeliveryTests(TransactionTestCase):
+    """Параллельные поставки по одной позиции не теряют обновления"""
+    threads = 8
+    deliveries_per_thread = 10
+
+    def test_no_lost_updates(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Потокам нужна файловая тестовая БД (DATABASES TEST NAME)')
+        item = make_request_item(self.threads * self.deliveries_per_thread)
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(self.deliveries_per_thread):
+                    for attempt in range(200):
+                        try:
+                            with transaction.atomic():
+                                Delivery(request_item_id=item.pk, quantity=1,
+                                         delivery_date=timezone.now().date()).save()
+                            break
+                        except OperationalError:
+                            time.sleep(0.001)  # SQLite: база занята другим писателем — повторяем всю транзакцию
+                    else:
+                        raise RuntimeError('Не удалось записать поставку')
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        item.refresh_from_db()
+        self.assertEqual(Delivery.objects.filter(request_item=item).count(), item.quantity)
+        self.assertEqual(item.delivered_quantity, item.quantity)
+        self.assertTrue(item.is_completed)
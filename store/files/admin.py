@@ -10,6 +10,7 @@ class ProductImageAdmin(admin.ModelAdmin):
     search_fields = ('product__name', 'product__code', 'code')
     list_editable = ('is_main',)
     readonly_fields = ('image_preview', 'created_short')
+    list_select_related = ('product',)
     fieldsets = (
         (None, {
             'fields': ('product', 'code', 'is_main')
@@ -37,7 +38,7 @@ class ProductImageAdmin(admin.ModelAdmin):
             return format_html(
                 '<img src="{}" style="max-height: 100px; max-width: 100px; '
                 'border: 1px solid #ddd; border-radius: 4px;"/>',
-                obj.image.url
+                obj.thumb_url
             )
         return "Нет изображения"
     image_preview.short_description = 'Превью'
@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class FilesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'files'
\ No newline at end of file
+    name = 'files'
+
+    def ready(self):
+        from files import signals  # noqa: F401  подключение обработчиков сигналов
\ No newline at end of file
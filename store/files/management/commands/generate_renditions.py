@@ -0,0 +1,30 @@
+# files/management/commands/generate_renditions.py
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from files import renditions
+from files.models import ProductImage
+
+
+class Command(BaseCommand):
+    help = "Создаёт уменьшенные копии (thumb, card, detail) для уже загруженных изображений товаров"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пересоздать копии для всех изображений, а не только для отсутствующих')
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        images = ProductImage.objects.order_by('id')
+        if not options['all']:
+            images = images.filter(renditions_ready=False)
+        ids = list(images.values_list('id', flat=True))
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            results = list(executor.map(renditions.process_in_worker, ids))
+
+        done = sum(results)
+        self.stdout.write(self.style.SUCCESS(f"Обработано изображений: {done} из {len(ids)}"))
+        if done < len(ids):
+            self.stdout.write(self.style.WARNING("Часть изображений не обработана, подробности в логе"))
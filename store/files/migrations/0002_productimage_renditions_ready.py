@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='renditions_ready',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Уменьшенные копии созданы'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:10
+
+from django.db import migrations
+
+
+def reset_renditions(apps, schema_editor):
+    """
+    Имена копий теперь включают расширение оригинала: прежние копии не находятся,
+    страницы отдают оригиналы, пока generate_renditions не создаст копии заново.
+    """
+    ProductImage = apps.get_model('files', 'ProductImage')
+    ProductImage.objects.filter(renditions_ready=True).update(renditions_ready=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0002_productimage_renditions_ready'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_renditions, migrations.RunPython.noop),
+    ]
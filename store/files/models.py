@@ -3,6 +3,8 @@ from django.db import models
 from django.conf import settings
 import os
 
+from files import renditions
+
 def product_image_upload_path(instance, filename):
     """Генерирует путь для сохранения изображений товаров"""
     return os.path.join('products', instance.product.code, filename)
@@ -34,6 +36,11 @@ class ProductImage(models.Model):
         auto_now_add=True,
         verbose_name='Дата создания'
     )
+    renditions_ready = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Уменьшенные копии созданы'
+    )
 
     class Meta:
         app_label = 'files'
@@ -48,4 +55,36 @@ class ProductImage(models.Model):
         # Автоматически устанавливаем code равным коду товара
         if not self.code:
             self.code = self.product.code
-        super().save(*args, **kwargs)
\ No newline at end of file
+
+        # Новый файл — старые уменьшенные копии больше не подходят
+        old_name = None
+        if self.pk:
+            old_name = ProductImage.objects.filter(pk=self.pk).values_list('image', flat=True).first()
+        image_changed = bool(self.image) and old_name != self.image.name
+        if image_changed:
+            self.renditions_ready = False
+        super().save(*args, **kwargs)
+
+        if image_changed:
+            renditions.schedule_delete(old_name)
+            renditions.schedule(self.pk)
+
+    def rendition_url(self, size):
+        """URL уменьшенной копии или оригинала, пока копии не готовы"""
+        if not self.image:
+            return ''
+        if self.renditions_ready:
+            return self.image.storage.url(renditions.rendition_name(self.image.name, size))
+        return self.image.url
+
+    @property
+    def thumb_url(self):
+        return self.rendition_url('thumb')
+
+    @property
+    def card_url(self):
+        return self.rendition_url('card')
+
+    @property
+    def detail_url(self):
+        return self.rendition_url('detail')
\ No newline at end of file
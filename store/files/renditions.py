@@ -0,0 +1,120 @@
+# app files/renditions
+"""
+Уменьшенные копии (рендишены) изображений товаров.
+
+Для каждого ProductImage создаются WebP-копии фиксированных размеров
+(превью в админке, карточка каталога, страница товара). Файлы лежат рядом
+с оригиналом: products/<код>/<имя с расширением>__<размер>.webp — у foo.jpg
+и foo.png копии разные.
+Генерация выполняется в пуле потоков после коммита транзакции, чтобы
+не задерживать запрос загрузки; IMAGE_RENDITIONS_SYNC = True выполняет её сразу.
+Старые копии удаляются тоже после коммита (schedule_delete): при откате
+транзакции запись об изображении остаётся, и её копии должны остаться вместе с ней.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from store.instrumentation import get_logger
+
+logger = get_logger('files.renditions')
+
+RENDITION_SIZES = {
+    'thumb': (100, 100),
+    'card': (400, 400),
+    'detail': (1000, 1000),
+}
+RENDITION_QUALITY = 82
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_RENDITION_WORKERS', 2),
+            thread_name_prefix='renditions'
+        )
+    return _executor
+
+
+def rendition_name(image_name, size):
+    """products/RF-75510/rf-75510.jpg -> products/RF-75510/rf-75510.jpg__card.webp"""
+    return f"{image_name}__{size}.webp"
+
+
+def generate_renditions(image_name, storage=default_storage):
+    """Создаёт все размеры для файла изображения. Возвращает список созданных имён"""
+    from PIL import Image, ImageOps
+
+    created = []
+    with storage.open(image_name, 'rb') as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+
+    for size, box in RENDITION_SIZES.items():
+        image = original.copy()
+        image.thumbnail(box, Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, format='WEBP', quality=RENDITION_QUALITY, method=4)
+        name = rendition_name(image_name, size)
+        if storage.exists(name):
+            storage.delete(name)
+        created.append(storage.save(name, ContentFile(buffer.getvalue())))
+    return created
+
+
+def delete_renditions(image_name, storage=default_storage):
+    for size in RENDITION_SIZES:
+        name = rendition_name(image_name, size)
+        if storage.exists(name):
+            storage.delete(name)
+
+
+def schedule_delete(image_name):
+    """Удаляет копии image_name после коммита текущей транзакции"""
+    if image_name:
+        transaction.on_commit(lambda: delete_renditions(image_name))
+
+
+def process_image(image_id):
+    """Генерирует рендишены для ProductImage и отмечает их готовность"""
+    from files.models import ProductImage
+
+    try:
+        image_name = ProductImage.objects.filter(pk=image_id).values_list('image', flat=True).first()
+        if not image_name:
+            return False
+        generate_renditions(image_name)
+        updated = ProductImage.objects.filter(pk=image_id, image=image_name).update(renditions_ready=True)
+        if updated:
+            from goods.cache import bump_product  # закэшированные страницы должны получить новые URL
+            bump_product(ProductImage.objects.filter(pk=image_id).values_list('product_id', flat=True).first())
+        return True
+    except Exception:
+        logger.exception("Не удалось создать уменьшенные копии изображения #%s", image_id)
+        return False
+
+
+def process_in_worker(image_id):
+    # У потока пула своё соединение с БД — закрываем его, как после запроса
+    close_old_connections()
+    try:
+        return process_image(image_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(image_id):
+    """Ставит генерацию в очередь после коммита текущей транзакции"""
+    if getattr(settings, 'IMAGE_RENDITIONS_SYNC', False):
+        transaction.on_commit(lambda: process_image(image_id))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(process_in_worker, image_id))
@@ -0,0 +1,12 @@
+# app files/signals
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from files import renditions
+from files.models import ProductImage
+
+
+@receiver(post_delete, sender=ProductImage)
+def delete_image_renditions(sender, instance, **kwargs):
+    """Удаляет уменьшенные копии и при каскадном удалении (вместе с товаром), минуя ProductImage.delete"""
+    renditions.schedule_delete(instance.image.name)
@@ -1,3 +1,66 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO
 
-# Create your tests here.
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from files import renditions
+from files.models import ProductImage
+from goods.models import Product
+
+
+def image_file(name, fmt):
+    buffer = BytesIO()
+    Image.new('RGB', (600, 300), 'red').save(buffer, format=fmt)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class RenditionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_RENDITIONS_SYNC=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.product = Product.objects.create(code='RF-1', name='Ключ')
+
+    def upload(self, name, fmt='JPEG'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ProductImage.objects.create(product=self.product, image=image_file(name, fmt))
+
+    def rendition_files(self, image_name):
+        return [default_storage.exists(renditions.rendition_name(image_name, size))
+                for size in renditions.RENDITION_SIZES]
+
+    def test_same_stem_with_other_extension_gets_own_renditions(self):
+        self.assertNotEqual(renditions.rendition_name('products/RF-1/foo.jpg', 'card'),
+                            renditions.rendition_name('products/RF-1/foo.png', 'card'))
+        jpeg, png = self.upload('foo.jpg'), self.upload('foo.png', 'PNG')
+        jpeg.refresh_from_db()
+        png.refresh_from_db()
+        self.assertTrue(jpeg.renditions_ready and png.renditions_ready)
+        self.assertEqual(self.rendition_files(jpeg.image.name) + self.rendition_files(png.image.name), [True] * 6)
+        self.assertTrue(jpeg.card_url.endswith('foo.jpg__card.webp'))
+
+    def test_old_renditions_are_deleted_only_after_commit(self):
+        image = self.upload('foo.jpg')
+        old_name = image.image.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            image.image = image_file('bar.jpg', 'JPEG')
+            image.save()
+        # До коммита копии прежнего файла на месте: при откате они ещё нужны
+        self.assertEqual(self.rendition_files(old_name), [True] * 3)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.rendition_files(old_name), [False] * 3)
+        self.assertEqual(self.rendition_files(image.image.name), [True] * 3)
+
+    def test_cascade_delete_removes_renditions(self):
+        image_name = self.upload('foo.jpg').image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        self.assertFalse(ProductImage.objects.exists())
+        self.assertEqual(self.rendition_files(image_name), [False] * 3)
@@ -1,9 +1,28 @@
 # app goods/admin.py
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import Count
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.html import format_html
-from django.utils.text import slugify
+from .importing import import_catalog, read_rows
 from .models import Category, Product
 from files.models import ProductImage
+from store.importing import ImportFormatError
+
+# Сколько ошибок импорта показывать на странице; остальные только считаются
+IMPORT_ERRORS_SHOWN = 200
+
+
+class CatalogImportForm(forms.Form):
+    """Загрузка прайс-листа"""
+    file = forms.FileField(label='Прайс-лист (CSV или XLSX)',
+                           help_text='Столбцы: code; необязательные: name, category (путь «Родитель/Потомок»), '
+                                     'description. Товары обновляются по коду')
+    encoding = forms.ChoiceField(label='Кодировка CSV', choices=[('utf-8-sig', 'UTF-8'), ('cp1251', 'Windows-1251')])
+    dry_run = forms.BooleanField(label='Только проверить, ничего не записывая', required=False, initial=True)
 
 
 class ProductImageInline(admin.TabularInline):
@@ -38,26 +57,24 @@ class CategoryAdmin(admin.ModelAdmin):
         return obj.slug or "Не сгенерирован"
     slug_display.short_description = 'ЧПУ'
 
-    def product_count(self, obj):
-        return obj.products.count()
-    product_count.short_description = 'Товаров'
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('parent').with_subtree_product_count()
 
-    def save_model(self, request, obj, form, change):
-        if not obj.slug:
-            base_slug = slugify(obj.name)
-            unique_slug = base_slug
-            counter = 1
-
-            while Category.objects.filter(slug=unique_slug).exists():
-                unique_slug = f"{base_slug}-{counter}"
-                counter += 1
+    def product_count(self, obj):
+        return obj.subtree_product_count
+    product_count.short_description = 'Товаров (с подкатегориями)'
+    product_count.admin_order_field = 'subtree_product_count'
 
-            obj.slug = unique_slug
-        super().save_model(request, obj, form, change)
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        # Удаляем по одной, чтобы Category.delete перенёс пути дочерних категорий
+        for obj in queryset:
+            obj.delete()
 
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/goods/product/change_list.html'
     list_display = ('name', 'code', 'category', 'main_image_preview', 'images_count')
     readonly_fields = ('main_image_preview', 'images_list', 'add_images')
     search_fields = ['name', 'code']
@@ -86,13 +103,61 @@ class ProductAdmin(admin.ModelAdmin):
             '</div>')
     add_images.short_description = 'Действия'
 
+    # ==== Импорт прайс-листа ====
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='goods_product_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+
+        result = None
+        errors = []
+        form = CatalogImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+
+            def on_error(error):
+                if len(errors) < IMPORT_ERRORS_SHOWN:
+                    errors.append(error)
+
+            try:
+                result = import_catalog(
+                    read_rows(upload.file, upload.name, encoding=form.cleaned_data['encoding']),
+                    dry_run=form.cleaned_data['dry_run'],
+                    on_error=on_error,
+                )
+            except (ImportFormatError, UnicodeDecodeError) as e:
+                form.add_error('file', str(e))
+            else:
+                level = messages.WARNING if result.errors else messages.SUCCESS
+                self.message_user(request, str(result), level=level)
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Импорт каталога из прайс-листа',
+            'opts': self.model._meta,
+            'form': form,
+            'result': result,
+            'errors': errors,
+            'hidden_errors': result.errors - len(errors) if result else 0,
+            'import_command': 'import_catalog',
+        }
+        return TemplateResponse(request, 'admin/import.html', context)
+
+    def get_queryset(self, request):
+        return (super().get_queryset(request).select_related('category').with_main_image()
+                .annotate(images_total=Count('product_images')))
+
     def main_image_preview(self, obj):
-        main_image = obj.product_images.filter(is_main=True).first()
+        main_image = obj.main_image
         if main_image:
             return format_html(
                 '<img src="{}" style="max-height: 100px; max-width: 100px; '
                 'border: 1px solid #ddd; border-radius: 4px;"/>',
-                main_image.image.url
+                main_image.thumb_url
             )
         return "Нет главного изображения"
     main_image_preview.short_description = 'Главное изображение'
@@ -102,7 +167,7 @@ class ProductAdmin(admin.ModelAdmin):
         if images:
             return format_html(' '.join(
                 f'<a href="/admin/files/productimage/{img.id}/change/" title="Редактировать">'
-                f'<img src="{img.image.url}" style="max-height: 50px; margin: 5px; '
+                f'<img src="{img.thumb_url}" style="max-height: 50px; margin: 5px; '
                 'border: 1px solid #ddd; border-radius: 3px;"/></a>'
                 for img in images
             ))
@@ -110,11 +175,12 @@ class ProductAdmin(admin.ModelAdmin):
     images_list.short_description = 'Все изображения'
 
     def images_count(self, obj):
-        count = obj.product_images.count()
+        count = obj.images_total
         return format_html(
             '<a href="/admin/files/productimage/?product__id__exact={}" style="{}">{}</a>',
             obj.id,
             'color: #417690; font-weight: bold;' if count else 'color: #999;',
             count
         )
-    images_count.short_description = 'Изобр.'
\ No newline at end of file
+    images_count.short_description = 'Изобр.'
+    images_count.admin_order_field = 'images_total'
@@ -0,0 +1,170 @@
+# app goods/cache
+"""
+Кэширование ответов витрины (каталог, карточка товара, поиск).
+
+Ключ ответа включает «версии» данных: общую версию каталога и версию
+конкретного товара. Сохранение/удаление Product, Category и ProductImage
+меняет версии (goods.signals), и старые ответы просто перестают находиться —
+удалять ключи по шаблону не нужно, что работает на любом бэкенде кэша.
+Движение остатков (unit.ProductStock) меняет только версию товара: поиск остатков
+не показывает, а отметка наличия в списках каталога обновляется по VIEW_CACHE_TTL.
+
+Ответы отдаются с ETag и Last-Modified; повторный запрос с If-None-Match /
+If-Modified-Since получает 304 прямо из кэша, без обращения к БД.
+"""
+import hashlib
+import time
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+CATALOG_VERSION_KEY = 'goods:catalog:version'
+PRODUCT_VERSION_KEY = 'goods:product:{}:version'
+
+
+def get_cache():
+    return caches[getattr(settings, 'VIEW_CACHE_ALIAS', 'default')]
+
+
+def get_ttl(view_name):
+    return getattr(settings, 'VIEW_CACHE_TTL', {}).get(view_name, 300)
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def bump_catalog():
+    """Инвалидирует все закэшированные ответы каталога и поиска"""
+    transaction.on_commit(lambda: get_cache().set(CATALOG_VERSION_KEY, _new_version(), None))
+
+
+def bump_product(product_id):
+    """Инвалидирует ответы, зависящие от конкретного товара, и каталог"""
+    def apply():
+        get_cache().set_many({
+            CATALOG_VERSION_KEY: _new_version(),
+            PRODUCT_VERSION_KEY.format(product_id): _new_version(),
+        }, None)
+    transaction.on_commit(apply)
+
+
+def bump_product_stock(product_id):
+    """Инвалидирует ответы конкретного товара, не трогая каталог и поиск (движение остатков)"""
+    transaction.on_commit(lambda: get_cache().set(PRODUCT_VERSION_KEY.format(product_id), _new_version(), None))
+
+
+def bump_products(product_ids):
+    """bump_product для многих товаров одной записью в кэш (массовые загрузки)"""
+    product_ids = list(product_ids)
+
+    def apply():
+        version = _new_version()
+        get_cache().set_many({
+            CATALOG_VERSION_KEY: version,
+            **{PRODUCT_VERSION_KEY.format(product_id): version for product_id in product_ids},
+        }, None)
+    transaction.on_commit(apply)
+
+
+def _version_keys(product_id=None):
+    keys = [CATALOG_VERSION_KEY]
+    if product_id is not None:
+        keys.append(PRODUCT_VERSION_KEY.format(product_id))
+    return keys
+
+
+def _versions(found, keys):
+    return ':'.join(str(found.get(key, 0)) for key in keys)
+
+
+def _response_key(view_name, request, versions):
+    path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"goods:view:{view_name}:{versions}:{path_hash}"
+
+
+def _entry(response):
+    """Запись кэша для ответа (с ETag и Last-Modified) или None, если ответ не кэшируется"""
+    if response.status_code != 200 or response.streaming:
+        return None
+    response['ETag'] = '"{}"'.format(hashlib.md5(response.content).hexdigest())
+    if not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date()
+    return response.content, response['Content-Type'], response['ETag'], response['Last-Modified']
+
+
+def _respond(request, entry, response=None):
+    """304 по If-None-Match/If-Modified-Since, иначе ответ (из кэша, если свежего нет)"""
+    content, content_type, etag, last_modified = entry
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=parse_http_date_safe(last_modified)
+    )
+    if conditional is not None:
+        return conditional
+    if response is None:
+        response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        response['Last-Modified'] = last_modified
+    return response
+
+
+def cache_response(view_name, product_kwarg=None):
+    """
+    Кэширует GET-ответы view. product_kwarg — имя аргумента с id товара,
+    чтобы ответ зависел от версии этого товара (карточка товара).
+    Асинхронные view обслуживаются асинхронным API кэша (aget_many, aget, aset).
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view(request, *args, **kwargs)
+
+                cache = get_cache()
+                keys = _version_keys(kwargs.get(product_kwarg) if product_kwarg else None)
+                key = _response_key(view_name, request, _versions(await cache.aget_many(keys), keys))
+                response = None
+                entry = await cache.aget(key)
+                if entry is None:
+                    response = await view(request, *args, **kwargs)
+                    entry = _entry(response)
+                    if entry is None:
+                        return response
+                    await cache.aset(key, entry, get_ttl(view_name))
+                return _respond(request, entry, response)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            cache = get_cache()
+            keys = _version_keys(kwargs.get(product_kwarg) if product_kwarg else None)
+            key = _response_key(view_name, request, _versions(cache.get_many(keys), keys))
+            response = None
+            entry = cache.get(key)
+            if entry is None:
+                response = view(request, *args, **kwargs)
+                entry = _entry(response)
+                if entry is None:
+                    return response
+                cache.set(key, entry, get_ttl(view_name))
+            return _respond(request, entry, response)
+        return wrapper
+    return decorator
+
+
+def set_last_modified(response, *timestamps):
+    """Проставляет Last-Modified по самой свежей дате (например, Product.updated_at)"""
+    timestamps = [ts for ts in timestamps if ts]
+    if timestamps:
+        response['Last-Modified'] = http_date(max(timestamps).timestamp())
+    return response
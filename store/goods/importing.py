@@ -0,0 +1,245 @@
+# app goods/importing
+"""
+Массовая загрузка каталога (прайс-листа): товары по уникальному коду и их категории.
+
+Файл читается построчно тем же reader'ом, что и накладные (store.importing.read_rows),
+со своими столбцами: code, name, category, description. Категория задаётся путём
+"Родитель/Потомок" — недостающие узлы создаются по уровням bulk_create, slug для них
+подбираются в памяти по множеству занятых (один запрос на весь импорт).
+
+Товары пишутся пачками: для пачки одним запросом читаются существующие товары по кодам,
+строки делятся на новые, изменённые и неизменные, и новые с изменёнными записываются
+одним bulk_create(update_conflicts=True) по code. Неизменные не трогаются совсем
+(updated_at не сдвигается). Пустые name, description и category у существующего товара
+означают «не менять». Поисковый индекс и версии кэша обновляются пачкой —
+сигналы post_save при bulk_create не приходят. Каждая пачка — отдельная транзакция.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+
+from goods import cache, search
+from goods.models import Category, Product, category_path_segment
+from store.importing import RowError, read_rows as _read_rows
+from store.instrumentation import get_logger, timed
+
+logger = get_logger('goods.importing')
+
+IMPORT_BATCH_SIZE = 1000
+CATEGORY_SEPARATOR = '/'
+CODE_MAX_LENGTH = Product._meta.get_field('code').max_length
+
+# Допустимые заголовки столбцов (регистр и пробелы по краям не важны)
+COLUMN_ALIASES = {
+    'code': ('code', 'код', 'артикул', 'код товара'),
+    'name': ('name', 'название', 'наименование', 'товар', 'название товара'),
+    'category': ('category', 'категория', 'раздел', 'путь категории'),
+    'description': ('description', 'описание'),
+}
+REQUIRED_COLUMNS = ('code',)
+
+CatalogLine = namedtuple('CatalogLine', 'line code name category description')
+
+class CatalogImportResult:
+    """Итоги импорта — только счётчики"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.categories = 0
+        self.errors = 0
+
+    def __str__(self):
+        prefix = 'Проверка без записи: ' if self.dry_run else ''
+        return (f"{prefix}строк {self.rows}, создано {self.created}, обновлено {self.updated}, "
+                f"без изменений {self.unchanged}, новых категорий {self.categories}, ошибок {self.errors}")
+
+
+def read_rows(stream, filename, encoding='utf-8-sig'):
+    """Построчно читает прайс-лист (CSV или XLSX): пары (номер строки, значения по COLUMN_ALIASES)"""
+    return _read_rows(stream, filename, COLUMN_ALIASES, REQUIRED_COLUMNS, encoding)
+
+
+def _text(value, max_length=None):
+    text = ' '.join(str(value).split()) if value not in (None, '') else ''
+    return text[:max_length] if max_length else text
+
+
+def split_category_path(value):
+    """'Инструмент / Ключи/' -> ('Инструмент', 'Ключи')"""
+    return tuple(_text(part, 255) for part in str(value or '').split(CATEGORY_SEPARATOR) if _text(part))
+
+
+def parse_line(line, values):
+    """Приводит значения строки к типам. Бросает ValueError с понятным сообщением"""
+    code = _text(values.get('code'))
+    if not code:
+        raise ValueError("Не указан код товара")
+    if len(code) > CODE_MAX_LENGTH:
+        raise ValueError(f"Код товара длиннее {CODE_MAX_LENGTH} символов")
+    description = values.get('description')
+    return CatalogLine(
+        line, code,
+        _text(values.get('name'), 255),
+        split_category_path(values.get('category')),
+        str(description).strip() if description not in (None, '') else '',
+    )
+
+
+class CategoryResolver:
+    """
+    Пути категорий -> id. Дерево читается один раз на импорт (категорий на порядки
+    меньше, чем товаров); недостающие узлы создаются по уровням: bulk_create,
+    затем bulk_update материализованного пути, который зависит от выданных id.
+    """
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.created = 0
+        self.nodes = {}  # (parent_id, название в нижнем регистре) -> (id, path)
+        self.slugs = set()
+        for pk, name, parent_id, path, slug in Category.objects.values_list('id', 'name', 'parent_id', 'path', 'slug'):
+            self.nodes.setdefault((parent_id, name.casefold()), (pk, path))
+            self.slugs.add(slug)
+        self.fake_id = 0
+
+    def resolve(self, paths):
+        """{путь (кортеж названий): id листовой категории}; недостающие категории создаются"""
+        paths = {path for path in paths if path}
+        resolved = {}
+        for depth in range(max(map(len, paths), default=0)):
+            missing = {}
+            for path in paths:
+                if len(path) <= depth:
+                    continue
+                parent_id = resolved[path[:depth]][0] if depth else None
+                key = (parent_id, path[depth].casefold())
+                if key in self.nodes:
+                    resolved[path[:depth + 1]] = self.nodes[key]
+                else:
+                    missing.setdefault(key, (path[depth], path[:depth + 1]))
+            if missing:
+                self._create(depth, missing, resolved)
+        return {path: resolved[path][0] for path in paths}
+
+    def _create(self, depth, missing, resolved):
+        keys = list(missing)
+        if self.dry_run:
+            for key in keys:
+                self.fake_id -= 1
+                self.nodes[key] = (self.fake_id, '')
+        else:
+            slugs = Category.allocate_slugs([missing[key][0] for key in keys], taken=self.slugs)
+            categories = Category.objects.bulk_create([
+                Category(name=missing[key][0], slug=slug, parent_id=key[0], depth=depth)
+                for key, slug in zip(keys, slugs)
+            ])
+            for key, category in zip(keys, categories):
+                parent_path = resolved[missing[key][1][:-1]][1] if depth else '/'
+                category.path = parent_path + category_path_segment(category.pk)
+                self.nodes[key] = (category.pk, category.path)
+            Category.objects.bulk_update(categories, ['path'])
+        for key in keys:
+            resolved[missing[key][1]] = self.nodes[key]
+        self.created += len(keys)
+
+
+class _Batch:
+    """Одна пачка строк: сравнение с существующими товарами и upsert"""
+
+    def __init__(self, lines, categories, on_error, result):
+        self.lines = lines
+        self.categories = categories
+        self.on_error = on_error
+        self.result = result
+
+    def run(self, dry_run):
+        existing = {
+            code: (name, description or '', category_id)
+            for code, name, description, category_id in Product.objects.filter(
+                code__in=[line.code for line in self.lines]
+            ).values_list('code', 'name', 'description', 'category_id')
+        }
+        for line in self.lines:
+            if not line.name and line.code not in existing:
+                self.result.errors += 1
+                self.on_error(RowError(line.line, line.code, "Не указано название нового товара"))
+        self.lines = [line for line in self.lines if line.name or line.code in existing]
+        category_ids = self.categories.resolve(line.category for line in self.lines)
+
+        changed = []
+        for line in self.lines:
+            current = existing.get(line.code)
+            name, description, category_id = current or ('', '', None)
+            values = (
+                line.name or name,
+                line.description or description,
+                category_ids[line.category] if line.category else category_id,
+            )
+            if current is None:
+                self.result.created += 1
+            elif values != current:
+                self.result.updated += 1
+            else:
+                self.result.unchanged += 1
+                continue
+            changed.append(Product(code=line.code, name=values[0], description=values[1], category_id=values[2]))
+
+        if changed and not dry_run:
+            Product.objects.bulk_create(
+                changed,
+                update_conflicts=True,
+                unique_fields=['code'],
+                update_fields=['name', 'description', 'category', 'updated_at'],
+            )
+            products = Product.objects.filter(code__in=[product.code for product in changed])
+            search.index_products(products)
+            cache.bump_products(products.values_list('id', flat=True))
+
+
+@timed(logger, 'importing.import_catalog')
+def import_catalog(rows, dry_run=False, batch_size=IMPORT_BATCH_SIZE, on_error=None):
+    """
+    Загружает каталог из пар (номер строки, значения), например из read_rows().
+    Ошибки строк передаются в on_error(RowError). Возвращает CatalogImportResult.
+    Код, повторно встретившийся в файле, считается ошибкой: действует первая строка.
+    """
+    result = CatalogImportResult(dry_run)
+    on_error = on_error or (lambda error: None)
+    categories = CategoryResolver(dry_run)
+    seen = {}  # код -> строка, где он встретился впервые
+
+    def flush(lines):
+        with transaction.atomic():
+            _Batch(lines, categories, on_error, result).run(dry_run)
+            if dry_run:
+                transaction.set_rollback(True)
+
+    lines = []
+    for line_number, values in rows:
+        result.rows += 1
+        try:
+            line = parse_line(line_number, values)
+        except ValueError as e:
+            result.errors += 1
+            on_error(RowError(line_number, _text(values.get('code')), str(e)))
+            continue
+        if line.code in seen:
+            result.errors += 1
+            on_error(RowError(line_number, line.code, f"Код уже встречался в строке {seen[line.code]}"))
+            continue
+        seen[line.code] = line_number
+        lines.append(line)
+        if len(lines) >= batch_size:
+            flush(lines)
+            lines = []
+    if lines:
+        flush(lines)
+
+    result.categories = categories.created
+    if categories.created and not dry_run:
+        cache.bump_catalog()
+    return result
@@ -0,0 +1,51 @@
+# goods/management/commands/import_catalog.py
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from goods.importing import IMPORT_BATCH_SIZE, import_catalog, read_rows
+from store.importing import ImportFormatError
+
+
+class Command(BaseCommand):
+    help = ("Загружает каталог из прайс-листа (CSV или XLSX): товары обновляются по коду, "
+            "категории создаются по путям вида «Родитель/Потомок». "
+            "Обязательный столбец: code; необязательные: name, category, description.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл прайс-листа .csv или .xlsx')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать изменения, ничего не записывая')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Строк в одной транзакции')
+        parser.add_argument('--encoding', default='utf-8-sig', help='Кодировка CSV (например, cp1251)')
+        parser.add_argument('--errors', help='Записать отчёт об ошибках в CSV-файл вместо вывода')
+
+    def handle(self, *args, **options):
+        report = open(options['errors'], 'w', newline='', encoding='utf-8') if options['errors'] else None
+        try:
+            if report:
+                writer = csv.writer(report)
+                writer.writerow(['line', 'code', 'error'])
+                on_error = writer.writerow
+            else:
+                def on_error(error):
+                    self.stderr.write(f"Строка {error.line} ({error.code or '-'}): {error.message}")
+
+            with open(options['path'], 'rb') as stream:
+                result = import_catalog(
+                    read_rows(stream, options['path'], encoding=options['encoding']),
+                    dry_run=options['dry_run'],
+                    batch_size=options['batch_size'],
+                    on_error=on_error,
+                )
+        except (ImportFormatError, OSError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+        finally:
+            if report:
+                report.close()
+
+        style = self.style.WARNING if result.errors else self.style.SUCCESS
+        self.stdout.write(style(str(result)))
+        if result.errors and report:
+            self.stdout.write(f"Отчёт об ошибках: {options['errors']}")
@@ -0,0 +1,29 @@
+# goods/management/commands/rebuild_category_paths.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from goods.cache import bump_catalog
+from goods.models import Category
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает материализованные пути (path, depth) категорий по parent — "
+            "после правок базы в обход Category.save. С --check только выводит расхождения.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Только проверить расхождения, ничего не изменяя')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            changed = Category.rebuild_paths(dry_run=options['check'])
+            if changed and not options['check']:
+                bump_catalog()
+
+        if options['check']:
+            if changed:
+                raise CommandError(f"Пути расходятся у {len(changed)} категорий: "
+                                   f"{', '.join(map(str, changed[:20]))}")
+            self.stdout.write(self.style.SUCCESS("Пути категорий совпадают с деревом"))
+            return
+        self.stdout.write(self.style.SUCCESS(f"Исправлено категорий: {len(changed)}"))
@@ -0,0 +1,16 @@
+# goods/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from goods import search
+
+
+class Command(BaseCommand):
+    help = ("Полностью пересобирает поисковый индекс товаров (FTS5 или индекс в памяти; "
+            "индексы pg_trgm на PostgreSQL ведёт сама СУБД)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Проиндексировано товаров: {count} ({search.search_engine()})"))
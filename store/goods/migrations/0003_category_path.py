@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:43
+
+from django.db import migrations, models
+
+
+def fill_category_paths(apps, schema_editor):
+    # Замороженная копия Category.rebuild_paths: миграция не зависит от текущего кода модели.
+    # Пересчитать пути на живой базе — команда rebuild_category_paths
+    Category = apps.get_model('goods', 'Category')
+    nodes = dict(Category.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def resolve(pk, seen=()):
+        if pk not in paths:
+            parent_id = nodes.get(pk)
+            if parent_id is None or parent_id not in nodes or parent_id in seen:
+                paths[pk] = f"/{pk:08d}/"
+            else:
+                paths[pk] = resolve(parent_id, seen + (pk,)) + f"{pk:08d}/"
+        return paths[pk]
+
+    updated = []
+    for pk in nodes:
+        path = resolve(pk)
+        updated.append(Category(pk=pk, path=path, depth=path.count('/') - 2))
+    Category.objects.bulk_update(updated, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0002_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Уровень'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255, verbose_name='Путь в дереве'),
+        ),
+        migrations.RunPython(fill_category_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Замороженная копия DDL из goods.search (create_fts_table): миграция не зависит от текущего кода приложения.
+# Меняя схему таблицы в goods.search, добавьте новую миграцию
+FTS_TABLE = 'goods_product_fts'
+FTS_CREATE_SQL = (f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                  f"USING fts5(name, code, description, tokenize='trigram')")
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return  # PostgreSQL ищет по индексам pg_trgm (миграция 0005), прочие СУБД — индексом в памяти
+    Product = apps.get_model('goods', 'Product')
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(FTS_CREATE_SQL)
+        except Exception:  # сборка SQLite без FTS5 или без trigram
+            return
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, code, description) VALUES (%s, %s, %s, %s)",
+            [(pk, name or '', code or '', description or '')
+             for pk, name, code, description in Product.objects.values_list('id', 'name', 'code', 'description')]
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0003_category_path'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
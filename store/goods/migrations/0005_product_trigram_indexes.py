@@ -0,0 +1,33 @@
+from django.db import migrations
+
+# Поиск на PostgreSQL (goods.search): ILIKE по UPPER(поле::text) — так Django строит icontains
+TRIGRAM_FIELDS = ('name', 'code', 'description')
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for field in TRIGRAM_FIELDS:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS goods_product_{field}_trgm "
+            f"ON goods_product USING gin (UPPER({field}::text) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in TRIGRAM_FIELDS:
+        schema_editor.execute(f"DROP INDEX IF EXISTS goods_product_{field}_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0004_product_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
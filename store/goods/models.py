@@ -1,12 +1,53 @@
 # app goods/models
+from django.apps import apps
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.db import models
+from django.db.models import Count, F, OuterRef, Prefetch, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Substr
 from django.utils import timezone
 from django.utils.text import slugify
 
 
+CATEGORY_PATH_STEP = 8  # ширина сегмента id в материализованном пути
+CATEGORY_CYCLE_MESSAGE = 'Категория не может быть вложена в саму себя или своего потомка'
+
+
+def category_path_segment(pk):
+    return f"{pk:0{CATEGORY_PATH_STEP}d}/"
+
+
+_TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh', 'з': 'z', 'и': 'i',
+    'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't',
+    'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '', 'ы': 'y', 'ь': '',
+    'э': 'e', 'ю': 'yu', 'я': 'ya',
+})
+CATEGORY_SLUG_BASE_LENGTH = 40  # остаток SlugField(max_length=50) — под суффикс "-N"
+
+
+def category_slug(name):
+    """Основа ЧПУ категории: кириллица транслитерируется, пустое название даёт 'category'"""
+    return slugify((name or '').lower().translate(_TRANSLIT))[:CATEGORY_SLUG_BASE_LENGTH].strip('-') or 'category'
+
+
+class CategoryQuerySet(models.QuerySet):
+    def with_subtree_product_count(self):
+        """
+        Аннотирует subtree_product_count — число товаров в категории и всех её потомках.
+        Считается одним запросом через материализованный путь.
+        """
+        # Группировка по константе: одна строка COUNT на всё поддерево (без GROUP BY в SQL)
+        count = (Product.objects.filter(category__path__startswith=OuterRef('path'))
+                 .order_by().annotate(subtree=Value(1)).values('subtree')
+                 .annotate(total=Count('pk')).values('total'))
+        return self.annotate(subtree_product_count=Coalesce(Subquery(count), 0))
+
+
 class Category(models.Model):
     """
-    Категория товаров
+    Категория товаров.
+    Дерево хранится как список смежности (parent) и материализованный путь (path):
+    путь состоит из id предков и самой категории, например "/00000001/00000007/".
     """
     name = models.CharField('Название', max_length=255)
     slug = models.SlugField(unique=True, blank=True)
@@ -19,6 +60,10 @@ class Category(models.Model):
         blank=True,
         null=True
     )
+    path = models.CharField('Путь в дереве', max_length=255, db_index=True, editable=False, blank=True)
+    depth = models.PositiveSmallIntegerField('Уровень', default=0, editable=False)
+
+    objects = CategoryQuerySet.as_manager()
 
     class Meta:
         app_label = 'goods'
@@ -31,9 +76,174 @@ class Category(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
+            self.slug = Category.allocate_slugs([self.name])[0]
+        parent_path = None
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first()
+            # Проверка и в save(), а не только в clean(): иначе цикл молча превратился бы в корень
+            if self.pk and parent_path and self.is_in_path(parent_path):
+                raise ValidationError({'parent': CATEGORY_CYCLE_MESSAGE})
+        old_path = self.path
         super().save(*args, **kwargs)
 
+        if parent_path:
+            new_path = parent_path + category_path_segment(self.pk)
+        else:
+            new_path = '/' + category_path_segment(self.pk)
+        if new_path != old_path:
+            self._move_subtree(old_path, new_path)
+
+    def clean(self):
+        super().clean()
+        if self.pk and self.parent_id and self.parent.path and self.is_in_path(self.parent.path):
+            raise ValidationError({'parent': CATEGORY_CYCLE_MESSAGE})
+
+    def delete(self, *args, **kwargs):
+        # Дочерние категории становятся корневыми (SET_NULL) — переносим их поддеревья
+        prefix_length = len(self.path) - 1
+        descendants = Category.objects.filter(path__startswith=self.path).exclude(pk=self.pk)
+        result = super().delete(*args, **kwargs)
+        if self.path:
+            descendants.update(
+                path=Substr('path', prefix_length + 1),
+                depth=F('depth') - (self.depth + 1),
+            )
+        return result
+
+    @classmethod
+    def allocate_slugs(cls, names, taken=None):
+        """
+        Уникальные slug для списка названий за один проход: занятые slug читаются
+        одним запросом по префиксам (или передаются в taken — множество дополняется),
+        суффиксы "-1", "-2"... подбираются в памяти.
+        """
+        bases = [category_slug(name) for name in names]
+        if taken is None:
+            prefixes = Q()
+            for base in set(bases):
+                prefixes |= Q(slug__startswith=base)
+            taken = set(cls.objects.filter(prefixes).values_list('slug', flat=True)) if bases else set()
+        slugs = []
+        counters = {}
+        for base in bases:
+            slug, counter = base, counters.get(base, 0)
+            while slug in taken:
+                counter += 1
+                slug = f"{base}-{counter}"
+            counters[base] = counter
+            taken.add(slug)
+            slugs.append(slug)
+        return slugs
+
+    def is_in_path(self, path):
+        """Входит ли категория в путь (т.е. является ли она предком или самим узлом пути)"""
+        return f"/{category_path_segment(self.pk)}" in path
+
+    def _move_subtree(self, old_path, new_path):
+        """Переписывает путь категории и всех её потомков одним UPDATE"""
+        new_depth = new_path.count('/') - 2
+        if old_path:
+            old_depth = old_path.count('/') - 2
+            Category.objects.filter(path__startswith=old_path).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (new_depth - old_depth),
+            )
+        else:
+            Category.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+        self.path = new_path
+        self.depth = new_depth
+
+    def get_descendants(self, include_self=True):
+        """Все потомки категории любой глубины — один запрос по префиксу пути"""
+        descendants = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
+
+    def get_descendant_ids(self, include_self=True):
+        """Возвращает id всех потомков категории (любой глубины)"""
+        return list(self.get_descendants(include_self).values_list('id', flat=True))
+
+    def get_ancestors(self, include_self=False):
+        """Предки от корня к категории (для хлебных крошек) — один запрос по id из пути"""
+        ids = [int(segment) for segment in self.path.strip('/').split('/') if segment]
+        if not include_self:
+            ids = ids[:-1]
+        return Category.objects.filter(id__in=ids).order_by('depth')
+
+    @classmethod
+    def build_tree(cls, queryset=None):
+        """
+        Возвращает корневые категории, у каждой в tree_children лежат дочерние.
+        Всё дерево строится по одной выборке.
+        """
+        nodes = list(queryset if queryset is not None else cls.objects.all())
+        by_id = {node.pk: node for node in nodes}
+        roots = []
+        for node in nodes:
+            node.tree_children = []
+        for node in nodes:
+            parent = by_id.get(node.parent_id)
+            if parent is not None:
+                parent.tree_children.append(node)
+            else:
+                roots.append(node)
+        return roots
+
+    @classmethod
+    def rebuild_paths(cls, dry_run=False):
+        """
+        Пересчитывает path/depth всего дерева из parent (команда rebuild_category_paths).
+        Пишутся только расходящиеся строки; возвращает их id. С dry_run только возвращает.
+        """
+        rows = {pk: (parent_id, path) for pk, parent_id, path in cls.objects.values_list('id', 'parent_id', 'path')}
+        nodes = {pk: parent_id for pk, (parent_id, _path) in rows.items()}
+        paths = {}
+
+        def resolve(pk, seen=()):
+            if pk in paths:
+                return paths[pk]
+            parent_id = nodes.get(pk)
+            if parent_id is None or parent_id not in nodes or parent_id in seen:
+                paths[pk] = '/' + category_path_segment(pk)
+            else:
+                paths[pk] = resolve(parent_id, seen + (pk,)) + category_path_segment(pk)
+            return paths[pk]
+
+        updated = [cls(pk=pk, path=resolve(pk), depth=resolve(pk).count('/') - 2)
+                   for pk in nodes if resolve(pk) != rows[pk][1]]
+        if not dry_run:
+            cls.objects.bulk_update(updated, ['path', 'depth'], batch_size=500)
+        return [category.pk for category in updated]
+
+
+def main_image_prefetch(lookup='product_images'):
+    """
+    Prefetch главного изображения для списка товаров.
+    lookup можно указать через связь, например 'product__product_images'.
+    Результат кладётся в атрибут prefetched_main_images товара.
+    """
+    ProductImage = apps.get_model('files', 'ProductImage')  # ленивый импорт, чтобы не было циклических импортов
+    return Prefetch(
+        lookup,
+        queryset=ProductImage.objects.filter(is_main=True),
+        to_attr='prefetched_main_images'
+    )
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_main_image(self):
+        """Загружает главные изображения всей выборки одним дополнительным запросом"""
+        return self.prefetch_related(main_image_prefetch())
+
+    def with_images(self):
+        """Загружает все изображения всей выборки одним дополнительным запросом"""
+        return self.prefetch_related('product_images')
+
+    def in_category(self, category):
+        """Товары категории и всех её подкатегорий (по материализованному пути)"""
+        return self.filter(category__path__startswith=category.path)
+
 
 class Product(models.Model):
     """
@@ -70,28 +280,52 @@ class Product(models.Model):
         verbose_name='Дата последнего обновления'
     )
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         app_label = 'goods'
         verbose_name = 'Товар'
         verbose_name_plural = 'Товары'
         ordering = ['name']
+        indexes = [
+            # Ключи keyset-пагинации каталога (см. goods.pagination)
+            models.Index(fields=['name', 'id']),
+            models.Index(fields=['category', 'name', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.code})"
 
+    @property
+    def on_hand(self) -> int:
+        """
+        Количество единиц в наличии по сводке остатков (unit.ProductStock).
+        Для списков используйте select_related('stock'), чтобы не было запроса на каждый товар.
+        """
+        try:
+            return self.stock.on_hand
+        except ObjectDoesNotExist:
+            return 0
+
     def get_availability_status(self) -> str:
         """
         Возвращает статус доступности товара
-        (заглушка - нужно реализовать логику)
         """
-        return "В наличии"
+        return "В наличии" if self.on_hand > 0 else "Нет в наличии"
 
     @property
     def images(self):
-        """Возвращает все изображения товара"""
+        """Возвращает все изображения товара (из prefetch, если он был)"""
         return self.product_images.all()
 
     @property
     def main_image(self):
-        """Возвращает главное изображение товара или None"""
+        """
+        Возвращает главное изображение товара или None.
+        Использует данные with_main_image()/with_images(), если они загружены.
+        """
+        if hasattr(self, 'prefetched_main_images'):
+            return self.prefetched_main_images[0] if self.prefetched_main_images else None
+        if 'product_images' in getattr(self, '_prefetched_objects_cache', {}):
+            return next((image for image in self.product_images.all() if image.is_main), None)
         return self.product_images.filter(is_main=True).first()
\ No newline at end of file
@@ -0,0 +1,44 @@
+# app goods/pagination
+import base64
+import json
+
+from django.db.models import Q
+
+PRODUCTS_PAGE_SIZE = 24
+
+
+def encode_cursor(product):
+    """Курсор на позицию после товара: (name, id) совпадает с Product.Meta.ordering"""
+    raw = json.dumps([product.name, product.pk], ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает (name, id) или None, если курсор пустой или повреждён"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        name, pk = json.loads(raw)
+        return str(name), int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_page(queryset, cursor=None, page_size=PRODUCTS_PAGE_SIZE):
+    """
+    Страница выборки по ключу (name, id) без OFFSET:
+    глубокие страницы стоят столько же, сколько первая.
+    Возвращает (список объектов, курсор следующей страницы или None).
+    """
+    queryset = queryset.order_by('name', 'id')
+    position = decode_cursor(cursor)
+    if position:
+        name, pk = position
+        queryset = queryset.filter(Q(name__gt=name) | Q(name=name, id__gt=pk))
+
+    items = list(queryset[:page_size + 1])
+    has_next = len(items) > page_size
+    items = items[:page_size]
+    next_cursor = encode_cursor(items[-1]) if has_next else None
+    return items, next_cursor
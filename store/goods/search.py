@@ -0,0 +1,334 @@
+# app goods/search
+"""
+Поиск товаров по названию, коду и описанию.
+
+Движок выбирается по базе (search_engine):
+- SQLite — виртуальная таблица FTS5 с триграммным токенизатором (подстроки
+  и префиксы, регистронезависимо, в том числе для кириллицы), ранжирование
+  по bm25 с весами полей. Таблица обновляется сигналами goods.signals,
+  полностью пересобирается командой rebuild_search_index;
+- PostgreSQL — ILIKE по GIN-индексам pg_trgm (миграция goods 0005), индексы
+  ведёт сама СУБД, ранжирование — по тем же весам полей;
+- иначе (SQLite без FTS5, другие СУБД) — триграммный индекс в памяти процесса.
+  Он годится только для одного процесса: изменения, сделанные в другом воркере
+  или другой командой, до него не доходят до перезапуска.
+"""
+import re
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Case, Q, Value, When
+
+from goods.models import Product
+
+FTS_TABLE = 'goods_product_fts'
+# Та же схема создаётся миграцией goods 0004 (там — замороженная копия); меняя её, добавьте миграцию
+FTS_CREATE_SQL = (f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                  f"USING fts5(name, code, description, tokenize='trigram')")
+FTS5, PG_TRGM, MEMORY = 'FTS5', 'pg_trgm', 'индекс в памяти'
+SEARCH_LIMIT = 10
+# Веса полей для ранжирования: название, код, описание
+FIELD_WEIGHTS = (10.0, 5.0, 1.0)
+# Похоже на артикул: без пробелов и с цифрой, например RF-75510
+CODE_RE = re.compile(r'^[\w.\-/]*\d[\w.\-/]*$')
+
+_fts_state = {}
+
+
+def fts_available():
+    """Есть ли в текущей БД таблица FTS5 (результат кэшируется на соединение)"""
+    alias = connection.alias
+    if alias not in _fts_state:
+        available = False
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                available = cursor.fetchone() is not None
+        _fts_state[alias] = available
+    return _fts_state[alias]
+
+
+def create_fts_table(schema_editor=None):
+    """Создаёт таблицу FTS5, если СУБД её поддерживает. Возвращает True при успехе"""
+    conn = schema_editor.connection if schema_editor else connection
+    if conn.vendor != 'sqlite':
+        return False
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute(FTS_CREATE_SQL)
+        except Exception:  # сборка SQLite без FTS5 или без trigram
+            return False
+    _fts_state.pop(conn.alias, None)
+    return True
+
+
+def search_engine():
+    """Каким движком ищет текущая база: FTS5, pg_trgm или индекс в памяти"""
+    if fts_available():
+        return FTS5
+    if connection.vendor == 'postgresql':
+        return PG_TRGM
+    return MEMORY
+
+
+def _document(product):
+    return product.name or '', product.code or '', product.description or ''
+
+
+class TrigramIndex:
+    """Триграммный инвертированный индекс в памяти (запасной вариант без FTS5)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.postings = defaultdict(set)
+        self.documents = {}
+        self.built = False
+
+    @staticmethod
+    def trigrams(text):
+        text = f"  {text.lower()} "
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def _add(self, pk, fields):
+        fields = tuple(field.lower() for field in fields)
+        self.documents[pk] = fields
+        for gram in self.trigrams(' '.join(fields)):
+            self.postings[gram].add(pk)
+
+    def _remove(self, pk):
+        fields = self.documents.pop(pk, None)
+        if fields is None:
+            return
+        for gram in self.trigrams(' '.join(fields)):
+            self.postings[gram].discard(pk)
+
+    def rebuild(self):
+        with self.lock:
+            self.postings.clear()
+            self.documents.clear()
+            rows = Product.objects.order_by().values_list('id', 'name', 'code', 'description')
+            for pk, name, code, description in rows.iterator(chunk_size=2000):
+                self._add(pk, (name or '', code or '', description or ''))
+            self.built = True
+
+    def update(self, product):
+        self.update_many([(product.pk, *_document(product))])
+
+    def update_many(self, rows):
+        """rows: кортежи (id, название, код, описание)"""
+        with self.lock:
+            if self.built:
+                for pk, *fields in rows:
+                    self._remove(pk)
+                    self._add(pk, fields)
+
+    def remove(self, pk):
+        with self.lock:
+            if self.built:
+                self._remove(pk)
+
+    def search(self, query, limit):
+        if not self.built:
+            self.rebuild()
+        terms = query.lower().split()
+        with self.lock:
+            candidates = None
+            for term in terms:
+                if len(term) >= 3:
+                    grams = {term[i:i + 3] for i in range(len(term) - 2)}
+                elif len(term) == 2:
+                    grams = {f" {term}"}  # короткое слово — только как начало слова
+                else:
+                    continue
+                matched = set.intersection(*(self.postings.get(gram, set()) for gram in grams))
+                candidates = matched if candidates is None else candidates & matched
+            scored = []
+            for pk in candidates or ():
+                fields = self.documents[pk]
+                score = 0.0
+                for term in terms:
+                    for weight, field in zip(FIELD_WEIGHTS, fields):
+                        if field.startswith(term):
+                            score += weight * 2
+                        elif term in field:
+                            score += weight
+                if score:
+                    scored.append((-score, fields[0], pk))
+        scored.sort()
+        return [pk for _, _, pk in scored[:limit]]
+
+
+memory_index = TrigramIndex()
+
+
+def _fts_query(query):
+    """
+    Каждое слово — отдельная фраза, все слова обязательны.
+    Слова короче трёх символов триграммный индекс не находит, поэтому они пропускаются.
+    """
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in query.split() if len(term) >= 3)
+
+
+def _fts_search(query, limit):
+    weights = ', '.join(str(weight) for weight in FIELD_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s",
+            [_fts_query(query), limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _trigram_db_search(query, limit):
+    """
+    PostgreSQL: все слова от трёх символов обязательны (ILIKE по индексам pg_trgm),
+    очки — как у TrigramIndex: вес поля, удвоенный при совпадении с начала
+    """
+    terms = [term for term in query.split() if len(term) >= 3]
+    products = Product.objects.all()
+    score = Value(0.0)
+    for term in terms:
+        products = products.filter(Q(name__icontains=term) | Q(code__icontains=term)
+                                   | Q(description__icontains=term))
+        for weight, field in zip(FIELD_WEIGHTS, ('name', 'code', 'description')):
+            score += Case(When(**{f'{field}__istartswith': term}, then=Value(weight * 2)),
+                          When(**{f'{field}__icontains': term}, then=Value(weight)),
+                          default=Value(0.0))
+    return list(products.annotate(score=score).order_by('-score', 'name', 'id')
+                .values_list('id', flat=True)[:limit])
+
+
+def _short_query_queryset(query):
+    """Меньше трёх символов триграммы не работают — ищем по началу кода и названия"""
+    # LIKE в SQLite не учитывает регистр только для латиницы, поэтому перебираем варианты
+    condition = Q()
+    for variant in {query, query.lower(), query.capitalize(), query.upper()}:
+        condition |= Q(code__startswith=variant) | Q(name__startswith=variant)
+    return Product.objects.filter(condition).order_by('name', 'id').values_list('id', flat=True)
+
+
+def _exact_code_queryset(query):
+    """Быстрый путь: точное совпадение артикула по уникальному индексу (None, если запрос не похож на код)"""
+    if not CODE_RE.match(query):
+        return None
+    return Product.objects.filter(code__in={query, query.upper()}).values_list('id', flat=True)
+
+
+def _ranked_search(query, limit):
+    """FTS5 с ранжированием bm25, pg_trgm или индекс в памяти"""
+    engine = search_engine()
+    if engine == FTS5:
+        return _fts_search(query, limit)
+    if engine == PG_TRGM:
+        return _trigram_db_search(query, limit)
+    return memory_index.search(query, limit)
+
+
+def _is_short(query):
+    return max(len(term) for term in query.split()) < 3
+
+
+def _merge(exact, found, limit):
+    ids = list(exact)
+    ids.extend(pk for pk in found if pk not in ids)
+    return ids[:limit]
+
+
+def search_product_ids(query, limit=SEARCH_LIMIT):
+    """Возвращает id товаров по убыванию релевантности"""
+    query = ' '.join(query.split())
+    if not query:
+        return []
+    exact = _exact_code_queryset(query)
+    exact = list(exact) if exact is not None else []
+    if _is_short(query):
+        found = list(_short_query_queryset(query)[:limit])
+    else:
+        found = _ranked_search(query, limit)
+    return _merge(exact, found, limit)
+
+
+def search_products(query, limit=SEARCH_LIMIT):
+    """Товары по убыванию релевантности"""
+    ids = search_product_ids(query, limit)
+    products = Product.objects.in_bulk(ids)
+    return [products[pk] for pk in ids if pk in products]
+
+
+async def asearch_products(query, limit=SEARCH_LIMIT):
+    """search_products для асинхронного представления: весь поиск — в потоке sync_to_async"""
+    return await sync_to_async(search_products)(query, limit)
+
+
+def index_product(product):
+    if fts_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, code, description) VALUES (%s, %s, %s, %s)",
+                [product.pk, *_document(product)]
+            )
+    else:
+        memory_index.update(product)
+
+
+def index_products(products):
+    """
+    Переиндексирует выборку товаров пачкой — для массовых записей (bulk_create),
+    после которых сигналы post_save не приходят
+    """
+    rows = [(pk, name or '', code or '', description or '')
+            for pk, name, code, description in products.order_by().values_list('id', 'name', 'code', 'description')]
+    if not rows:
+        return
+    if fts_available():
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, code, description) VALUES (%s, %s, %s, %s)", rows
+            )
+    else:
+        memory_index.update_many(rows)
+
+
+def remove_product(pk):
+    if fts_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+    else:
+        memory_index.remove(pk)
+
+
+def rebuild_index(batch_size=2000):
+    """Полная пересборка индекса. Возвращает число проиндексированных товаров"""
+    if not fts_available():
+        create_fts_table()
+    engine = search_engine()
+    if engine == PG_TRGM:
+        return Product.objects.count()  # индексы pg_trgm ведёт СУБД
+    if engine == MEMORY:
+        memory_index.rebuild()
+        return len(memory_index.documents)
+
+    count = 0
+    rows = Product.objects.order_by().values_list('id', 'name', 'code', 'description')
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        batch = []
+        for pk, name, code, description in rows.iterator(chunk_size=batch_size):
+            batch.append((pk, name or '', code or '', description or ''))
+            if len(batch) >= batch_size:
+                cursor.executemany(
+                    f"INSERT INTO {FTS_TABLE} (rowid, name, code, description) VALUES (%s, %s, %s, %s)", batch
+                )
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, code, description) VALUES (%s, %s, %s, %s)", batch
+            )
+            count += len(batch)
+    return count
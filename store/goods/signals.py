@@ -0,0 +1,37 @@
+# app goods/signals
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from files.models import ProductImage
+from goods import cache, search
+from goods.models import Category, Product
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    """Переиндексирует товар после сохранения"""
+    if not raw:
+        search.index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_product(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    cache.bump_product(instance.pk)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_product_image_cache(sender, instance, **kwargs):
+    cache.bump_product(instance.product_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    cache.bump_catalog()
@@ -1,3 +1,323 @@
-from django.test import TestCase
+import io
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.test import AsyncRequestFactory, TestCase
+
+from files.models import ProductImage
+from goods import views
+from goods.importing import import_catalog, read_rows
+from goods.models import Category, Product
+
+
+class CatalogQueryCountTests(TestCase):
+    """Количество запросов каталога не должно зависеть от числа товаров"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Инструмент')
+
+    def create_products(self, count, start=0):
+        for i in range(start, start + count):
+            product = Product.objects.create(code=f'RF-{i:05d}', name=f'Товар {i}', category=self.category)
+            ProductImage.objects.create(product=product, image=f'products/{product.code}/main.webp', is_main=True)
+            ProductImage.objects.create(product=product, image=f'products/{product.code}/extra.webp')
+
+    def catalog_queries(self):
+        cache.clear()
+        with self.assertNumQueries(3) as context:
+            response = self.client.get('/goods/products/')
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_catalog_query_count_is_constant(self):
+        self.create_products(3)
+        small = self.catalog_queries()
+        self.create_products(30, start=3)
+        self.assertEqual(self.catalog_queries(), small)
+
+    def test_main_image_uses_prefetch(self):
+        self.create_products(5)
+        products = list(Product.objects.with_main_image())
+        with self.assertNumQueries(0):
+            for product in products:
+                self.assertTrue(product.main_image.is_main)
+
+
+class CatalogPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.root = Category.objects.create(name='Инструмент', slug='tools')
+        cls.child = Category.objects.create(name='Ключи', slug='keys', parent=cls.root)
+        cls.grandchild = Category.objects.create(name='Рожковые', slug='open-end', parent=cls.child)
+        cls.other = Category.objects.create(name='Крепёж', slug='fasteners')
+        categories = [cls.root, cls.child, cls.grandchild, cls.other]
+        for i in range(60):
+            Product.objects.create(code=f'RF-{i:05d}', name=f'Товар {i % 7}', category=categories[i % 4])
+
+    def walk_feed(self, **params):
+        seen, cursor = [], None
+        while True:
+            query = dict(params, **({'after': cursor} if cursor else {}))
+            data = self.client.get('/goods/products/feed/', query).json()
+            seen.extend(item['id'] for item in data['results'])
+            cursor = data['next']
+            if not cursor:
+                return seen
+
+    def test_feed_walks_whole_catalog_in_order(self):
+        expected = list(Product.objects.order_by('name', 'id').values_list('id', flat=True))
+        self.assertEqual(self.walk_feed(), expected)
+
+    def test_category_filter_includes_descendants(self):
+        expected = set(Product.objects.exclude(category=self.other).values_list('id', flat=True))
+        self.assertEqual(set(self.walk_feed(category='tools')), expected)
+        self.assertEqual(len(self.walk_feed(category='fasteners')), 15)
+
+    def test_deep_page_query_count_matches_first_page(self):
+        first = self.client.get('/goods/products/feed/').json()
+        cache.clear()
+        with self.assertNumQueries(2):
+            self.client.get('/goods/products/feed/')
+        with self.assertNumQueries(2):
+            self.client.get('/goods/products/feed/', {'after': first['next']})
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        self.root = Category.objects.create(name='Инструмент', slug='tools')
+        self.child = Category.objects.create(name='Ключи', slug='keys', parent=self.root)
+        self.leaf = Category.objects.create(name='Рожковые', slug='open-end', parent=self.child)
+        self.other = Category.objects.create(name='Крепёж', slug='fasteners')
+        for i, category in enumerate([self.root, self.child, self.leaf, self.leaf, self.other]):
+            Product.objects.create(code=f'RF-{i}', name=f'Товар {i}', category=category)
+
+    def test_descendants_and_ancestors(self):
+        self.assertEqual(set(self.root.get_descendant_ids()), {self.root.pk, self.child.pk, self.leaf.pk})
+        with self.assertNumQueries(1):
+            self.assertEqual(list(self.leaf.get_ancestors()), [self.root, self.child])
+
+    def test_subtree_product_counts(self):
+        with self.assertNumQueries(1):
+            counts = {c.slug: c.subtree_product_count for c in Category.objects.with_subtree_product_count()}
+        self.assertEqual(counts, {'tools': 4, 'keys': 3, 'open-end': 2, 'fasteners': 1})
+
+    def test_move_subtree(self):
+        self.child.parent = self.other
+        self.child.save()
+        self.leaf.refresh_from_db()
+        self.assertEqual(list(self.leaf.get_ancestors()), [self.other, self.child])
+        self.assertEqual(self.leaf.depth, 2)
+        self.assertEqual(Product.objects.in_category(self.root).count(), 1)
+
+    def test_moving_under_own_descendant_is_refused(self):
+        self.root.parent = self.leaf
+        with self.assertRaises(ValidationError):
+            self.root.save()
+        self.root.refresh_from_db()
+        self.leaf.refresh_from_db()
+        self.assertEqual((self.root.parent_id, self.root.depth, self.leaf.depth), (None, 0, 2))
+
+    def test_rebuild_command_fixes_drifted_paths(self):
+        Category.objects.filter(pk=self.leaf.pk).update(path='/broken/', depth=5)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_category_paths', check=True, stdout=io.StringIO())
+        call_command('rebuild_category_paths', stdout=io.StringIO())
+        self.leaf.refresh_from_db()
+        self.assertEqual(list(self.leaf.get_ancestors()), [self.root, self.child])
+        self.assertEqual(self.leaf.depth, 2)
+        call_command('rebuild_category_paths', check=True, stdout=io.StringIO())
+
+    def test_delete_reroots_children(self):
+        self.root.delete()
+        self.leaf.refresh_from_db()
+        self.assertEqual(list(self.leaf.get_ancestors()), [self.child])
+        self.assertEqual(self.leaf.depth, 1)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.wrench = Product.objects.create(code='RF-75510', name='Ключ рожковый 10х12')
+        cls.set = Product.objects.create(code='RF-75511', name='Набор ключей', description='Ключ рожковый в наборе')
+        cls.hammer = Product.objects.create(code='HM-100', name='Молоток слесарный')
+
+    def search(self, query):
+        return [item['id'] for item in self.client.get('/goods/search/', {'q': query}).json()['results']]
+
+    def test_exact_code_comes_first(self):
+        self.assertEqual(self.search('rf-75511')[0], self.set.pk)
+
+    def test_cyrillic_substring_is_case_insensitive(self):
+        self.assertEqual(set(self.search('КЛЮЧ')), {self.wrench.pk, self.set.pk})
+        self.assertEqual(self.search('слесар'), [self.hammer.pk])
+
+    def test_name_match_ranks_above_description(self):
+        self.assertEqual(self.search('рожковый'), [self.wrench.pk, self.set.pk])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.hammer.name = 'Кувалда'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hammer.save()
+        self.assertEqual(self.search('кувалд'), [self.hammer.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hammer.delete()
+        self.assertEqual(self.search('кувалд'), [])
+
+    def test_memory_index_fallback(self):
+        from goods.search import TrigramIndex
+        index = TrigramIndex()
+        self.assertEqual(index.search('рожковый', 10), [self.wrench.pk, self.set.pk])
+        self.assertEqual(index.search('75510', 10), [self.wrench.pk])
+
+    def test_database_trigram_search_matches_memory_ranking(self):
+        from goods.search import TrigramIndex, _trigram_db_search
+        # в SQLite ILIKE кириллицы чувствителен к регистру — запросы в регистре данных
+        for query in ('рожковый', '75510', 'рожковый 10х12'):
+            self.assertEqual(_trigram_db_search(query, 10), TrigramIndex().search(query, 10))
+
+    def test_search_engine_follows_database(self):
+        from goods.search import FTS5, MEMORY, fts_available, search_engine
+        self.assertEqual(search_engine(), FTS5 if fts_available() else MEMORY)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Инструмент', slug='tools')
+        self.product = Product.objects.create(code='RF-75510', name='Ключ', category=self.category)
+
+    def test_repeated_catalog_hit_skips_database(self):
+        self.client.get('/goods/products/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/goods/products/').status_code, 200)
+
+    def test_conditional_get_returns_not_modified(self):
+        response = self.client.get(f'/goods/product/{self.product.pk}/')
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/goods/product/{self.product.pk}/',
+                                       HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_saves_invalidate_cached_responses(self):
+        self.client.get(f'/goods/product/{self.product.pk}/')
+        self.client.get('/goods/products/')
+        self.product.name = 'Ключ рожковый'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertContains(self.client.get(f'/goods/product/{self.product.pk}/'), 'Ключ рожковый')
+        self.assertContains(self.client.get('/goods/products/'), 'Ключ рожковый')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Крепёж', slug='fasteners')
+        self.assertContains(self.client.get('/goods/products/'), 'Крепёж')
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tools = Category.objects.create(name='Инструмент', slug='instrument')
+        self.wrench = Product.objects.create(code='RF-1', name='Ключ', category=self.tools)
+        self.hammer = Product.objects.create(code='HM-1', name='Молоток', description='Слесарный')
+
+    def run_import(self, text, **kwargs):
+        errors = []
+        rows = read_rows(io.BytesIO(text.encode('utf-8')), 'price.csv')
+        with self.captureOnCommitCallbacks(execute=True):
+            result = import_catalog(rows, on_error=errors.append, batch_size=2, **kwargs)
+        return result, errors
+
+    def test_upsert_counts_and_category_paths(self):
+        updated_at = self.hammer.updated_at
+        result, errors = self.run_import(
+            "Артикул;Наименование;Категория;Описание\n"
+            "RF-1;Ключ рожковый;Инструмент/Ключи;\n"
+            "HM-1;;;\n"
+            "NEW-1;Отвёртка;инструмент / Отвёртки / Крестовые;PH2\n"
+            "NEW-2;;Крепёж;\n"
+            "RF-1;Дубль;;\n"
+            "NEW-3;Шуруп;Крепёж;\n"
+        )
+        self.assertEqual([(error.line, error.code) for error in errors], [(5, 'NEW-2'), (6, 'RF-1')])
+        self.assertEqual((result.rows, result.created, result.updated, result.unchanged, result.categories),
+                         (6, 2, 1, 1, 4))
+
+        self.wrench.refresh_from_db()
+        self.assertEqual((self.wrench.name, self.wrench.category.name), ('Ключ рожковый', 'Ключи'))
+        self.assertEqual(list(self.wrench.category.get_ancestors()), [self.tools])
+        self.hammer.refresh_from_db()
+        self.assertEqual((self.hammer.description, self.hammer.updated_at), ('Слесарный', updated_at))
+        screwdriver = Product.objects.get(code='NEW-1')
+        self.assertEqual([c.name for c in screwdriver.category.get_ancestors(include_self=True)],
+                         ['Инструмент', 'Отвёртки', 'Крестовые'])
+        self.assertEqual(screwdriver.category.depth, 2)
+        self.assertEqual(Category.objects.get(name='Крепёж').slug, 'krepezh')
+        self.assertEqual(Product.objects.in_category(self.tools).count(), 2)
+        self.assertEqual([item['id'] for item in self.client.get('/goods/search/', {'q': 'Отвёртка'}).json()['results']],
+                         [screwdriver.pk])
+
+        result, errors = self.run_import("code,name,category\nRF-1,Ключ рожковый,Инструмент/Ключи\nNEW-3,Шуруп,\n")
+        self.assertEqual((result.created, result.updated, result.unchanged, result.categories), (0, 0, 2, 0))
+
+    def test_dry_run_counts_without_writing(self):
+        result, errors = self.run_import("code,name,category\nRF-1,Ключ,Новая/Ветка\nNEW-1,Отвёртка,Новая\n",
+                                         dry_run=True)
+        self.assertEqual((result.created, result.updated, result.categories, errors), (1, 1, 2, []))
+        self.assertFalse(Product.objects.filter(code='NEW-1').exists())
+        self.assertEqual(Category.objects.count(), 1)
+
+    def test_slugs_are_allocated_in_one_pass(self):
+        Category.objects.create(name='Ключи', slug='klyuchi')
+        Category.objects.create(name='ключи', slug='klyuchi-1')
+        with self.assertNumQueries(1):
+            slugs = Category.allocate_slugs(['Ключи', 'КЛЮЧИ', '???', 'Инструмент'])
+        self.assertEqual(slugs, ['klyuchi-2', 'klyuchi-3', 'category', 'instrument-1'])
+        self.assertEqual(Category.objects.create(name='Ключи').slug, 'klyuchi-2')
+
+
+class AsyncViewTests(TestCase):
+    """Асинхронные подсказки поиска (профиль asgi) отдают то же, что синхронные"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.root = Category.objects.create(name='Инструмент', slug='tools')
+        cls.child = Category.objects.create(name='Ключи', slug='keys', parent=cls.root)
+        cls.wrench = Product.objects.create(code='RF-75510', name='Ключ рожковый 10х12', category=cls.child)
+        cls.set = Product.objects.create(code='RF-75511', name='Набор ключей', category=cls.root)
+        ProductImage.objects.create(product=cls.wrench, image='products/RF-75510/rf.jpg', is_main=True)
+
+    def setUp(self):
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+
+    def sync_content(self, path, params=None):
+        content = self.client.get(path, params).content
+        cache.clear()
+        return content
+
+    async def test_search_matches_sync_view(self):
+        cases = [
+            (views.asearch_products, '/goods/search/', {'q': 'ключ'}, {}),
+            (views.asearch_products, '/goods/search/', {'q': 'RF-75511'}, {}),
+            (views.asearch_products, '/goods/search/', {'q': 'кл'}, {}),
+        ]
+        for view, path, params, kwargs in cases:
+            with self.subTest(path=path, params=params):
+                expected = await sync_to_async(self.sync_content)(path, params)
+                response = await view(self.factory.get(path, params), **kwargs)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, expected)
+                self.assertTrue(response.has_header('ETag'))
+
+    async def test_cached_responses(self):
+        first = await views.asearch_products(self.factory.get('/goods/search/', {'q': 'набор'}))
+        response = await views.asearch_products(self.factory.get('/goods/search/', {'q': 'набор'},
+                                                                  headers={'If-None-Match': first['ETag']}))
+        self.assertEqual(response.status_code, 304)
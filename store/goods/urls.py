@@ -1,15 +1,22 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'goods'
 
+# Под ASGI (профиль store.settings.asgi) подсказки поиска обслуживает асинхронное представление
+ASYNC = settings.ASYNC_VIEWS
+
 urlpatterns = [
     # Каталог товаров
     path('products/', views.products_view, name='products_view'),
 
+    # Подгрузка страниц каталога (JSON, бесконечная прокрутка)
+    path('products/feed/', views.products_feed, name='products_feed'),
+
     # Детали товара
     path('product/<int:pk>/', views.product_detail, name='product_detail'),
 
     # Поиск товаров
-    path('search/', views.search_products, name='search_products'),
+    path('search/', views.asearch_products if ASYNC else views.search_products, name='search_products'),
 ]
\ No newline at end of file
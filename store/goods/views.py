@@ -1,29 +1,101 @@
 # app goods views
 
+from django.core.exceptions import ObjectDoesNotExist
 from django.shortcuts import render
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse
+from django.urls import reverse
+from goods import search
+from goods.cache import cache_response, set_last_modified
 from goods.models import Product, Category
+from goods.pagination import keyset_page
 
 
+def _catalog_queryset(request):
+    """Товары каталога с учётом фильтра ?category=<slug> (включая подкатегории)"""
+    products = Product.objects.select_related('stock').with_main_image()
+    category = None
+    slug = request.GET.get('category')
+    if slug:
+        category = get_object_or_404(Category, slug=slug)
+        products = products.in_category(category)
+    return products, category
 
+
+def _product_card(product):
+    main_image = product.main_image
+    return {
+        'id': product.id,
+        'code': product.code,
+        'name': product.name,
+        'url': reverse('goods:product_detail', args=[product.id]),
+        'image': main_image.card_url if main_image else None,
+        'availability': product.get_availability_status(),
+        'in_stock': product.on_hand > 0,
+    }
+
+
+def _modified_at(product):
+    """Даты, от которых зависит ответ о товаре: правка товара и последнее движение остатков"""
+    try:
+        return product.updated_at, product.stock.last_movement_at
+    except ObjectDoesNotExist:
+        return (product.updated_at,)
+
+
+def _search_results(products):
+    return {'results': [{
+        'id': p.id,
+        'name': p.name,
+        'code': p.code,
+        'url': reverse('goods:product_detail', args=[p.id]),
+    } for p in products]}
+
+
+@cache_response('products_view')
 def products_view(request):
-    categories = Category.objects.prefetch_related('children')
-    products = Product.objects.all()
-    return render(request, 'store/goods.html', {
+    categories = Category.build_tree(Category.objects.with_subtree_product_count())
+    products, category = _catalog_queryset(request)
+    page, next_cursor = keyset_page(products, request.GET.get('after'))
+    response = render(request, 'store/goods.html', {
         'categories': categories,
-        'products': products
+        'products': page,
+        'current_category': category,
+        'breadcrumbs': category.get_ancestors() if category else [],
+        'next_cursor': next_cursor,
     })
+    return set_last_modified(response, *(ts for product in page for ts in _modified_at(product)))
 
+
+@cache_response('products_view')
+def products_feed(request):
+    """JSON-страница каталога для бесконечной прокрутки"""
+    products, _ = _catalog_queryset(request)
+    page, next_cursor = keyset_page(products, request.GET.get('after'))
+    return JsonResponse({
+        'results': [_product_card(product) for product in page],
+        'next': next_cursor,
+    })
+
+
+@cache_response('search_products')
 def search_products(request):
     query = request.GET.get('q', '')
-    results = []
-    if query:
-        products = Product.objects.filter(name__icontains=query)[:10]
-        results = [{'id': p.id, 'name': p.name} for p in products]
-    return JsonResponse({'results': results})
+    return JsonResponse(_search_results(search.search_products(query) if query else []))
+
+
+@cache_response('search_products')
+async def asearch_products(request):
+    """
+    search_products для ASGI (settings.ASYNC_VIEWS): подсказки — самый частый запрос витрины,
+    ответ из кэша отдаётся без потока. Сам поиск — тот же синхронный, в потоке sync_to_async.
+    """
+    query = request.GET.get('q', '')
+    return JsonResponse(_search_results(await search.asearch_products(query) if query else []))
 
 
+@cache_response('product_detail', product_kwarg='pk')
 def product_detail(request, pk):
-    product = get_object_or_404(Product, pk=pk)
-    return render(request, 'store/product_detail.html', {'product': product})
\ No newline at end of file
+    product = get_object_or_404(Product.objects.select_related('stock').with_images(), pk=pk)
+    response = render(request, 'store/product_detail.html', {'product': product})
+    return set_last_modified(response, *_modified_at(product), *(image.created_at for image in product.images))
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import Count, Q
 from .models import Request, RequestItem
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
@@ -20,6 +21,7 @@ class RequestItemInline(admin.TabularInline):
         'total_cost_display'
     )
     readonly_fields = ('delivery_progress', 'total_cost_display')
+    autocomplete_fields = ('supplier', 'customer')
 
     def delivery_progress(self, obj):
         """Отображает прогресс поставки с цветовой индикацией"""
@@ -58,12 +60,27 @@ class RequestAdmin(admin.ModelAdmin):
         'notes_short',
         'items_count'
     )
-    list_filter = ('status', 'created_at')
+    list_filter = ('status', 'auto_planned', 'created_at')
     search_fields = ('notes', 'items__product__name')
     inlines = (RequestItemInline,)
     fields = ('status', 'notes', 'created_at')
     readonly_fields = ('created_at',)
 
+    def get_queryset(self, request):
+        # Счётчики позиций — аннотациями, а не двумя-тремя count() на строку
+        return super().get_queryset(request).annotate(
+            items_total=Count('items', distinct=True),
+            items_completed=Count('items', filter=Q(items__is_completed=True), distinct=True),
+        )
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Правленный вручную кандидат планировщика больше не заменяется при следующем запуске
+        if change and form.instance.auto_planned and (
+                form.has_changed() or any(formset.has_changed() for formset in formsets)):
+            Request.objects.filter(pk=form.instance.pk).update(auto_planned=False)
+            form.instance.auto_planned = False
+
     def status_display(self, obj):
         status_colors = {
             'candidate': 'orange',
@@ -81,9 +98,8 @@ class RequestAdmin(admin.ModelAdmin):
 
     def completion_status(self, obj):
         """Отображает статус выполнения всей заявки"""
-        # Считаем прогресс по всем позициям
-        total_items = obj.items.count()
-        completed_items = obj.items.filter(is_completed=True).count()
+        total_items = obj.items_total
+        completed_items = obj.items_completed
 
         # Если нет позиций
         if total_items == 0:
@@ -102,6 +118,7 @@ class RequestAdmin(admin.ModelAdmin):
         )
 
     completion_status.short_description = _('Выполнение')
+    completion_status.admin_order_field = 'items_completed'
 
     def notes_short(self, obj):
         return obj.notes[:50] + '...' if obj.notes else ''
@@ -109,9 +126,10 @@ class RequestAdmin(admin.ModelAdmin):
     notes_short.short_description = _('Примечания')
 
     def items_count(self, obj):
-        return obj.items.count()
+        return obj.items_total
 
     items_count.short_description = _('Товаров')
+    items_count.admin_order_field = 'items_total'
 
 
 @admin.register(RequestItem)
@@ -129,8 +147,10 @@ class RequestItemAdmin(admin.ModelAdmin):
         'customer'
     )
     list_filter = ('request__status', 'is_completed')
-    search_fields = ('product__name', 'request__id')
+    search_fields = ('product__name', 'request__id', 'supplier__name', 'customer__name')
     list_editable = ('is_completed',)
+    list_select_related = ('product', 'request', 'supplier', 'customer')
+    autocomplete_fields = ('supplier', 'customer')
 
     def request_link(self, obj):
         return format_html(
@@ -181,4 +201,6 @@ class RequestItemAdmin(admin.ModelAdmin):
                 obj.delivered_quantity = obj.quantity
             else:
                 obj.delivered_quantity = 0
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
+        if change:
+            Request.objects.filter(pk=obj.request_id, auto_planned=True).update(auto_planned=False)
\ No newline at end of file
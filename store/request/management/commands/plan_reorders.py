@@ -0,0 +1,67 @@
+# request/management/commands/plan_reorders.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from request.planning import create_candidates, plan_reorders, previous_candidates
+
+
+class Command(BaseCommand):
+    help = ("Создаёт заявки-кандидаты по скорости продаж: дозаказ товаров, у которых доступный остаток "
+            "и ожидаемые поставки не покрывают спрос за срок поставки со страховым запасом. "
+            "Прежние кандидаты планировщика заменяются.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=28, help='Окно истории продаж, дней')
+        parser.add_argument('--lead-time', type=int, default=7, help='Срок поставки, дней')
+        parser.add_argument('--cover', type=int, default=14, help='На сколько дней после поставки заказывать')
+        parser.add_argument('--service-z', type=float, default=1.65,
+                            help='Страховой запас в стандартных отклонениях дневных продаж (1.65 ≈ 95%%)')
+        parser.add_argument('--date', help='Дата расчёта (ГГГГ-ММ-ДД), по умолчанию сегодня')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать предложения')
+        parser.add_argument('--keep-previous', action='store_true',
+                            help='Не удалять прежних кандидатов планировщика (их позиции считаются ожидаемыми)')
+        parser.add_argument('--show', type=int, default=20, help='Сколько предложений вывести')
+
+    def handle(self, *args, **options):
+        today = parse_date(options['date']) if options['date'] else None
+        if options['date'] and today is None:
+            raise CommandError(f"Некорректная дата «{options['date']}»")
+        if min(options['window'], options['lead_time']) < 1 or options['cover'] < 0:
+            raise CommandError("Окно и срок поставки — не меньше 1 дня, покрытие — не меньше 0")
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            replaced = 0
+            if not options['keep_previous']:
+                replaced = previous_candidates().count()
+                previous_candidates().delete()
+            suggestions = plan_reorders(today, options['window'], options['lead_time'],
+                                        options['cover'], options['service_z'])
+            requests = [] if options['dry_run'] else create_candidates(suggestions)
+            if options['dry_run']:
+                transaction.set_rollback(True)
+        elapsed = time.perf_counter() - started
+
+        for suggestion in suggestions[:options['show']]:
+            self.stdout.write(
+                f"  товар #{suggestion.product_id}: заказать {suggestion.quantity} "
+                f"(продаж в день {suggestion.velocity}, в наличии {suggestion.on_hand}, "
+                f"ожидается {suggestion.open_quantity})"
+            )
+        unpriced = sum(1 for suggestion in suggestions if not suggestion.price)
+        if unpriced:
+            self.stdout.write(self.style.WARNING(
+                f"Без цены в прежних заявках: {unpriced} товаров — в кандидаты не включены"))
+        suggestions = [suggestion for suggestion in suggestions if suggestion.price]
+        total = sum(suggestion.quantity for suggestion in suggestions)
+        if options['dry_run']:
+            self.stdout.write(f"Предложено {len(suggestions)} позиций, {total} единиц; ничего не записано "
+                              f"({elapsed:.2f} с)")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано заявок-кандидатов: {len(requests)}, позиций {len(suggestions)}, единиц {total}; "
+            f"заменено прежних: {replaced} ({elapsed:.2f} с)"
+        ))
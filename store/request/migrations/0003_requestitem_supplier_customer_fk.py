@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:30
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, OuterRef, Subquery, Value, When
+
+# Значения по умолчанию прежних текстовых полей — связи с ними не создаются
+SUPPLIER_PLACEHOLDERS = ('неизвестный поставщик',)
+CUSTOMER_PLACEHOLDERS = ('покупатель',)
+
+# Сопоставление заморожено в миграции и не зависит от текущего кода приложения.
+# Одной записью справочника считаются только названия, совпавшие после нормализации
+# (регистр, ё/е, пунктуация, ООО/ИП/АО...); похожие названия становятся отдельными записями —
+# возможные дубли потом выводит команда find_similar_counterparties.
+LEGAL_FORMS_RE = re.compile(r'\b(?:ооо|оао|зао|пао|ао|ип|нко|llc|ltd|inc)\b')
+PUNCTUATION_RE = re.compile(r'[^\w\s]+')
+BATCH_SIZE = 500
+
+
+def normalize_name(name):
+    name = (name or '').casefold().replace('ё', 'е')
+    return ' '.join(LEGAL_FORMS_RE.sub(' ', PUNCTUATION_RE.sub(' ', name)).split())
+
+
+def link_by_name(model, name_field, fk_field, target, ignore=()):
+    """Проставляет model.fk_field по тексту model.name_field; ненайденные названия добавляются в target"""
+    ignored = {normalize_name(name) for name in ignore}
+    by_key = {}
+    for pk, name in target.objects.order_by('pk').values_list('pk', 'name'):
+        by_key.setdefault(normalize_name(name), pk)
+    names = [name for name in model.objects.order_by().values_list(name_field, flat=True).distinct()
+             if normalize_name(name) and normalize_name(name) not in ignored]
+
+    new = {}
+    for name in names:
+        key = normalize_name(name)
+        if key not in by_key and key not in new:
+            new[key] = target(name=name.strip()[:255])
+    target.objects.bulk_create(new.values())
+    by_key.update((key, record.pk) for key, record in new.items())
+
+    for start in range(0, len(names), BATCH_SIZE):
+        chunk = names[start:start + BATCH_SIZE]
+        model.objects.filter(**{f'{name_field}__in': chunk}).update(**{fk_field: Case(
+            *(When(**{name_field: name}, then=Value(by_key[normalize_name(name)])) for name in chunk),
+        )})
+
+
+def link_counterparties(apps, schema_editor):
+    RequestItem = apps.get_model('request', 'RequestItem')
+    link_by_name(RequestItem, 'supplier_name', 'supplier', apps.get_model('suppliers', 'Supplier'),
+                 ignore=SUPPLIER_PLACEHOLDERS)
+    link_by_name(RequestItem, 'customer_name', 'customer', apps.get_model('customers', 'Customer'),
+                 ignore=CUSTOMER_PLACEHOLDERS)
+
+
+def restore_names(apps, schema_editor):
+    RequestItem = apps.get_model('request', 'RequestItem')
+    for field, model, placeholder in (('supplier', 'suppliers.Supplier', SUPPLIER_PLACEHOLDERS[0]),
+                                      ('customer', 'customers.Customer', CUSTOMER_PLACEHOLDERS[0])):
+        names = apps.get_model(model).objects.filter(pk=OuterRef(f'{field}_id')).values('name')[:1]
+        RequestItem.objects.filter(**{f'{field}__isnull': False}).update(**{f'{field}_name': Subquery(names)})
+        RequestItem.objects.filter(**{f'{field}__isnull': True}).update(**{f'{field}_name': placeholder})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+        ('request', '0002_requestitem_delivered_quantity_and_more'),
+        ('suppliers', '0002_alter_supplier_contact_person_alter_supplier_phone'),
+    ]
+
+    operations = [
+        migrations.RenameField(model_name='requestitem', old_name='supplier', new_name='supplier_name'),
+        migrations.RenameField(model_name='requestitem', old_name='customer', new_name='customer_name'),
+        migrations.AddField(
+            model_name='requestitem',
+            name='supplier',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='request_items', to='suppliers.supplier', verbose_name='Поставщик'),
+        ),
+        migrations.AddField(
+            model_name='requestitem',
+            name='customer',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='request_items', to='customers.customer', verbose_name='Покупатель'),
+        ),
+        migrations.RunPython(link_counterparties, restore_names),
+        migrations.RemoveField(model_name='requestitem', name='supplier_name'),
+        migrations.RemoveField(model_name='requestitem', name='customer_name'),
+        migrations.AddIndex(
+            model_name='requestitem',
+            index=models.Index(fields=['supplier', 'is_completed'], name='request_item_supplier_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestitem',
+            index=models.Index(fields=['customer', 'is_completed'], name='request_item_customer_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:25
+
+from django.db import migrations, models
+
+
+def mark_planner_candidates(apps, schema_editor):
+    """Прежде кандидаты планировщика узнавались по пометке в примечаниях"""
+    Request = apps.get_model('request', 'Request')
+    Request.objects.filter(status='candidate', notes__startswith='Автозаказ').update(auto_planned=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('request', '0003_requestitem_supplier_customer_fk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='request',
+            name='auto_planned',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Автозаказ'),
+        ),
+        migrations.RunPython(mark_planner_candidates, migrations.RunPython.noop),
+    ]
@@ -13,6 +13,8 @@ class Request(models.Model):
     created_at = models.DateTimeField(_('Дата создания'), auto_now_add=True)
     status = models.CharField(_('Статус'), max_length=20, choices=Status.choices, default=Status.CANDIDATE)
     notes = models.TextField(_('Примечания'), blank=True)
+    # Кандидат создан планировщиком и не правился вручную — его заменит следующий запуск plan_reorders
+    auto_planned = models.BooleanField(_('Автозаказ'), default=False, editable=False)
 
     class Meta:
         verbose_name = _('Заявка')
@@ -30,8 +32,18 @@ class RequestItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='request_items', verbose_name=_('Товар'))
     quantity = models.PositiveIntegerField(_('Количество'), default=1)
     price_per_unit = models.DecimalField(_('Цена за единицу'), max_digits=10, decimal_places=2, default=0)
-    supplier = models.CharField(_('Поставщик'), max_length=255, default='неизвестный поставщик')
-    customer = models.CharField(_('Покупатель'), max_length=255, default='покупатель')
+    # Индексы FK покрыты составными индексами (supplier/customer, is_completed) — см. Meta
+    supplier = models.ForeignKey('suppliers.Supplier', on_delete=models.PROTECT, null=True, blank=True,
+                                 db_index=False, related_name='request_items', verbose_name=_('Поставщик'))
+    customer = models.ForeignKey('customers.Customer', on_delete=models.PROTECT, null=True, blank=True,
+                                 db_index=False, related_name='request_items', verbose_name=_('Покупатель'))
+
+    class Meta:
+        indexes = [
+            # Открытые позиции поставщика или покупателя (незакрытый остаток к поставке)
+            models.Index(fields=['supplier', 'is_completed'], name='request_item_supplier_idx'),
+            models.Index(fields=['customer', 'is_completed'], name='request_item_customer_idx'),
+        ]
 
     def clean(self):
         super().clean()
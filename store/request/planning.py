@@ -0,0 +1,163 @@
+# app request/planning
+"""
+Планирование закупок: кандидаты в заявки по скорости продаж.
+
+Для каждого товара с продажами за окно window_days считаются средние
+чистые продажи в день (продажи минус возвраты, по сводке ProductDailySales)
+и их разброс. Точка заказа — спрос за срок поставки плюс страховой запас
+(service_z стандартных отклонений); если доступный остаток единиц и
+ожидаемые поставки по открытым позициям заявок не дотягивают до неё,
+товар дозаказывается до спроса за срок поставки и cover_days дней.
+
+Данные читаются четырьмя агрегирующими запросами (без цикла по товарам),
+расчёт идёт сразу по всем товарам массивами NumPy; без NumPy — тем же
+расчётом на списках Python (медленнее, но без зависимости).
+"""
+import math
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Subquery, Sum
+from django.utils import timezone
+
+from request.models import Request, RequestItem
+from sale.models import ProductDailySales
+from store.instrumentation import get_logger, timed
+from unit.models import ProductUnit
+
+try:
+    import numpy
+except ImportError:  # NumPy необязателен
+    numpy = None
+
+logger = get_logger('request.planning')
+
+AUTO_NOTE_PREFIX = 'Автозаказ'
+CREATE_BATCH_SIZE = 1000
+
+Suggestion = namedtuple('Suggestion', 'product_id quantity velocity on_hand open_quantity price supplier_id')
+
+
+def _sales_stats(start, end):
+    """{product_id: (сумма чистых продаж за окно, сумма их квадратов по дням)}"""
+    net = F('sold_count') - F('returned_count')
+    rows = (ProductDailySales.objects.between(start, end).order_by().values('product_id')
+            .annotate(total=Sum(net), squares=Sum(net * net)).values_list('product_id', 'total', 'squares'))
+    return {product_id: (total or 0, squares or 0) for product_id, total, squares in rows}
+
+
+def _on_hand():
+    rows = (ProductUnit.objects.available().order_by().values('product_id')
+            .annotate(count=Count('id')).values_list('product_id', 'count'))
+    return dict(rows)
+
+
+def _open_quantities():
+    """Ещё не поставленное по незакрытым позициям всех заявок, включая кандидатов"""
+    rows = (RequestItem.objects.filter(is_completed=False).order_by().values('product_id')
+            .annotate(open=Sum(F('quantity') - F('delivered_quantity'))).values_list('product_id', 'open'))
+    return {product_id: max(quantity or 0, 0) for product_id, quantity in rows}
+
+
+def _last_terms():
+    """
+    Цена и поставщик из последней позиции заявки каждого товара с ненулевой ценой:
+    {product_id: (цена, supplier_id)}. Позиции без цены (новые кандидаты) не учитываются.
+    """
+    last = (RequestItem.objects.filter(price_per_unit__gt=0).order_by().values('product_id')
+            .annotate(last=Max('id')).values('last'))
+    rows = (RequestItem.objects.filter(pk__in=Subquery(last))
+            .values_list('product_id', 'price_per_unit', 'supplier_id'))
+    return {product_id: (price, supplier_id) for product_id, price, supplier_id in rows}
+
+
+def _order_quantities(totals, squares, stock, window_days, lead_time_days, cover_days, service_z):
+    """Скорость продаж и количества к заказу по массивам товаров"""
+    if numpy is not None:
+        totals, squares, stock = (numpy.asarray(values, dtype=float) for values in (totals, squares, stock))
+        velocity = totals / window_days
+        deviation = numpy.sqrt(numpy.maximum(squares / window_days - velocity ** 2, 0))
+        safety = service_z * deviation * math.sqrt(lead_time_days)
+        reorder_point = velocity * lead_time_days + safety
+        target = velocity * (lead_time_days + cover_days) + safety
+        quantity = numpy.where((velocity > 0) & (stock <= reorder_point), numpy.ceil(target - stock), 0)
+        return velocity.tolist(), numpy.maximum(quantity, 0).astype(int).tolist()
+
+    velocities, quantities = [], []
+    for total, square, available in zip(totals, squares, stock):
+        velocity = total / window_days
+        safety = service_z * math.sqrt(max(square / window_days - velocity ** 2, 0)) * math.sqrt(lead_time_days)
+        quantity = 0
+        if velocity > 0 and available <= velocity * lead_time_days + safety:
+            quantity = max(math.ceil(velocity * (lead_time_days + cover_days) + safety - available), 0)
+        velocities.append(velocity)
+        quantities.append(quantity)
+    return velocities, quantities
+
+
+@timed(logger, 'planning.plan_reorders')
+def plan_reorders(today=None, window_days=28, lead_time_days=7, cover_days=14, service_z=1.65):
+    """Список Suggestion для товаров, которые пора дозаказать, по убыванию скорости продаж"""
+    today = today or timezone.localdate()
+    stats = _sales_stats(today - timedelta(days=window_days - 1), today)
+    if not stats:
+        return []
+    on_hand = _on_hand()
+    open_quantities = _open_quantities()
+
+    product_ids = list(stats)
+    velocities, quantities = _order_quantities(
+        [stats[pk][0] for pk in product_ids],
+        [stats[pk][1] for pk in product_ids],
+        [on_hand.get(pk, 0) + open_quantities.get(pk, 0) for pk in product_ids],
+        window_days, lead_time_days, cover_days, service_z,
+    )
+    ordered = [(pk, quantity, velocity) for pk, quantity, velocity in zip(product_ids, quantities, velocities)
+               if quantity > 0]
+    if not ordered:
+        return []
+
+    terms = _last_terms()
+    suggestions = [
+        Suggestion(pk, quantity, round(velocity, 3), on_hand.get(pk, 0), open_quantities.get(pk, 0),
+                   *terms.get(pk, (0, None)))
+        for pk, quantity, velocity in ordered
+    ]
+    suggestions.sort(key=lambda suggestion: (-suggestion.velocity, suggestion.product_id))
+    return suggestions
+
+
+def previous_candidates():
+    """Заявки-кандидаты, созданные планировщиком ранее, не правленные вручную и не переведённые в заявку"""
+    return Request.objects.filter(status=Request.Status.CANDIDATE, auto_planned=True)
+
+
+@timed(logger, 'planning.create_candidates')
+def create_candidates(suggestions, note=''):
+    """
+    Создаёт заявки-кандидаты: по одной на поставщика (последнего по товару), позиции — bulk_create.
+    Товары без известной цены пропускаются: позицию с нулевой ценой не сохранить после правки.
+    Возвращает созданные заявки.
+    """
+    by_supplier = {}
+    for suggestion in suggestions:
+        if suggestion.price:
+            by_supplier.setdefault(suggestion.supplier_id, []).append(suggestion)
+
+    requests = []
+    with transaction.atomic():
+        for supplier_id, group in by_supplier.items():
+            request = Request.objects.create(
+                status=Request.Status.CANDIDATE,
+                auto_planned=True,
+                notes=f"{AUTO_NOTE_PREFIX} {timezone.localdate():%d.%m.%Y}: {len(group)} позиций. {note}".strip(),
+            )
+            RequestItem.objects.bulk_create(
+                (RequestItem(request=request, product_id=suggestion.product_id, quantity=suggestion.quantity,
+                             price_per_unit=suggestion.price, supplier_id=supplier_id)
+                 for suggestion in group),
+                batch_size=CREATE_BATCH_SIZE,
+            )
+            requests.append(request)
+    return requests
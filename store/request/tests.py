@@ -1,3 +1,142 @@
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from delivery.models import Delivery
+from goods.models import Product
+from request import planning
+from request.models import Request, RequestItem
+from sale.models import ProductDailySales
+from suppliers.models import Supplier
+from unit.issuing import issue_units
+
+
+class ChangeStatusTests(TestCase):
+    def setUp(self):
+        self.url = reverse('request:requests_change_status')
+        product = Product.objects.create(code='RF-1', name='Ключ')
+        self.requests = [Request.objects.create() for _ in range(3)]
+        self.items = [RequestItem.objects.create(request=request, product=product, price_per_unit=Decimal('10'))
+                      for request in self.requests for _ in range(2)]
+
+    def post(self, **data):
+        return self.client.post(self.url, data)
+
+    def statuses(self):
+        return list(Request.objects.order_by('pk').values_list('status', flat=True))
+
+    def test_many_items_move_their_requests_in_one_update(self):
+        ids = [item.pk for item in self.items[:4]]
+        with self.assertNumQueries(4):  # чтение позиций и один UPDATE внутри точки сохранения теста
+            response = self.post(item_ids=ids, status=Request.Status.IN_REQUEST)
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['updated'], 2)
+        self.assertEqual(self.statuses(), [Request.Status.IN_REQUEST] * 2 + [Request.Status.CANDIDATE])
+        self.assertEqual(data['items'][str(ids[0])], {'result': 'updated', 'request_id': self.requests[0].pk})
+
+    def test_per_id_results(self):
+        Request.objects.filter(pk=self.requests[1].pk).update(status=Request.Status.EXTRA)
+        response = self.post(item_ids=f'{self.items[0].pk},999,abc', request_ids=[self.requests[1].pk, 998],
+                             status=Request.Status.EXTRA)
+        data = response.json()
+        self.assertEqual(data['updated'], 1)
+        self.assertEqual({key: value['result'] for key, value in data['items'].items()},
+                         {str(self.items[0].pk): 'updated', '999': 'not_found', 'abc': 'invalid'})
+        self.assertEqual({key: value['result'] for key, value in data['requests'].items()},
+                         {str(self.requests[1].pk): 'unchanged', '998': 'not_found'})
+
+    def test_single_item_and_validation(self):
+        self.assertTrue(self.post(item_id=self.items[5].pk, status='in_request').json()['success'])
+        self.assertEqual(self.statuses()[2], Request.Status.IN_REQUEST)
+
+        response = self.post(item_ids=self.items[0].pk, status='done')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('done', response.json()['error'])
+        self.assertEqual(self.post(status='extra').status_code, 400)
+        self.assertEqual(self.statuses()[0], Request.Status.CANDIDATE)
+
+
+class ReorderPlanningTests(TestCase):
+    today = date(2025, 3, 28)
+
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name='Автодеталь')
+        self.fast, self.slow, self.idle = (Product.objects.create(code=f'RF-{i}', name=f'Ключ {i}') for i in range(3))
+        request = Request.objects.create(status=Request.Status.IN_REQUEST)
+        Request.objects.filter(pk=request.pk).update(created_at=timezone.now() - timedelta(days=60))
+        for product in (self.fast, self.slow, self.idle):
+            item = RequestItem.objects.create(request=request, product=product, quantity=4, supplier=self.supplier,
+                                              price_per_unit=Decimal('70'))
+            issue_units(Delivery.objects.create(request_item=item, quantity=4,
+                                                delivery_date=timezone.localdate() - timedelta(days=30)))
+        # Быстрый товар: 3 в день весь период; медленный: 1 продажа за 4 недели
+        ProductDailySales.objects.bulk_create(
+            [ProductDailySales(date=self.today - timedelta(days=day), product=self.fast, sold_count=3)
+             for day in range(28)]
+            + [ProductDailySales(date=self.today, product=self.slow, sold_count=1)]
+        )
+
+    def test_only_products_below_reorder_point_are_suggested(self):
+        suggestions = planning.plan_reorders(self.today, lead_time_days=7, cover_days=14)
+        self.assertEqual([s.product_id for s in suggestions], [self.fast.pk])
+        suggestion = suggestions[0]
+        # Спрос 3 в день на 21 день без разброса, минус 4 единицы в наличии
+        self.assertEqual((suggestion.quantity, suggestion.velocity, suggestion.on_hand), (59, 3.0, 4))
+        self.assertEqual((suggestion.price, suggestion.supplier_id), (Decimal('70'), self.supplier.pk))
+
+        with mock.patch.object(planning, 'numpy', None):
+            self.assertEqual(planning.plan_reorders(self.today, lead_time_days=7, cover_days=14), suggestions)
+
+    def test_command_replaces_previous_candidates(self):
+        options = {'date': self.today.isoformat(), 'stdout': io.StringIO()}
+        call_command('plan_reorders', dry_run=True, **options)
+        self.assertFalse(planning.previous_candidates().exists())
+
+        call_command('plan_reorders', **options)
+        call_command('plan_reorders', **options)
+        request = planning.previous_candidates().get()
+        item = request.items.get()
+        self.assertEqual((item.product_id, item.quantity, item.supplier_id), (self.fast.pk, 59, self.supplier.pk))
+
+        # Кандидаты, уже переведённые в заявку, считаются ожидаемой поставкой — повторно не заказываются
+        Request.objects.filter(pk=request.pk).update(status=Request.Status.IN_REQUEST)
+        call_command('plan_reorders', **options)
+        self.assertFalse(planning.previous_candidates().exists())
+
+    def test_hand_made_and_edited_candidates_are_kept(self):
+        options = {'date': self.today.isoformat(), 'stdout': io.StringIO()}
+        manual = Request.objects.create(notes='Автозаказ отменён, заказать у другого поставщика')
+        call_command('plan_reorders', **options)
+        planned = planning.previous_candidates().get()
+        # Позиция планировщика, поправленная в админке, делает заявку ручной
+        item = planned.items.get()
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+        response = self.client.post(reverse('admin:request_requestitem_change', args=[item.pk]), {
+            'request': planned.pk, 'product': item.product_id, 'quantity': 40, 'price_per_unit': '75',
+            'delivered_quantity': 0, 'supplier': self.supplier.pk,
+        })
+        self.assertEqual(response.status_code, 302)
+
+        call_command('plan_reorders', **options)
+        self.assertEqual(Request.objects.filter(pk__in=[manual.pk, planned.pk]).count(), 2)
+        self.assertFalse(Request.objects.get(pk=planned.pk).auto_planned)
+
+    def test_products_without_price_are_not_put_into_candidates(self):
+        RequestItem.objects.filter(product=self.fast).update(price_per_unit=0)
+        stdout = io.StringIO()
+        call_command('plan_reorders', date=self.today.isoformat(), stdout=stdout)
+        self.assertFalse(planning.previous_candidates().exists())
+        self.assertIn('Без цены', stdout.getvalue())
 
-# Create your tests here.
+        # Цена берётся из последней позиции с ненулевой ценой, а не из нового кандидата
+        RequestItem.objects.filter(product=self.fast).update(price_per_unit=70)
+        RequestItem.objects.create(request=Request.objects.create(), product=self.fast, quantity=1)
+        self.assertEqual(planning.plan_reorders(self.today)[0].price, Decimal('70'))
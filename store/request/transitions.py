@@ -0,0 +1,80 @@
+# app request/transitions
+"""
+Массовая смена статуса заявок.
+
+Статус принадлежит заявке (Request), поэтому позиция (RequestItem) переводит
+свою заявку целиком. Заявки и позиции читаются одним запросом на вид,
+статус меняется одним UPDATE ... WHERE id IN (...) в транзакции.
+"""
+from django.db import transaction
+
+from request.models import Request, RequestItem
+
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+
+
+class InvalidStatus(ValueError):
+    pass
+
+
+def parse_ids(values):
+    """Разбирает ID из списка строк (допускаются и списки через запятую): (корректные, некорректные)"""
+    ids, invalid = [], []
+    for value in values:
+        for part in str(value).split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if part.isdigit():
+                ids.append(int(part))
+            else:
+                invalid.append(part)
+    return list(dict.fromkeys(ids)), invalid
+
+
+def change_statuses(status, request_ids=(), item_ids=()):
+    """
+    Переводит заявки request_ids и заявки позиций item_ids в статус status.
+    Возвращает {'updated': число заявок, 'requests': {id: результат}, 'items': {id: результат}},
+    где результат — словарь с result (updated / unchanged / not_found / invalid) и request_id.
+    """
+    if status not in Request.Status.values:
+        raise InvalidStatus(f"Неизвестный статус «{status}»")
+    request_ids, invalid_requests = parse_ids(request_ids)
+    item_ids, invalid_items = parse_ids(item_ids)
+
+    with transaction.atomic():
+        current = {}  # заявка -> статус до изменения
+        item_requests = {}
+        if item_ids:
+            rows = (RequestItem.objects.select_for_update().filter(pk__in=item_ids)
+                    .values_list('pk', 'request_id', 'request__status'))
+            for item_id, request_id, request_status in rows:
+                item_requests[item_id] = request_id
+                current[request_id] = request_status
+        missing = [pk for pk in request_ids if pk not in current]
+        if missing:
+            current.update(Request.objects.select_for_update().filter(pk__in=missing).values_list('pk', 'status'))
+
+        changing = [pk for pk, old_status in current.items() if old_status != status]
+        updated = Request.objects.filter(pk__in=changing).update(status=status) if changing else 0
+
+    def result(request_id):
+        if request_id not in current:
+            return {'result': NOT_FOUND, 'request_id': None}
+        return {'result': UPDATED if request_id in changing else UNCHANGED, 'request_id': request_id}
+
+    return {
+        'updated': updated,
+        'requests': {
+            **{pk: result(pk) for pk in request_ids},
+            **{pk: {'result': INVALID, 'request_id': None} for pk in invalid_requests},
+        },
+        'items': {
+            **{pk: result(item_requests.get(pk)) for pk in item_ids},
+            **{pk: {'result': INVALID, 'request_id': None} for pk in invalid_items},
+        },
+    }
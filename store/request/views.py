@@ -2,29 +2,52 @@
 from django.shortcuts import render
 from django.views.decorators.http import require_POST
 
-from .models import RequestItem
+from .models import Request, RequestItem
+from .transitions import InvalidStatus, change_statuses
+from goods.models import main_image_prefetch
 from django.http import JsonResponse
-from django.shortcuts import render, get_object_or_404
+
+# Ограничение размера одного массового перевода (и длины списка в IN)
+MAX_TRANSITION_IDS = 500
 
 def requests_view(request):
     status = request.GET.get('status', 'candidate')  # по умолчанию показываем кандидатов
-    items = RequestItem.objects.filter(request__status=status).select_related('product', 'request')
+    items = (RequestItem.objects.filter(request__status=status)
+             .select_related('product', 'request', 'supplier', 'customer')
+             .prefetch_related(main_image_prefetch('product__product_images')))
 
     context = {
         'request_items': items,
         'status': status,
+        'statuses': Request.Status.choices,
     }
     return render(request, 'store/requests.html', context)
 
 
+def _transition_args(request):
+    """(status, request_ids, item_ids) из POST или JsonResponse с ошибкой"""
+    item_ids = request.POST.getlist('item_ids') + request.POST.getlist('item_id')
+    request_ids = request.POST.getlist('request_ids')
+    if not (item_ids or request_ids):
+        return JsonResponse({'success': False, 'error': 'Не выбраны позиции или заявки'}, status=400)
+    if sum(len(value.split(',')) for value in item_ids + request_ids) > MAX_TRANSITION_IDS:
+        return JsonResponse({'success': False, 'error': f'Не больше {MAX_TRANSITION_IDS} ID за раз'}, status=400)
+    return request.POST.get('status'), request_ids, item_ids
+
+
 @require_POST
 def change_status(request):
-    item_id = request.POST.get('item_id')
-    new_status = request.POST.get('status')
-
-    item = get_object_or_404(RequestItem, id=item_id)
-    if new_status in ['candidate', 'in_request', 'extra']:
-        item.request.status = new_status
-        item.request.save()
-        return JsonResponse({'success': True})
-    return JsonResponse({'success': False})
\ No newline at end of file
+    """
+    Массовая смена статуса: item_ids и/или request_ids (можно повторять параметр или
+    перечислять через запятую; item_id — для совместимости с одиночным вызовом) и status.
+    Отвечает результатом по каждому ID.
+    """
+    args = _transition_args(request)
+    if isinstance(args, JsonResponse):
+        return args
+    status, request_ids, item_ids = args
+    try:
+        results = change_statuses(status, request_ids=request_ids, item_ids=item_ids)
+    except InvalidStatus as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({'success': True, 'status': status, **results})
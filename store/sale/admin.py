@@ -1,8 +1,9 @@
 # sale/admin.py
 from django.contrib import admin
+from django.db import transaction
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import Sale
+from .models import DailySales, ProductDailySales, Sale
 
 
 @admin.register(Sale)
@@ -10,6 +11,7 @@ class SaleAdmin(admin.ModelAdmin):
     list_display = ('event_link', 'product_unit_link', 'price')
     search_fields = ('product_unit__serial_number', 'event__description')
     list_filter = ('event__trading_day__date',)
+    list_select_related = ('event', 'product_unit')
 
     def event_link(self, obj):
         url = reverse('admin:trading_day_event_change', args=[obj.event_id])
@@ -20,3 +22,50 @@ class SaleAdmin(admin.ModelAdmin):
         url = reverse('admin:unit_productunit_change', args=[obj.product_unit_id])
         return format_html('<a href="{}">{}</a>', url, obj.product_unit.serial_number)
     product_unit_link.short_description = "Карточка товара"
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        # Удаляем по одной, чтобы Sale.delete снял продажу со сводок и остатков
+        for obj in queryset.select_related('product_unit'):
+            obj.delete()
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    """Панель продаж: строки по дням из сводки, итоги и лучшие товары за выбранный период"""
+    list_display = ('date', 'sold_count', 'revenue', 'cost', 'returned_count', 'returned_amount',
+                    'net_revenue_display', 'margin_display')
+    date_hierarchy = 'date'
+    ordering = ('-date',)
+    list_per_page = 62
+    top_products = 10
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def net_revenue_display(self, obj):
+        return obj.net_revenue
+    net_revenue_display.short_description = "Выручка без возвратов"
+
+    def margin_display(self, obj):
+        color = 'green' if obj.margin >= 0 else 'red'
+        return format_html('<span style="color: {};">{}</span>', color, obj.margin)
+    margin_display.short_description = "Маржа"
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        changelist = getattr(response, 'context_data', {}).get('cl')
+        if changelist is not None:
+            # Итоги и рейтинг товаров считаются по сводкам, а не по Sale — объём не зависит от длины истории
+            days = changelist.queryset
+            response.context_data['totals'] = days.totals()
+            response.context_data['top_products'] = list(
+                ProductDailySales.objects.filter(date__in=days.values('date')).by_product()[:self.top_products]
+            )
+        return response
@@ -0,0 +1,85 @@
+# sale/management/commands/benchmark_pos.py
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from unit.issuing import issue_units
+from unit.management.commands.benchmark_issue_units import Command as IssueBenchmark
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Замеряет продажу через кассу (sale:pos_scan): полный цикл запроса с middleware, "
+            "по одному скану на единицу. Все данные создаются во временной транзакции и откатываются.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scans', type=int, default=500)
+        parser.add_argument('--units', type=int, default=20000,
+                            help='Сколько единиц товара в базе во время замера')
+
+    def handle(self, *args, **options):
+        scans = options['scans']
+        timings = []
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                delivery = IssueBenchmark.make_delivery(max(options['units'], scans + 2))
+                issue_units(delivery)
+                serials = list(delivery.product_units.values_list('serial_number', flat=True)[:scans + 2])
+
+                user = User.objects.create_superuser(f'bench-{time.time_ns()}', 'bench@example.com', None)
+                # Адрес не из INTERNAL_IPS — без панели отладки, как у настоящей кассы
+                client = Client(REMOTE_ADDR='203.0.113.10')
+                client.force_login(user)
+                url = reverse('sale:pos_scan')
+
+                # Время сервера — от request_started до request_finished, без кодирования запроса клиентом
+                marks = {}
+
+                def started(**kwargs):
+                    marks['started'] = time.perf_counter()
+
+                def finished(**kwargs):
+                    marks['finished'] = time.perf_counter()
+
+                request_started.connect(started)
+                request_finished.connect(finished)
+                try:
+                    # Прогрев: первый торговый день, подключение, разбор URL
+                    client.post(url, {'serial_number': serials.pop(), 'price': '150'})
+                    # Запросы считаем на отдельном скане: CaptureQueriesContext замедляет курсор
+                    with CaptureQueriesContext(connection) as queries:
+                        client.post(url, {'serial_number': serials.pop(), 'price': '150'})
+                    query_count = len(queries)
+                    for serial in serials:
+                        response = client.post(url, {'serial_number': serial, 'price': '150'})
+                        assert response.status_code == 201, response.content
+                        timings.append((marks['finished'] - marks['started']) * 1000)
+
+                    response = client.post(url, {'serial_number': serials[0], 'price': '150'})
+                    assert response.status_code == 409, response.content
+                    rejected_ms = (marks['finished'] - marks['started']) * 1000
+                finally:
+                    request_started.disconnect(started)
+                    request_finished.disconnect(finished)
+                raise Rollback
+        except Rollback:
+            pass
+
+        timings.sort()
+        self.stdout.write(
+            f"{len(timings)} сканов ({options['units']} единиц в базе): "
+            f"среднее {statistics.mean(timings):.2f} мс, медиана {statistics.median(timings):.2f} мс, "
+            f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} мс, максимум {timings[-1]:.2f} мс, "
+            f"запросов на скан {query_count}; отказ повторной продажи {rejected_ms:.2f} мс"
+        )
@@ -0,0 +1,100 @@
+# sale/management/commands/rebuild_sales_summary.py
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils.dateparse import parse_date
+
+from sale.models import DailySales, ProductDailySales, Sale, SalesSummary
+from trading_day.models import Event
+
+
+class Command(BaseCommand):
+    help = ("Пересобирает сводки продаж (DailySales, ProductDailySales) из Sale. "
+            "С --check только сверяет сводки с фактическими данными.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Только проверить расхождения, ничего не изменяя')
+        parser.add_argument('--from', dest='start', help='Начало периода (ГГГГ-ММ-ДД), по умолчанию вся история')
+        parser.add_argument('--to', dest='end', help='Конец периода (ГГГГ-ММ-ДД) включительно')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def compute(self, start, end):
+        """Сводки за период одним агрегирующим запросом по (дата, товар, тип события)"""
+        sales = Sale.objects.order_by()
+        if start:
+            sales = sales.filter(event__trading_day__date__gte=start)
+        if end:
+            sales = sales.filter(event__trading_day__date__lte=end)
+        rows = (sales.values('event__trading_day__date', 'product_unit__product_id', 'event__type')
+                .annotate(count=Count('id'), amount=Sum('price'),
+                          cost=Sum('product_unit__delivery__price_per_unit')))
+
+        def empty():
+            return dict.fromkeys(SalesSummary.COUNTER_FIELDS, 0)
+
+        daily = defaultdict(empty)
+        products = defaultdict(empty)
+        for row in rows:
+            prefix = 'returned_' if row['event__type'] == Event.EventType.RETURN else ''
+            values = {
+                'returned_count' if prefix else 'sold_count': row['count'],
+                'returned_amount' if prefix else 'revenue': row['amount'] or Decimal('0'),
+                f'{prefix}cost': row['cost'] or Decimal('0'),
+            }
+            day = row['event__trading_day__date']
+            for summary in (daily[day], products[(day, row['product_unit__product_id'])]):
+                for field, value in values.items():
+                    summary[field] += value
+        return daily, products
+
+    @staticmethod
+    def stored(model, start, end):
+        return model.objects.between(start, end).values(
+            'date', *(['product_id'] if model is ProductDailySales else []), *SalesSummary.COUNTER_FIELDS
+        )
+
+    def find_drift(self, daily, products, start, end):
+        drift = 0
+        for model, expected, key in ((DailySales, daily, lambda row: row['date']),
+                                     (ProductDailySales, products, lambda row: (row['date'], row['product_id']))):
+            actual = {key(row): {field: row[field] for field in SalesSummary.COUNTER_FIELDS}
+                      for row in self.stored(model, start, end)}
+            for entry in sorted(set(expected) | set(actual), key=str):
+                zero = dict.fromkeys(SalesSummary.COUNTER_FIELDS, 0)
+                if actual.get(entry, zero) != expected.get(entry, zero):
+                    drift += 1
+                    self.stdout.write(f"{model._meta.verbose_name} {entry}: в сводке {actual.get(entry, zero)}, "
+                                      f"фактически {expected.get(entry, zero)}")
+        return drift
+
+    def handle(self, *args, **options):
+        start = parse_date(options['start']) if options['start'] else None
+        end = parse_date(options['end']) if options['end'] else None
+        daily, products = self.compute(start, end)
+
+        if options['check']:
+            drift = self.find_drift(daily, products, start, end)
+            if drift:
+                raise CommandError(f"Расхождения найдены в {drift} строках сводок")
+            self.stdout.write(self.style.SUCCESS("Сводки продаж совпадают с данными"))
+            return
+
+        with transaction.atomic():
+            DailySales.objects.between(start, end).delete()
+            ProductDailySales.objects.between(start, end).delete()
+            DailySales.objects.bulk_create(
+                (DailySales(date=day, **values) for day, values in daily.items()),
+                batch_size=options['batch_size'],
+            )
+            ProductDailySales.objects.bulk_create(
+                (ProductDailySales(date=day, product_id=product_id, **values)
+                 for (day, product_id), values in products.items()),
+                batch_size=options['batch_size'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Сводки продаж пересобраны: {len(daily)} дней, {len(products)} строк по товарам"
+        ))
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:57
+
+from collections import defaultdict
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+COUNTER_FIELDS = ('sold_count', 'revenue', 'cost', 'returned_count', 'returned_amount', 'returned_cost')
+
+
+def fill_sales_summary(apps, schema_editor):
+    # Замороженная копия rebuild_sales_summary: сводки сразу отражают всю историю продаж.
+    # Сверить их позже — rebuild_sales_summary --check
+    Sale = apps.get_model('sale', 'Sale')
+    DailySales = apps.get_model('sale', 'DailySales')
+    ProductDailySales = apps.get_model('sale', 'ProductDailySales')
+    rows = (Sale.objects.order_by()
+            .values('event__trading_day__date', 'product_unit__product_id', 'event__type')
+            .annotate(count=Count('id'), amount=Sum('price'),
+                      cost=Sum('product_unit__delivery__price_per_unit')))
+
+    def empty():
+        return dict.fromkeys(COUNTER_FIELDS, 0)
+
+    daily = defaultdict(empty)
+    products = defaultdict(empty)
+    for row in rows:
+        prefix = 'returned_' if row['event__type'] == 'return' else ''
+        values = {
+            'returned_count' if prefix else 'sold_count': row['count'],
+            'returned_amount' if prefix else 'revenue': row['amount'] or Decimal('0'),
+            f'{prefix}cost': row['cost'] or Decimal('0'),
+        }
+        day = row['event__trading_day__date']
+        for summary in (daily[day], products[(day, row['product_unit__product_id'])]):
+            for field, value in values.items():
+                summary[field] += value
+
+    DailySales.objects.bulk_create(
+        (DailySales(date=day, **values) for day, values in daily.items()), batch_size=1000,
+    )
+    ProductDailySales.objects.bulk_create(
+        (ProductDailySales(date=day, product_id=product_id, **values)
+         for (day, product_id), values in products.items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0001_initial'),
+        ('goods', '0004_product_search_index'),
+        ('sale', '0002_alter_sale_event_alter_sale_price_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sold_count', models.PositiveIntegerField(default=0, verbose_name='Продано, шт.')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Себестоимость')),
+                ('returned_count', models.PositiveIntegerField(default=0, verbose_name='Возвраты, шт.')),
+                ('returned_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма возвратов')),
+                ('returned_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Себестоимость возвратов')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+            ],
+            options={
+                'verbose_name': 'Продажи за день',
+                'verbose_name_plural': 'Продажи по дням',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sold_count', models.PositiveIntegerField(default=0, verbose_name='Продано, шт.')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Себестоимость')),
+                ('returned_count', models.PositiveIntegerField(default=0, verbose_name='Возвраты, шт.')),
+                ('returned_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма возвратов')),
+                ('returned_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Себестоимость возвратов')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='goods.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Продажи товара за день',
+                'verbose_name_plural': 'Продажи товаров по дням',
+                'ordering': ['-date', 'product'],
+                'indexes': [models.Index(fields=['product', 'date'], name='sale_pds_product_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'product'), name='sale_productdailysales_date_product')],
+            },
+        ),
+        migrations.RunPython(fill_sales_summary, migrations.RunPython.noop),
+    ]
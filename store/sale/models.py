@@ -1,8 +1,24 @@
 # app sale models
-from django.db import models
-from unit.models import ProductUnit
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import F, Sum
+from unit.models import ProductUnit, ProductStock
 from django.utils.translation import gettext_lazy as _
 from trading_day.models import Event
+from store.instrumentation import get_logger, timed
+
+logger = get_logger('sale')
+
+# Вклад одной продажи в сводки: дата торгового дня, возврат ли это, товар, сумма и себестоимость
+class LedgerEntry(namedtuple('LedgerEntry', 'date is_return product_id unit_id price cost')):
+    __slots__ = ()
+
+    @property
+    def stock_key(self):
+        """Вклад в остатки (ProductStock.replace_sale): товар и возврат ли это"""
+        return self.product_id, self.is_return
 
 
 class Sale(models.Model):
@@ -12,3 +28,189 @@ class Sale(models.Model):
 
     def __str__(self):
         return f"Продажа {self.product_unit.serial_number} — {self.price}"
+
+    @classmethod
+    def ledger_entries(cls, **filters):
+        """Вклады продаж в сводки одним запросом (Sale → Event → TradingDay, ProductUnit → Delivery)"""
+        rows = cls.objects.filter(**filters).values_list(
+            'event__trading_day__date', 'event__type', 'product_unit__product_id', 'product_unit_id',
+            'price', 'product_unit__delivery__price_per_unit',
+        )
+        return [
+            LedgerEntry(day, event_type == Event.EventType.RETURN, product_id, unit_id, price, cost or Decimal('0'))
+            for day, event_type, product_id, unit_id, price, cost in rows
+        ]
+
+    @classmethod
+    def ledger_entry(cls, pk):
+        entries = cls.ledger_entries(pk=pk) if pk else []
+        return entries[0] if entries else None
+
+    def _loaded_entry(self):
+        """Вклад продажи из уже загруженных связей, без запроса (касса загружает их заранее)"""
+        if not (Sale.event.is_cached(self) and Event.trading_day.is_cached(self.event)
+                and Sale.product_unit.is_cached(self) and ProductUnit.delivery.is_cached(self.product_unit)):
+            return None
+        unit = self.product_unit
+        return LedgerEntry(self.event.trading_day.date, self.event.type == Event.EventType.RETURN,
+                           unit.product_id, unit.pk, Decimal(self.price), unit.delivery.price_per_unit)
+
+    @timed(logger, 'sale.save')
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic(savepoint=False):
+            # Вклад до изменения: сводки сдвигаются на разницу, а не пересчитываются
+            old_entry = None if adding else self.ledger_entry(self.pk)
+            super().save(*args, **kwargs)
+            new_entry = (adding and self._loaded_entry()) or self.ledger_entry(self.pk)
+            SalesSummary.replace(old_entry, new_entry)
+            self._update_unit_states(old_entry, new_entry)
+
+            # Новая продажа или возврат попадает в остатки; смена карточки переносит её к другому товару
+            ProductStock.replace_sale(old_entry and old_entry.stock_key, new_entry.stock_key)
+
+    @timed(logger, 'sale.delete')
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            entry = self.ledger_entry(self.pk)
+            result = super().delete(*args, **kwargs)
+            SalesSummary.replace(entry, None)
+            if entry:
+                ProductStock.replace_sale(entry.stock_key, None)
+                ProductUnit.refresh_states([entry.unit_id])
+        return result
+
+    def _update_unit_states(self, old_entry, new_entry):
+        """Состояние единицы следует за её последней продажей или возвратом"""
+        if old_entry and old_entry.unit_id != new_entry.unit_id:
+            ProductUnit.refresh_states([old_entry.unit_id])
+        state = ProductUnit.State.RETURNED if new_entry.is_return else ProductUnit.State.SOLD
+        # Касса переводит единицу в «продана» сама, до записи продажи — повторный пересчёт не нужен
+        if old_entry is None and Sale.product_unit.is_cached(self) and self.product_unit.state == state:
+            return
+        ProductUnit.refresh_states([new_entry.unit_id])
+
+
+class SalesQuerySet(models.QuerySet):
+    def between(self, start=None, end=None):
+        """Строки сводки за период включительно; границы необязательны"""
+        queryset = self
+        if start:
+            queryset = queryset.filter(date__gte=start)
+        if end:
+            queryset = queryset.filter(date__lte=end)
+        return queryset
+
+    def totals(self):
+        """Итоги по выборке одним агрегирующим запросом, с выручкой, себестоимостью и маржой за вычетом возвратов"""
+        totals = self.aggregate(**{field: Sum(field) for field in SalesSummary.COUNTER_FIELDS})
+        totals = {field: value or 0 for field, value in totals.items()}
+        totals['net_revenue'] = totals['revenue'] - totals['returned_amount']
+        totals['net_cost'] = totals['cost'] - totals['returned_cost']
+        totals['margin'] = totals['net_revenue'] - totals['net_cost']
+        return totals
+
+    def by_product(self):
+        """Итоги по товарам, самые доходные первыми (для ProductDailySales)"""
+        return (self.order_by().values('product_id', 'product__code', 'product__name')
+                .annotate(**{field: Sum(field) for field in SalesSummary.COUNTER_FIELDS})
+                .annotate(net_revenue=F('revenue') - F('returned_amount'))
+                .order_by('-net_revenue', 'product_id'))
+
+
+class SalesSummary(models.Model):
+    """
+    Общие счётчики сводок продаж. Поддерживаются инкрементально из Sale.save/delete
+    и при изменении событий (Event), пересобираются командой rebuild_sales_summary.
+    """
+    COUNTER_FIELDS = ('sold_count', 'revenue', 'cost', 'returned_count', 'returned_amount', 'returned_cost')
+
+    sold_count = models.PositiveIntegerField(_('Продано, шт.'), default=0)
+    revenue = models.DecimalField(_('Выручка'), max_digits=14, decimal_places=2, default=0)
+    cost = models.DecimalField(_('Себестоимость'), max_digits=14, decimal_places=2, default=0)
+    returned_count = models.PositiveIntegerField(_('Возвраты, шт.'), default=0)
+    returned_amount = models.DecimalField(_('Сумма возвратов'), max_digits=14, decimal_places=2, default=0)
+    returned_cost = models.DecimalField(_('Себестоимость возвратов'), max_digits=14, decimal_places=2, default=0)
+
+    objects = SalesQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    @property
+    def net_revenue(self):
+        return self.revenue - self.returned_amount
+
+    @property
+    def net_cost(self):
+        return self.cost - self.returned_cost
+
+    @property
+    def margin(self):
+        return self.net_revenue - self.net_cost
+
+    @staticmethod
+    def _deltas(entry, sign):
+        if entry.is_return:
+            return {'returned_count': sign, 'returned_amount': sign * entry.price, 'returned_cost': sign * entry.cost}
+        return {'sold_count': sign, 'revenue': sign * entry.price, 'cost': sign * entry.cost}
+
+    @classmethod
+    def _apply(cls, lookup, deltas):
+        """Атомарно сдвигает счётчики строки сводки через F()-выражения"""
+        changes = {field: F(field) + value for field, value in deltas.items()}
+        # Обычно строка уже есть — один UPDATE; создаём её только для нового дня/товара
+        if not cls.objects.filter(**lookup).update(**changes):
+            cls.objects.get_or_create(**lookup)
+            cls.objects.filter(**lookup).update(**changes)
+
+    @staticmethod
+    def apply(entry, sign=1):
+        """Добавляет (sign=1) или вычитает (sign=-1) вклад продажи в дневную и товарную сводки"""
+        if entry is None or entry.date is None:
+            return
+        deltas = SalesSummary._deltas(entry, sign)
+        DailySales._apply({'date': entry.date}, deltas)
+        ProductDailySales._apply({'date': entry.date, 'product_id': entry.product_id}, deltas)
+
+    @staticmethod
+    def replace(old_entry, new_entry):
+        """Заменяет старый вклад продажи новым; без изменений — ни одного запроса"""
+        if old_entry == new_entry:
+            return
+        SalesSummary.apply(old_entry, -1)
+        SalesSummary.apply(new_entry, 1)
+
+
+class DailySales(SalesSummary):
+    """Сводка продаж за торговый день"""
+    date = models.DateField(_('Дата'), unique=True)
+
+    class Meta:
+        verbose_name = _('Продажи за день')
+        verbose_name_plural = _('Продажи по дням')
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date}: {self.sold_count} шт., {self.revenue}"
+
+
+class ProductDailySales(SalesSummary):
+    """Сводка продаж товара за торговый день"""
+    date = models.DateField(_('Дата'))
+    product = models.ForeignKey('goods.Product', on_delete=models.CASCADE,
+                                related_name='daily_sales', verbose_name=_('Товар'))
+
+    class Meta:
+        verbose_name = _('Продажи товара за день')
+        verbose_name_plural = _('Продажи товаров по дням')
+        ordering = ['-date', 'product']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='sale_productdailysales_date_product'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'date'], name='sale_pds_product_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} #{self.product_id}: {self.sold_count} шт., {self.revenue}"
@@ -0,0 +1,75 @@
+# app sale/pos
+"""
+Касса: продажа единицы товара по отсканированному серийному номеру.
+
+Единица находится по уникальному индексу serial_number, торговый день
+на сегодня создаётся при первой продаже, событие и продажа пишутся
+в одной транзакции. Продать можно только доступную единицу (см.
+ProductUnit.AVAILABLE_STATES): проданная вернётся в продажу после возврата.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from sale.models import Sale
+from store.instrumentation import get_logger, timed
+from trading_day.models import Event, TradingDay
+from unit.models import ProductUnit
+
+logger = get_logger('sale.pos')
+
+
+class PosError(Exception):
+    """Продажа отклонена; status — HTTP-код ответа кассы"""
+    status = 400
+
+
+class UnitNotFound(PosError):
+    status = 404
+
+
+class UnitAlreadySold(PosError):
+    status = 409
+
+
+def parse_price(value):
+    try:
+        price = Decimal(str(value).strip().replace(',', '.'))
+    except (InvalidOperation, ValueError):
+        raise PosError(f"Некорректная цена «{value}»")
+    if not price.is_finite() or price <= 0:
+        raise PosError("Цена должна быть больше 0")
+    return price.quantize(Decimal('0.01'))
+
+
+def record_sale(serial_number, price, description=''):
+    """
+    Оформляет продажу единицы с серийным номером serial_number по цене price.
+    Возвращает Sale; бросает UnitNotFound / UnitAlreadySold / PosError.
+    """
+    serial_number = (serial_number or '').strip()
+    if not serial_number:
+        raise PosError("Не указан серийный номер")
+    price = parse_price(price)
+
+    with timed(logger, 'pos.record_sale', serial_number=serial_number), transaction.atomic():
+        # Единица, товар и поставка — одним запросом по уникальному индексу
+        unit = (ProductUnit.objects.select_related('product', 'delivery')
+                .filter(serial_number=serial_number).first())
+        if unit is None:
+            raise UnitNotFound(f"Единица товара {serial_number} не найдена")
+        # Условный UPDATE по состоянию: из двух касс единицу переведёт в «продана» только одна
+        if not ProductUnit.objects.available().filter(pk=unit.pk).update(state=ProductUnit.State.SOLD):
+            if unit.state != ProductUnit.State.WRITTEN_OFF:  # продана этой или, только что, другой кассой
+                raise UnitAlreadySold(f"Единица товара {serial_number} уже продана")
+            raise UnitAlreadySold(f"Единица товара {serial_number} недоступна: {unit.get_state_display().lower()}")
+        unit.state = ProductUnit.State.SOLD
+
+        now = timezone.now()
+        trading_day, _ = TradingDay.objects.get_or_create(date=timezone.localdate(now))
+        event = Event.objects.create(trading_day=trading_day, type=Event.EventType.SALE, created_at=now,
+                                     description=description or f"Касса: {unit.product.name} [{serial_number}]")
+        sale = Sale(event=event, product_unit=unit, price=price)
+        sale.save()
+    return sale
@@ -1,3 +1,214 @@
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from delivery.models import Delivery
+from goods.models import Product
+from request.models import Request, RequestItem
+from sale.models import DailySales, ProductDailySales, Sale
+from trading_day.models import Event, TradingDay
+from unit.models import ProductUnit
+
+
+class SalesFixture(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(code='RF-1', name='Ключ')
+        request = Request.objects.create(status=Request.Status.IN_REQUEST)
+        Request.objects.filter(pk=request.pk).update(created_at=timezone.now() - timedelta(days=30))
+        item = RequestItem.objects.create(request=request, product=self.product, quantity=5,
+                                          price_per_unit=Decimal('60'))
+        delivery = Delivery.objects.create(request_item=item, quantity=5,
+                                           delivery_date=timezone.localdate() - timedelta(days=20))
+        self.units = [ProductUnit.objects.create(product=self.product, delivery=delivery) for _ in range(3)]
+        self.day = TradingDay.objects.create(date=date(2025, 3, 1))
+
+    def sell(self, unit, price, event_type=Event.EventType.SALE, day=None):
+        event = Event.objects.create(trading_day=day or self.day, type=event_type)
+        return Sale.objects.create(event=event, product_unit=unit, price=Decimal(price))
+
+    def totals(self, **filters):
+        return DailySales.objects.between(**filters).totals()
+
+
+class SalesSummaryTests(SalesFixture):
+    def test_sales_and_returns_are_summarised_incrementally(self):
+        self.sell(self.units[0], '100')
+        self.sell(self.units[1], '120')
+        self.sell(self.units[0], '100', Event.EventType.RETURN)
+
+        day = DailySales.objects.get(date=self.day.date)
+        self.assertEqual((day.sold_count, day.revenue, day.cost), (2, Decimal('220'), Decimal('120')))
+        self.assertEqual((day.returned_count, day.returned_amount, day.returned_cost), (1, Decimal('100'), Decimal('60')))
+        self.assertEqual(day.margin, Decimal('60'))
+        product_day = ProductDailySales.objects.get(date=self.day.date, product=self.product)
+        self.assertEqual(product_day.net_revenue, Decimal('120'))
+
+    def test_changes_move_the_contribution(self):
+        sale = self.sell(self.units[0], '100')
+        sale.price = Decimal('90')
+        sale.save()
+        self.assertEqual(self.totals()['revenue'], Decimal('90'))
+
+        event = sale.event
+        event.type = Event.EventType.RETURN
+        event.save()
+        totals = self.totals()
+        self.assertEqual((totals['sold_count'], totals['returned_count']), (0, 1))
+
+        other_day = TradingDay.objects.create(date=date(2025, 3, 2))
+        event.trading_day = other_day
+        event.save()
+        self.assertEqual(self.totals(end=date(2025, 3, 1))['returned_count'], 0)
+        self.assertEqual(self.totals(start=date(2025, 3, 2))['returned_count'], 1)
+
+        event.delete()
+        self.assertEqual(self.totals()['returned_count'], 0)
+        self.assertEqual(self.product.stock.sold, 0)
+
+    def test_event_type_change_moves_stock(self):
+        sale = self.sell(self.units[0], '100')
+        returned = self.sell(self.units[0], '100', Event.EventType.RETURN)
+        stock = self.product.stock
+
+        def counters():
+            stock.refresh_from_db()
+            return stock.sold, stock.returned, stock.on_hand
+
+        self.assertEqual(counters(), (1, 1, 3))
+        returned.event.type = Event.EventType.SALE
+        returned.event.save()
+        self.assertEqual(counters(), (2, 0, 1))
+        call_command('rebuild_stock', check=True, stdout=io.StringIO())
+
+        sale.event.type = Event.EventType.RETURN
+        sale.event.save()
+        self.assertEqual(counters(), (1, 1, 3))
+        # Правка описания события остатки не трогает
+        sale.event.description = 'Исправлено'
+        sale.event.save()
+        self.assertEqual(counters(), (1, 1, 3))
+        call_command('rebuild_stock', check=True, stdout=io.StringIO())
+
+    def test_trading_day_delete_and_rebuild(self):
+        self.sell(self.units[0], '100')
+        other_day = TradingDay.objects.create(date=date(2025, 3, 2))
+        self.sell(self.units[1], '80', day=other_day)
+        self.day.delete()
+        self.assertEqual(self.totals()['revenue'], Decimal('80'))
+
+        DailySales.objects.update(revenue=0)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_sales_summary', check=True, stdout=io.StringIO())
+        call_command('rebuild_sales_summary', stdout=io.StringIO())
+        call_command('rebuild_sales_summary', check=True, stdout=io.StringIO())
+        self.assertEqual(self.totals()['revenue'], Decimal('80'))
+        self.assertEqual([row['product_id'] for row in ProductDailySales.objects.by_product()], [self.product.pk])
+
+
+class PosTests(SalesFixture):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('cashier', 'cashier@example.com', 'pass'))
+        self.url = reverse('sale:pos_scan')
+
+    def scan(self, serial_number, price='150'):
+        return self.client.post(self.url, {'serial_number': serial_number, 'price': price})
+
+    def test_scan_creates_day_event_and_sale(self):
+        self.scan(self.units[1].serial_number)  # первая продажа дня создаёт торговый день и строки сводок
+        unit = self.units[0]
+        with self.assertNumQueries(12):  # сессия и пользователь + 10 запросов продажи
+            response = self.scan(unit.serial_number)
+        self.assertEqual(response.status_code, 201)
+        sale = Sale.objects.select_related('event__trading_day').get(pk=response.json()['sale_id'])
+        self.assertEqual((sale.product_unit_id, sale.price), (unit.pk, Decimal('150')))
+        self.assertEqual(sale.event.type, Event.EventType.SALE)
+        self.assertEqual(sale.event.trading_day.date, timezone.localdate())
+        unit.refresh_from_db()
+        self.assertEqual(unit.state, ProductUnit.State.SOLD)
+        self.assertEqual(DailySales.objects.get(date=timezone.localdate()).cost, Decimal('120'))
+
+    def test_sold_unit_is_rejected_until_returned(self):
+        unit = self.units[0]
+        self.assertEqual(self.scan(unit.serial_number).status_code, 201)
+        response = self.scan(unit.serial_number)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('уже продана', response.json()['error'])
+
+        self.sell(unit, '150', Event.EventType.RETURN, day=TradingDay.objects.get(date=timezone.localdate()))
+        self.assertEqual(self.scan(unit.serial_number).status_code, 201)
+        self.assertEqual(Sale.objects.filter(product_unit=unit).count(), 3)
+
+    def test_stock_follows_sale_return_and_resale(self):
+        unit = self.units[0]
+        stock = self.product.stock
+
+        def counters():
+            stock.refresh_from_db()
+            return stock.received, stock.sold, stock.returned, stock.on_hand
+
+        self.assertEqual(counters(), (3, 0, 0, 3))
+        self.scan(unit.serial_number)
+        self.assertEqual(counters(), (3, 1, 0, 2))
+        self.sell(unit, '150', Event.EventType.RETURN, day=TradingDay.objects.get(date=timezone.localdate()))
+        self.assertEqual(counters(), (3, 1, 1, 3))
+        self.scan(unit.serial_number)
+        self.assertEqual(counters(), (3, 2, 1, 2))
+        self.assertEqual(stock.on_hand, self.product.units.available().count())
+        call_command('rebuild_stock', check=True, stdout=io.StringIO())
+
+    def test_invalid_scans(self):
+        self.assertEqual(self.scan('NOPE').status_code, 404)
+        self.assertEqual(self.scan(self.units[0].serial_number, price='-1').status_code, 400)
+        self.assertFalse(TradingDay.objects.filter(date=timezone.localdate()).exists())
+        self.client.logout()
+        self.assertEqual(self.scan(self.units[0].serial_number).status_code, 403)
+
+
+class UnitStateTests(SalesFixture):
+    def state(self, unit):
+        return ProductUnit.objects.values_list('state', flat=True).get(pk=unit.pk)
+
+    def test_sale_and_return_flows_move_the_state(self):
+        unit = self.units[0]
+        self.assertEqual(self.state(unit), ProductUnit.State.RECEIVED)
+        sale = self.sell(unit, '100')
+        self.assertEqual(self.state(unit), ProductUnit.State.SOLD)
+        returned = self.sell(unit, '100', Event.EventType.RETURN)
+        self.assertEqual(self.state(unit), ProductUnit.State.RETURNED)
+
+        returned.event.type = Event.EventType.SALE
+        returned.event.save()
+        self.assertEqual(self.state(unit), ProductUnit.State.SOLD)
+        returned.event.delete()
+        sale.product_unit = self.units[1]
+        sale.save()
+        self.assertEqual((self.state(unit), self.state(self.units[1])),
+                         (ProductUnit.State.IN_STOCK, ProductUnit.State.SOLD))
+        sale.delete()
+        self.assertEqual(self.state(self.units[1]), ProductUnit.State.IN_STOCK)
+
+    def test_write_off_and_stock(self):
+        ProductUnit.objects.filter(pk=self.units[0].pk).put_in_stock()
+        self.sell(self.units[1], '100')
+        self.assertEqual(ProductUnit.objects.all().write_off(), 2)
+        self.assertEqual(self.product.units.available().count(), 0)
+        self.assertEqual(self.product.units.sold().count(), 1)
+        self.product.stock.refresh_from_db()
+        self.assertEqual((self.product.stock.received, self.product.stock.on_hand), (1, 0))
+        call_command('rebuild_stock', check=True, stdout=io.StringIO())
 
-# Create your tests here.
+    def test_sale_autocomplete_offers_only_available_units(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        self.sell(self.units[0], '100')
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'RF-1', 'app_label': 'sale', 'model_name': 'sale', 'field_name': 'product_unit',
+        })
+        offered = {int(result['id']) for result in response.json()['results']}
+        self.assertEqual(offered, {self.units[1].pk, self.units[2].pk})
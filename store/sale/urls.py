@@ -0,0 +1,12 @@
+from django.urls import path
+from . import views
+
+app_name = 'sale'
+
+urlpatterns = [
+    # Касса
+    path('pos/', views.pos_view, name='pos'),
+
+    # Продажа по серийному номеру (POST через AJAX)
+    path('pos/scan/', views.pos_scan, name='pos_scan'),
+]
@@ -1,3 +1,36 @@
+# app sale views
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import permission_required
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 
-# Create your views here.
+from sale import pos
+
+
+@staff_member_required
+def pos_view(request):
+    """Страница кассы: поле для сканера и журнал продаж текущей сессии"""
+    return render(request, 'store/pos.html')
+
+
+@require_POST
+@permission_required('sale.add_sale', raise_exception=True)
+def pos_scan(request):
+    """Продажа по отсканированному серийному номеру (POST: serial_number, price). Ответ — JSON"""
+    try:
+        sale = pos.record_sale(request.POST.get('serial_number'), request.POST.get('price'))
+    except pos.PosError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=e.status)
+
+    unit = sale.product_unit
+    return JsonResponse({
+        'success': True,
+        'sale_id': sale.pk,
+        'serial_number': unit.serial_number,
+        'product': unit.product.name,
+        'code': unit.product.code,
+        'price': str(sale.price),
+        'admin_url': reverse('admin:sale_sale_change', args=[sale.pk]),
+    }, status=201)
@@ -0,0 +1,85 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const list = document.getElementById('product-list');
+    const sentinel = document.getElementById('product-list-sentinel');
+
+    if (!list || !sentinel || !('IntersectionObserver' in window)) {
+        return;  // без JS остаётся ссылка "Показать ещё"
+    }
+
+    let next = list.dataset.next;
+    let loading = false;
+
+    function renderCard(item) {
+        const col = document.createElement('div');
+        col.className = 'col-md-4 col-lg-3';
+
+        const card = document.createElement('div');
+        card.className = 'card h-100 shadow-sm';
+
+        const img = document.createElement('img');
+        img.className = 'card-img-top';
+        img.src = item.image || list.dataset.noImage;
+        img.alt = item.name;
+        card.appendChild(img);
+
+        const body = document.createElement('div');
+        body.className = 'card-body';
+
+        const title = document.createElement('h5');
+        title.className = 'card-title';
+        title.textContent = item.name;
+        body.appendChild(title);
+
+        const badge = document.createElement('span');
+        badge.className = 'badge ' + (item.in_stock ? 'bg-success' : 'bg-secondary');
+        badge.textContent = item.availability;
+        const badgeRow = document.createElement('p');
+        badgeRow.className = 'card-text';
+        badgeRow.appendChild(badge);
+        body.appendChild(badgeRow);
+
+        const link = document.createElement('a');
+        link.href = item.url;
+        link.className = 'btn btn-primary btn-sm';
+        link.textContent = 'Подробнее';
+        body.appendChild(link);
+
+        card.appendChild(body);
+        col.appendChild(card);
+        return col;
+    }
+
+    function loadMore() {
+        if (loading || !next) {
+            return;
+        }
+        loading = true;
+
+        const params = new URLSearchParams({after: next});
+        if (list.dataset.category) {
+            params.set('category', list.dataset.category);
+        }
+
+        fetch(`${list.dataset.feedUrl}?${params}`)
+            .then(response => response.json())
+            .then(data => {
+                data.results.forEach(item => list.appendChild(renderCard(item)));
+                next = data.next;
+                if (!next) {
+                    observer.disconnect();
+                    sentinel.remove();
+                }
+            })
+            .finally(() => {
+                loading = false;
+            });
+    }
+
+    const observer = new IntersectionObserver(function (entries) {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadMore();
+        }
+    }, {rootMargin: '400px'});
+
+    observer.observe(sentinel);
+});
@@ -0,0 +1,54 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const form = document.getElementById('pos-form');
+    const serial = document.getElementById('pos-serial');
+    const price = document.getElementById('pos-price');
+    const message = document.getElementById('pos-message');
+    const journal = document.getElementById('pos-journal');
+
+    function showMessage(text, kind) {
+        message.innerHTML = '';
+        const alert = document.createElement('div');
+        alert.classList.add('alert', `alert-${kind}`);
+        alert.textContent = text;
+        message.appendChild(alert);
+    }
+
+    function addRow(sale) {
+        const row = journal.insertRow(0);
+        const link = document.createElement('a');
+        link.href = sale.admin_url;
+        link.textContent = sale.serial_number;
+        row.insertCell().appendChild(link);
+        row.insertCell().textContent = `${sale.product} (${sale.code})`;
+        const cell = row.insertCell();
+        cell.classList.add('text-end');
+        cell.textContent = `${sale.price} ₽`;
+    }
+
+    // Сканер вводит номер и Enter — переходим к цене, если она ещё не указана
+    serial.addEventListener('keydown', function (event) {
+        if (event.key === 'Enter' && !price.value) {
+            event.preventDefault();
+            price.focus();
+        }
+    });
+
+    form.addEventListener('submit', function (event) {
+        event.preventDefault();
+        fetch(form.dataset.scanUrl, {method: 'POST', body: new FormData(form)})
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    addRow(data);
+                    showMessage(`Продано: ${data.product} за ${data.price} ₽`, 'success');
+                    serial.value = '';
+                    price.value = '';
+                } else {
+                    showMessage(data.error, 'danger');
+                    serial.select();
+                }
+                serial.focus();
+            })
+            .catch(() => showMessage('Касса недоступна, повторите попытку', 'danger'));
+    });
+});
@@ -0,0 +1,77 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const form = document.getElementById('status-form');
+    const selectAll = document.getElementById('select-all');
+    const counter = document.getElementById('selected-count');
+    const apply = document.getElementById('apply-status');
+    const message = document.getElementById('status-message');
+
+    function checkboxes() {
+        return Array.from(document.querySelectorAll('.item-select'));
+    }
+
+    function selected() {
+        return checkboxes().filter(checkbox => checkbox.checked).map(checkbox => checkbox.value);
+    }
+
+    function refresh() {
+        const count = selected().length;
+        counter.textContent = count;
+        apply.disabled = count === 0;
+        selectAll.checked = count > 0 && count === checkboxes().length;
+    }
+
+    function showMessage(text, kind) {
+        message.innerHTML = '';
+        const alert = document.createElement('div');
+        alert.classList.add('alert', `alert-${kind}`);
+        alert.textContent = text;
+        message.appendChild(alert);
+    }
+
+    selectAll.addEventListener('change', function () {
+        checkboxes().forEach(checkbox => { checkbox.checked = selectAll.checked; });
+        refresh();
+    });
+    document.getElementById('request-list').addEventListener('change', function (event) {
+        if (event.target.classList.contains('item-select')) {
+            refresh();
+        }
+    });
+
+    // Все выбранные позиции уходят одним запросом; статус меняется у их заявок целиком
+    form.addEventListener('submit', function (event) {
+        event.preventDefault();
+        const data = new FormData(form);
+        selected().forEach(id => data.append('item_ids', id));
+        apply.disabled = true;
+        fetch(form.dataset.url, {method: 'POST', body: data})
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    showMessage(data.error, 'danger');
+                    return;
+                }
+                // Заявки со сменённым статусом больше не подходят под фильтр — убираем все их позиции
+                const moved = new Set();
+                let failed = 0;
+                Object.values(data.items).forEach(item => {
+                    if (item.result === 'not_found' || item.result === 'invalid') {
+                        failed += 1;
+                    } else {
+                        moved.add(String(item.request_id));
+                    }
+                });
+                document.querySelectorAll('.request-card').forEach(card => {
+                    if (moved.has(card.dataset.requestId)) {
+                        card.remove();
+                    }
+                });
+                showMessage(`Заявок переведено: ${data.updated}` + (failed ? `, не найдено позиций: ${failed}` : ''),
+                            failed ? 'warning' : 'success');
+            })
+            .catch(() => showMessage('Серверная ошибка', 'danger'))
+            .finally(refresh);
+    });
+
+    refresh();
+});
@@ -7,7 +7,7 @@ document.addEventListener('DOMContentLoaded', function () {
         resultsBox.innerHTML = '';
 
         if (query.length > 1) {
-            fetch(`/search/?q=${encodeURIComponent(query)}`)
+            fetch(`${input.dataset.searchUrl}?q=${encodeURIComponent(query)}`)
                 .then(response => response.json())
                 .then(data => {
                     resultsBox.innerHTML = '';
@@ -16,9 +16,13 @@ document.addEventListener('DOMContentLoaded', function () {
                     }
                     data.results.forEach(item => {
                         const link = document.createElement('a');
-                        link.href = `/product/${item.id}/`;
+                        link.href = item.url;
                         link.classList.add('list-group-item', 'list-group-item-action');
                         link.textContent = item.name;
+                        const code = document.createElement('small');
+                        code.classList.add('text-muted', 'ms-2');
+                        code.textContent = item.code;
+                        link.appendChild(code);
                         resultsBox.appendChild(link);
                     });
                 });
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class StoreConfig(AppConfig):
+    name = 'store'
+
+    def ready(self):
+        from store import metrics  # noqa: F401  обёртка SQL-запросов на каждое новое соединение
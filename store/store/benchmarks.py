@@ -0,0 +1,408 @@
+# store/benchmarks
+"""
+Воспроизводимые замеры горячих путей записи и чтения (команда benchmark).
+
+seed() создаёт набор данных заданного масштаба с фиксированным random.seed:
+каталог через goods.importing (с категориями и поисковым индексом), заявки всех
+статусов, поставки через Delivery.save с единицами товара и продажи через кассу.
+Замер — функция, которая готовит данные и возвращает callable; время меряется
+только у callable. Каждый повтор идёт в точке сохранения, которая затем
+откатывается, поэтому все повторы видят одно и то же состояние базы, а после
+прогона в базе не остаётся ничего. Запросы считаются в отдельном прогоне:
+CaptureQueriesContext замедляет курсор.
+
+Прогон идёт в одной транзакции и держит блокировку записи всё время замеров,
+поэтому run_benchmarks работает только в одноразовой базе: тестовой или созданной
+disposable_database() (её использует команда benchmark). Рабочая база не трогается.
+
+Результаты сохраняются в JSON; compare() сравнивает два прогона по медиане
+времени и числу запросов.
+"""
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from customers.models import Customer
+from delivery.models import Delivery
+from goods.importing import import_catalog
+from goods.models import Category, Product
+from request.models import Request, RequestItem
+from sale.pos import record_sale
+from suppliers.models import Supplier
+from unit.issuing import issue_units
+from unit.models import ProductUnit
+
+CODE_PREFIX = 'BENCH-'
+DEFAULT_SCALE = 2000
+DEFAULT_REPEAT = 5
+# На какую долю может вырасти медиана времени, прежде чем это считается регрессией
+DEFAULT_THRESHOLD = 0.2
+
+# Вид товара -> путь категории; наименование: вид, размер, бренд
+PRODUCT_KINDS = (
+    ('Ключ накидной', 'Ручной инструмент/Ключи'),
+    ('Ключ рожковый', 'Ручной инструмент/Ключи'),
+    ('Ключ комбинированный', 'Ручной инструмент/Ключи'),
+    ('Головка торцевая', 'Ручной инструмент/Головки'),
+    ('Головка ударная', 'Пневмоинструмент/Головки'),
+    ('Отвёртка крестовая', 'Ручной инструмент/Отвёртки'),
+    ('Отвёртка шлицевая', 'Ручной инструмент/Отвёртки'),
+    ('Бита', 'Оснастка/Биты'),
+    ('Сверло по металлу', 'Оснастка/Свёрла'),
+    ('Сверло по бетону', 'Оснастка/Свёрла'),
+    ('Пассатижи', 'Ручной инструмент/Шарнирно-губцевый'),
+    ('Бокорезы', 'Ручной инструмент/Шарнирно-губцевый'),
+    ('Рулетка', 'Измерительный инструмент/Рулетки'),
+    ('Уровень строительный', 'Измерительный инструмент/Уровни'),
+)
+SIZES = ('6 мм', '8 мм', '10 мм', '12 мм', '13 мм', '14 мм', '17 мм', '19 мм', '22 мм', '1/2"', 'PH2', 'SL5')
+BRANDS = ('Force', 'Jonnesway', 'Ombra', 'Зубр', 'Stayer', 'Kraftool', 'Matrix', 'Сибртех')
+SEARCH_QUERIES = ('кл', 'ключ', 'ключ нак', 'головка 13', 'force', 'отв', 'сверло мет', f'{CODE_PREFIX}0001', 'zz')
+
+Benchmark = namedtuple('Benchmark', 'name description prepare')
+
+BENCHMARKS = {}
+
+
+def benchmark(name, description):
+    """Регистрирует замер: prepare(dataset) готовит данные и возвращает (callable, число операций)"""
+    def register(prepare):
+        BENCHMARKS[name] = Benchmark(name, description, prepare)
+        return prepare
+    return register
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Dataset:
+    """Созданный seed() набор данных и общие для замеров клиенты"""
+
+    def __init__(self, scale, rng):
+        self.scale = scale
+        self.rng = rng
+        self.today = timezone.localdate()
+        self.client = Client(REMOTE_ADDR='203.0.113.10')  # не из INTERNAL_IPS — без панели отладки
+        self.user = User.objects.create_superuser(f'bench-{time.time_ns()}', 'bench@example.com', None)
+        self.staff_client = Client(REMOTE_ADDR='203.0.113.10')
+        self.staff_client.force_login(self.user)
+        self.product_ids = []
+        self.open_item_ids = []  # позиции без поставок, заявка создана раньше сегодняшнего дня
+
+    def make_delivery(self, quantity):
+        """Сохранённая поставка на quantity единиц (без единиц товара) по отдельной заявке"""
+        request = Request.objects.create(status=Request.Status.IN_REQUEST)
+        Request.objects.filter(pk=request.pk).update(created_at=timezone.now() - timedelta(days=1))
+        item = RequestItem.objects.create(request=request, product_id=self.product_ids[0],
+                                          quantity=quantity, price_per_unit=100)
+        delivery = Delivery(request_item=item, quantity=quantity, delivery_date=self.today)
+        delivery.save()
+        return delivery
+
+    def admin_request(self):
+        request = RequestFactory().post('/admin/delivery/delivery/')
+        request.user = self.user
+        request._messages = CookieStorage(request)
+        return request
+
+
+def seed(scale=DEFAULT_SCALE, random_seed=0):
+    """Создаёт набор данных: scale товаров, scale/10 заявок по 5 позиций, поставки, единицы и продажи"""
+    rng = random.Random(random_seed)
+
+    rows = []
+    for line in range(1, scale + 1):
+        kind, category = rng.choice(PRODUCT_KINDS)
+        rows.append((line, {
+            'code': f'{CODE_PREFIX}{line:04d}',
+            'name': f'{kind} {rng.choice(SIZES)} {rng.choice(BRANDS)}',
+            'category': category,
+            'description': f'{kind}, артикул {CODE_PREFIX}{line:04d}',
+        }))
+    import_catalog(rows)
+
+    dataset = Dataset(scale, rng)
+    dataset.product_ids = list(Product.objects.filter(code__startswith=CODE_PREFIX).values_list('pk', flat=True))
+    suppliers = Supplier.objects.bulk_create(
+        [Supplier(name=f'ООО «Поставщик {i}»') for i in range(max(scale // 200, 3))])
+    customers = Customer.objects.bulk_create(
+        [Customer(name=f'Покупатель {i}') for i in range(max(scale // 100, 3))])
+
+    statuses = [Request.Status.CANDIDATE, Request.Status.IN_REQUEST, Request.Status.IN_REQUEST, Request.Status.EXTRA]
+    requests = Request.objects.bulk_create(
+        [Request(status=rng.choice(statuses)) for _ in range(max(scale // 10, 4))])
+    for request in requests:
+        Request.objects.filter(pk=request.pk).update(created_at=timezone.now() - timedelta(days=rng.randint(2, 60)))
+    items = RequestItem.objects.bulk_create([
+        RequestItem(request=request, product_id=rng.choice(dataset.product_ids), quantity=rng.randint(1, 40),
+                    price_per_unit=rng.randint(50, 5000), supplier=rng.choice(suppliers),
+                    customer=rng.choice(customers) if rng.random() < 0.3 else None)
+        for request in requests for _ in range(5)
+    ])
+
+    for item in RequestItem.objects.select_related('request', 'product').filter(pk__in=[i.pk for i in items]).order_by('pk'):
+        if item.request.status == Request.Status.CANDIDATE or rng.random() < 0.4:
+            dataset.open_item_ids.append(item.pk)
+            continue
+        delivery = Delivery(request_item=item, quantity=rng.randint(1, item.quantity),
+                            delivery_date=dataset.today - timedelta(days=rng.randint(0, 1)))
+        delivery.save()
+        issue_units(delivery)
+
+    serials = list(ProductUnit.objects.filter(product_id__in=dataset.product_ids)
+                   .order_by('pk').values_list('serial_number', flat=True))
+    for serial in rng.sample(serials, len(serials) // 4):
+        record_sale(serial, rng.randint(100, 9000))
+    return dataset
+
+
+@benchmark('delivery_save', 'Delivery.clean + Delivery.save по позициям заявок')
+def delivery_save(dataset):
+    deliveries = [Delivery(request_item_id=pk, quantity=1, delivery_date=dataset.today)
+                  for pk in dataset.open_item_ids[:50]]
+
+    def run():
+        for delivery in deliveries:
+            delivery.clean()
+            delivery.save()
+    return run, len(deliveries)
+
+
+@benchmark('generate_product_units', 'DeliveryAdmin.generate_product_units: 5 поставок по scale единиц')
+def generate_product_units(dataset):
+    deliveries = [dataset.make_delivery(dataset.scale) for _ in range(5)]
+    queryset = Delivery.objects.filter(pk__in=[delivery.pk for delivery in deliveries])
+    model_admin = admin.site._registry[Delivery]
+    request = dataset.admin_request()
+    return (lambda: model_admin.generate_product_units(request, queryset)), 5 * dataset.scale
+
+
+@benchmark('product_unit_save', 'ProductUnit.save по одной единице (серийный номер из SerialCounter)')
+def product_unit_save(dataset):
+    delivery = dataset.make_delivery(200)
+    units = [ProductUnit(product=delivery.product, delivery=delivery) for _ in range(delivery.quantity)]
+
+    def run():
+        for unit in units:
+            unit.save()
+    return run, len(units)
+
+
+@benchmark('record_sale', 'Продажа через кассу (sale.pos.record_sale)')
+def sale_recording(dataset):
+    serials = list(ProductUnit.objects.available().filter(product_id__in=dataset.product_ids)
+                   .order_by('pk').values_list('serial_number', flat=True)[:100])
+
+    def run():
+        for serial in serials:
+            record_sale(serial, '150')
+    return run, len(serials)
+
+
+def _get(client, path, count=1):
+    def run():
+        for _ in range(count):
+            response = client.get(path)
+            assert response.status_code == 200, (path, response.status_code)
+    return run, count
+
+
+@benchmark('products_view', 'Каталог: первая страница с деревом категорий')
+def products_view(dataset):
+    return _get(dataset.client, reverse('goods:products_view'))
+
+
+@benchmark('products_view_category', 'Каталог: раздел верхнего уровня с подкатегориями')
+def products_view_category(dataset):
+    category = Category.objects.get(parent=None, name=PRODUCT_KINDS[0][1].split('/')[0])
+    return _get(dataset.client, f"{reverse('goods:products_view')}?category={category.slug}")
+
+
+@benchmark('requests_view', 'Список позиций заявок в статусе «В заявке»')
+def requests_view(dataset):
+    return _get(dataset.staff_client, f"{reverse('request:requests_list')}?status={Request.Status.IN_REQUEST}")
+
+
+@benchmark('search_products', 'Подсказки поиска (typeahead) по набору запросов')
+def search_products(dataset):
+    paths = [f"{reverse('goods:search_products')}?q={query}" for query in SEARCH_QUERIES]
+
+    def run():
+        for path in paths:
+            dataset.client.get(path)
+    return run, len(paths)
+
+
+def _measure(item, dataset, capture=False):
+    """Один повтор в точке сохранения: (секунды, число запросов или None, число операций)"""
+    caches[settings.VIEW_CACHE_ALIAS].clear()
+    try:
+        with transaction.atomic():
+            run, operations = item.prepare(dataset)
+            if capture:
+                with CaptureQueriesContext(connection) as queries:
+                    run()
+                result = None, len(queries), operations
+            else:
+                started = time.perf_counter()
+                run()
+                result = time.perf_counter() - started, None, operations
+            raise _Rollback
+    except _Rollback:
+        return result
+
+
+def environment():
+    """Сведения о прогоне для JSON: версия кода, интерпретатор, СУБД"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'created_at': timezone.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'debug': settings.DEBUG,
+    }
+
+
+def is_disposable():
+    """Текущая база — тестовая (одноразовая), а не рабочая"""
+    return connection.settings_dict['NAME'] == connection.creation._get_test_db_name()
+
+
+@contextmanager
+def disposable_database(progress=None):
+    """
+    Переключает соединение на одноразовую базу: она создаётся и мигрируется как тестовая
+    (SQLite — во временном каталоге), а после выхода удаляется вместе с каталогом.
+    """
+    progress = progress or (lambda message: None)
+    test_settings = connection.settings_dict['TEST']
+    test_name = test_settings.get('NAME')
+    with tempfile.TemporaryDirectory(prefix='store-benchmark-') as directory:
+        if connection.vendor == 'sqlite':
+            test_settings['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        started = time.perf_counter()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            progress(f"Одноразовая база {connection.settings_dict['NAME']} создана "
+                     f"за {time.perf_counter() - started:.1f} с")
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings['NAME'] = test_name
+
+
+def run_benchmarks(names=None, scale=DEFAULT_SCALE, repeat=DEFAULT_REPEAT, random_seed=0, progress=None):
+    """
+    Создаёт набор данных и выполняет замеры names (по умолчанию все). Всё откатывается.
+    Работает только в одноразовой базе (см. disposable_database).
+    Возвращает словарь для JSON: meta и benchmarks {имя: результаты}.
+    """
+    if not is_disposable():
+        raise ValueError("Замеры держат блокировку записи всё время прогона — рабочую базу они не используют. "
+                         "Запускайте их в одноразовой базе: команда benchmark создаёт её сама")
+    names = list(names or BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Неизвестные замеры: {', '.join(unknown)}. Доступны: {', '.join(BENCHMARKS)}")
+    progress = progress or (lambda message: None)
+    results = {'meta': {**environment(), 'scale': scale, 'repeat': repeat, 'seed': random_seed}, 'benchmarks': {}}
+
+    # Кэш ответов — отдельный в памяти: замеряется сборка страницы, а не чтение из общего кэша
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                           CACHES={**settings.CACHES, settings.VIEW_CACHE_ALIAS: {
+                               'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                               'LOCATION': 'store-benchmarks'}}):
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                dataset = seed(scale, random_seed)
+                results['meta']['seed_s'] = round(time.perf_counter() - started, 3)
+                progress(f"Набор данных (масштаб {scale}) создан за {results['meta']['seed_s']:.1f} с")
+                for name in names:
+                    item = BENCHMARKS[name]
+                    _measure(item, dataset)  # прогрев: шаблоны, разбор URL, первые запросы
+                    _, queries, operations = _measure(item, dataset, capture=True)
+                    times = [_measure(item, dataset)[0] * 1000 for _ in range(repeat)]
+                    median = statistics.median(times)
+                    results['benchmarks'][name] = {
+                        'description': item.description,
+                        'operations': operations,
+                        'times_ms': [round(value, 3) for value in times],
+                        'min_ms': round(min(times), 3),
+                        'median_ms': round(median, 3),
+                        'per_operation_ms': round(median / (operations or 1), 4),
+                        'queries': queries,
+                    }
+                    progress(format_result(name, results['benchmarks'][name]))
+                raise _Rollback
+        except _Rollback:
+            pass
+    return results
+
+
+def format_result(name, result):
+    return (f"{name}: медиана {result['median_ms']:.1f} мс, минимум {result['min_ms']:.1f} мс, "
+            f"{result['per_operation_ms']:.3f} мс на операцию ({result['operations']}), "
+            f"запросов {result['queries']}")
+
+
+Comparison = namedtuple('Comparison', 'name baseline_ms current_ms change baseline_queries current_queries verdict')
+
+REGRESSION = 'регрессия'
+IMPROVEMENT = 'улучшение'
+NEW = 'новый'
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Сравнивает результаты двух прогонов. Регрессия — медиана выросла больше чем на threshold
+    (доля) или запросов стало больше; улучшение — наоборот.
+    """
+    rows = []
+    for name, result in current['benchmarks'].items():
+        base = baseline['benchmarks'].get(name)
+        if base is None:
+            rows.append(Comparison(name, None, result['median_ms'], None, None, result['queries'], NEW))
+            continue
+        change = result['median_ms'] / base['median_ms'] - 1 if base['median_ms'] else 0
+        if change > threshold or result['queries'] > base['queries']:
+            verdict = REGRESSION
+        elif change < -threshold or result['queries'] < base['queries']:
+            verdict = IMPROVEMENT
+        else:
+            verdict = ''
+        rows.append(Comparison(name, base['median_ms'], result['median_ms'], change,
+                               base['queries'], result['queries'], verdict))
+    return rows
+
+
+def incomparable(baseline, current):
+    """Параметры прогонов, при различии которых сравнение времени теряет смысл"""
+    return [key for key in ('scale', 'database', 'debug')
+            if baseline['meta'].get(key) != current['meta'].get(key)]
@@ -0,0 +1,57 @@
+# store/counterparties
+"""
+Общее для справочников контрагентов (suppliers.Supplier, customers.Customer):
+итоги по заявкам и поставкам в queryset и их колонки в админке.
+"""
+from django.apps import apps
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+TOTALS_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+
+class CounterpartyQuerySetMixin:
+    """
+    Примесь к QuerySet справочника. counterparty_field — имя внешнего ключа
+    на справочник у RequestItem и Delivery ('supplier', 'customer').
+    """
+    counterparty_field = None
+
+    def with_totals(self):
+        """
+        Аннотирует open_quantity — сколько единиц ещё не поставлено по открытым позициям заявок,
+        и delivered_value — стоимость всех поставок. Подзапросы идут по индексам {поле}_id.
+        """
+        RequestItem = apps.get_model('request', 'RequestItem')
+        Delivery = apps.get_model('delivery', 'Delivery')
+        field = self.counterparty_field
+        open_quantity = (RequestItem.objects.filter(**{field: OuterRef('pk')}, is_completed=False)
+                         .order_by().values(field)
+                         .annotate(total=Sum(F('quantity') - F('delivered_quantity'))).values('total'))
+        delivered_value = (Delivery.objects.filter(**{field: OuterRef('pk')})
+                           .order_by().values(field)
+                           .annotate(total=Sum(F('quantity') * F('price_per_unit'), output_field=TOTALS_FIELD))
+                           .values('total'))
+        return self.annotate(
+            open_quantity=Coalesce(Subquery(open_quantity), 0),
+            delivered_value=Coalesce(Subquery(delivered_value), 0, output_field=TOTALS_FIELD),
+        )
+
+
+class CounterpartyTotalsAdminMixin:
+    """Колонки open_quantity и delivered_value в списке справочника (queryset — с with_totals())"""
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
+
+    def open_quantity(self, obj):
+        return obj.open_quantity
+
+    open_quantity.short_description = 'Ожидается единиц'
+    open_quantity.admin_order_field = 'open_quantity'
+
+    def delivered_value(self, obj):
+        return f"{obj.delivered_value:.2f} ₽"
+
+    delivered_value.short_description = 'Поставлено на сумму'
+    delivered_value.admin_order_field = 'delivered_value'
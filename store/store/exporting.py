@@ -0,0 +1,234 @@
+# store/exporting
+"""
+Потоковая выгрузка единиц товара, поставок, продаж и позиций заявок в CSV или JSONL.
+
+Строки читаются values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE): без
+создания моделей и без кэша QuerySet, на PostgreSQL — серверным курсором,
+на SQLite — постепенной выборкой из курсора. Текст собирается в буфер и
+отдаётся кусками по EXPORT_BUFFER_SIZE байт, gzip сжимает кусок за куском,
+поэтому память не зависит от числа строк. Используется и представлением
+(StreamingHttpResponse), и командой export_data.
+
+Под ASGI синхронный итератор StreamingHttpResponse Django читает целиком
+(sync_to_async(list)) — ответ копится в памяти. Поэтому там куски отдаёт
+async_chunks: каждый следующий кусок берётся в потоке sync_to_async.
+"""
+import csv
+import json
+import zlib
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from delivery.models import Delivery
+from request.models import RequestItem
+from sale.models import Sale
+from unit.models import ProductUnit
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BUFFER_SIZE = 64 * 1024
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# Выгрузка: модель, столбцы (заголовок, путь для values_list) и пути фильтров.
+# date_field может быть датой или датой-временем — см. _date_filters
+Export = namedtuple('Export', 'model columns date_field product_field delivery_field')
+
+EXPORTS = {
+    'units': Export(
+        ProductUnit,
+        (('id', 'id'), ('serial_number', 'serial_number'), ('state', 'state'),
+         ('product_code', 'product__code'), ('product_name', 'product__name'),
+         ('delivery_id', 'delivery_id'), ('delivery_date', 'delivery__delivery_date'),
+         ('created_at', 'created_at')),
+        'created_at', 'product_id', 'delivery_id',
+    ),
+    'deliveries': Export(
+        Delivery,
+        (('id', 'id'), ('delivery_date', 'delivery_date'), ('status', 'status'),
+         ('product_code', 'product__code'), ('product_name', 'product__name'),
+         ('quantity', 'quantity'), ('price_per_unit', 'price_per_unit'),
+         ('request_item_id', 'request_item_id'), ('request_date', 'request_date'),
+         ('supplier', 'supplier__name'), ('customer', 'customer__name'),
+         ('extra_shipment', 'extra_shipment'), ('extra_request', 'extra_request'), ('notes', 'notes')),
+        'delivery_date', 'product_id', 'id',
+    ),
+    'sales': Export(
+        Sale,
+        (('id', 'id'), ('date', 'event__trading_day__date'), ('type', 'event__type'),
+         ('created_at', 'event__created_at'), ('serial_number', 'product_unit__serial_number'),
+         ('product_code', 'product_unit__product__code'), ('product_name', 'product_unit__product__name'),
+         ('delivery_id', 'product_unit__delivery_id'), ('price', 'price')),
+        'event__trading_day__date', 'product_unit__product_id', 'product_unit__delivery_id',
+    ),
+    'request_items': Export(
+        RequestItem,
+        (('id', 'id'), ('request_id', 'request_id'), ('status', 'request__status'),
+         ('created_at', 'request__created_at'), ('product_code', 'product__code'),
+         ('product_name', 'product__name'), ('quantity', 'quantity'),
+         ('delivered_quantity', 'delivered_quantity'), ('price_per_unit', 'price_per_unit'),
+         ('is_completed', 'is_completed'), ('supplier', 'supplier__name'), ('customer', 'customer__name')),
+        'request__created_at', 'product_id', 'deliveries',
+    ),
+}
+
+
+class ExportError(ValueError):
+    """Неизвестная выгрузка, формат или некорректный фильтр"""
+
+
+def get_export(name):
+    try:
+        return EXPORTS[name]
+    except KeyError:
+        raise ExportError(f"Неизвестная выгрузка «{name}». Доступны: {', '.join(EXPORTS)}")
+
+
+def parse_filters(date_from=None, date_to=None, product=None, delivery=None):
+    """Проверяет фильтры из строк (даты ГГГГ-ММ-ДД, ID числами); пустые значения пропускаются"""
+    filters = {}
+    for key, value in (('date_from', date_from), ('date_to', date_to)):
+        if value:
+            try:
+                filters[key] = value if isinstance(value, date) else date.fromisoformat(str(value).strip())
+            except ValueError:
+                raise ExportError(f"Некорректная дата «{value}» (ожидается ГГГГ-ММ-ДД)")
+    for key, value in (('product', product), ('delivery', delivery)):
+        if value not in (None, ''):
+            if not str(value).strip().isdigit():
+                raise ExportError(f"Некорректный ID «{value}»")
+            filters[key] = int(value)
+    return filters
+
+
+def _date_filters(export, date_from=None, date_to=None):
+    """Границы периода; для даты-времени — полуинтервал по локальным суткам, без __date, чтобы работал индекс"""
+    field = export.model._meta
+    for part in export.date_field.split('__'):
+        field = field.get_field(part)
+        if field.is_relation:
+            field = field.related_model._meta
+    filters = {}
+    if getattr(field, 'get_internal_type', lambda: '')() == 'DateTimeField':
+        if date_from:
+            filters[f'{export.date_field}__gte'] = timezone.make_aware(datetime.combine(date_from, time.min))
+        if date_to:
+            filters[f'{export.date_field}__lt'] = timezone.make_aware(
+                datetime.combine(date_to + timedelta(days=1), time.min))
+    else:
+        if date_from:
+            filters[f'{export.date_field}__gte'] = date_from
+        if date_to:
+            filters[f'{export.date_field}__lte'] = date_to
+    return filters
+
+
+def export_queryset(name, date_from=None, date_to=None, product=None, delivery=None):
+    """values_list выгрузки с фильтрами, упорядоченный по id"""
+    export = get_export(name)
+    filters = _date_filters(export, date_from, date_to)
+    if product is not None:
+        filters[export.product_field] = product
+    if delivery is not None:
+        filters[export.delivery_field] = delivery
+    return (export.model.objects.filter(**filters).order_by('pk')
+            .values_list(*(path for _header, path in export.columns)))
+
+
+def export_rows(name, chunk_size=EXPORT_CHUNK_SIZE, **filters):
+    """Кортежи значений выгрузки по одному, без загрузки всего результата"""
+    return export_queryset(name, **filters).iterator(chunk_size=chunk_size)
+
+
+class _Buffer:
+    """Приёмник для csv.writer: копит текст, сам ничего не пишет"""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+
+    def take(self):
+        text = ''.join(self.parts)
+        self.parts, self.size = [], 0
+        return text.encode('utf-8')
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat() if timezone.is_aware(value) else value.isoformat()
+    return value
+
+
+def _json_value(value):
+    """Для json.dumps: даты и время — ISO 8601, Decimal — строкой без потери точности"""
+    if isinstance(value, date):
+        return _csv_value(value) if isinstance(value, datetime) else value.isoformat()
+    return str(value)
+
+
+def render_chunks(name, rows, fmt='csv', buffer_size=EXPORT_BUFFER_SIZE):
+    """Байтовые куски CSV (с заголовком) или JSONL по строкам rows"""
+    headers = [header for header, _path in get_export(name).columns]
+    buffer = _Buffer()
+
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow([_csv_value(value) for value in row])
+            if buffer.size >= buffer_size:
+                yield buffer.take()
+    else:
+        for row in rows:
+            buffer.write(json.dumps(dict(zip(headers, row)), ensure_ascii=False, default=_json_value))
+            buffer.write('\n')
+            if buffer.size >= buffer_size:
+                yield buffer.take()
+    if buffer.size:
+        yield buffer.take()
+
+
+def gzip_chunks(chunks, level=6):
+    """Сжимает поток кусков в gzip на лету"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(name, fmt='csv', compress=False, **filters):
+    """Куски готового файла выгрузки: строки из БД -> CSV/JSONL -> (gzip)"""
+    get_export(name)
+    if fmt not in FORMATS:
+        raise ExportError(f"Неизвестный формат «{fmt}». Доступны: {', '.join(FORMATS)}")
+    chunks = render_chunks(name, export_rows(name, **filters), fmt)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+async def async_chunks(chunks):
+    """
+    Асинхронный итератор по синхронному потоку кусков. Все шаги идут в одном потоке
+    sync_to_async (thread_sensitive), где открыт курсор выгрузки; при обрыве генератор закрывается там же.
+    """
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        if hasattr(chunks, 'close'):
+            await sync_to_async(chunks.close)()
+
+
+def filename(name, fmt, compress=False):
+    return f"{name}-{timezone.localdate():%Y%m%d}.{fmt}" + ('.gz' if compress else '')
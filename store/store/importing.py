@@ -0,0 +1,79 @@
+# store/importing
+"""
+Общее для массовых загрузок из файлов (накладные delivery.importing, прайс-листы goods.importing):
+построчное чтение CSV или XLSX и ошибки формата. Каждый импорт задаёт свои столбцы.
+
+CSV читается модулем csv, XLSX — через openpyxl в режиме read_only (пакет необязательный,
+без него доступен только CSV). Строки не накапливаются: память не зависит от размера файла.
+"""
+import csv
+import io
+import itertools
+import os
+from collections import namedtuple
+
+RowError = namedtuple('RowError', 'line code message')
+
+
+class ImportFormatError(ValueError):
+    """Файл нельзя прочитать: неизвестный формат, нет нужных столбцов и т.п."""
+
+
+def _map_header(header, aliases, required):
+    """Номера столбцов по заголовку файла: {'code': 0, 'quantity': 3, ...}"""
+    lookup = {alias: field for field, names in aliases.items() for alias in names}
+    columns = {}
+    for index, title in enumerate(header):
+        field = lookup.get(str(title or '').strip().lower())
+        if field and field not in columns:
+            columns[field] = index
+    missing = [field for field in required if field not in columns]
+    if missing:
+        raise ImportFormatError(
+            "В файле нет обязательных столбцов: {}".format(', '.join(aliases[f][0] for f in missing))
+        )
+    return columns
+
+
+def _iter_csv(stream, encoding):
+    text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    first_line = text.readline()
+    # Выгрузки из Excel с русской локалью разделяют поля точкой с запятой
+    delimiter = ';' if first_line.count(';') > first_line.count(',') else ','
+    yield from csv.reader(itertools.chain([first_line], text), delimiter=delimiter)
+
+
+def _iter_xlsx(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFormatError("Для импорта XLSX нужен пакет openpyxl; сохраните файл в CSV")
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_rows(stream, filename, aliases, required, encoding='utf-8-sig'):
+    """
+    Построчно читает файл из бинарного потока.
+    aliases — {поле: допустимые заголовки столбца}, required — обязательные поля.
+    Возвращает итератор пар (номер строки, словарь значений по полям aliases).
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        rows = _iter_csv(stream, encoding)
+    elif extension in ('.xlsx', '.xlsm'):
+        rows = _iter_xlsx(stream)
+    else:
+        raise ImportFormatError(f"Неподдерживаемый формат файла: {extension or filename}")
+
+    header = next(rows, None)
+    if header is None:
+        raise ImportFormatError("Файл пуст")
+    columns = _map_header(header, aliases, required)
+    for line, values in enumerate(rows, start=2):
+        if not any(value not in (None, '') for value in values):
+            continue  # пустые строки в конце листа
+        yield line, {field: values[index] if index < len(values) else None for field, index in columns.items()}
@@ -0,0 +1,55 @@
+# store/instrumentation
+"""
+Журналирование и замеры времени для горячих путей (поставки, единицы товара, продажи).
+
+Все сообщения идут в логгеры "store.*" с отложенным форматированием
+(logger.debug("...%s", value)), поэтому при выключенном уровне DEBUG
+строки не собираются. timed() проверяет уровень один раз на входе и
+при выключенной трассировке не вызывает даже perf_counter.
+"""
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+# Стандартные атрибуты LogRecord — всё остальное считается полями extra
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def get_logger(name):
+    """Логгер внутри иерархии "store", например get_logger('unit') -> store.unit"""
+    return logging.getLogger(f'store.{name}')
+
+
+@contextmanager
+def timed(logger, operation, level=logging.DEBUG, **fields):
+    """
+    Замеряет время блока и пишет его в лог с полями operation и duration_ms.
+    Если уровень выключен, блок выполняется без накладных расходов.
+    """
+    if not logger.isEnabledFor(level):
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        logger.log(level, "%s: %.2f мс", operation, duration_ms,
+                   extra={'operation': operation, 'duration_ms': round(duration_ms, 3), **fields})
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, уровень, логгер, сообщение и поля extra"""
+
+    def format(self, record):
+        payload = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        payload.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS})
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
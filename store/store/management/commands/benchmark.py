@@ -0,0 +1,81 @@
+# store/management/commands/benchmark.py
+import json
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from store import benchmarks
+
+
+class Command(BaseCommand):
+    help = ("Замеряет горячие пути записи и чтения (поставки, единицы товара, продажи, каталог, заявки, "
+            "поиск) на созданном наборе данных: время и число запросов. Замеры идут в одноразовой "
+            "базе, которая создаётся и удаляется командой; рабочая база не трогается. "
+            "Результаты можно сохранить в JSON и сравнить с прошлым прогоном.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', metavar='name',
+                            help=f"Замеры (по умолчанию все): {', '.join(benchmarks.BENCHMARKS)}")
+        parser.add_argument('--scale', type=int, default=benchmarks.DEFAULT_SCALE,
+                            help='Товаров в наборе данных; заявок — scale/10, единиц в поставке замера — scale')
+        parser.add_argument('--repeat', type=int, default=benchmarks.DEFAULT_REPEAT)
+        parser.add_argument('--seed', type=int, default=0, help='random.seed набора данных')
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+        parser.add_argument('--compare', metavar='BASELINE', help='JSON прошлого прогона для сравнения')
+        parser.add_argument('--threshold', type=float, default=benchmarks.DEFAULT_THRESHOLD * 100,
+                            help='Рост медианы, %%, считающийся регрессией')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Завершиться с ошибкой, если есть регрессии')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as stream:
+                    baseline = json.load(stream)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Не удалось прочитать {options['compare']}: {e}")
+        if settings.DEBUG:
+            self.stderr.write("Внимание: DEBUG включён — каждый запрос пишется в память, замеры завышены. "
+                              "Для сравнения прогонов используйте STORE_ENV=prod.")
+
+        try:
+            # В тестовой базе (тесты команды) отдельная одноразовая не нужна
+            database = (nullcontext() if benchmarks.is_disposable()
+                        else benchmarks.disposable_database(progress=self.stdout.write))
+            with database:
+                results = benchmarks.run_benchmarks(options['names'], options['scale'], options['repeat'],
+                                                    options['seed'], progress=self.stdout.write)
+        except ValueError as e:
+            raise CommandError(e)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(results, stream, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Результаты записаны в {options['output']}")
+
+        if baseline is not None:
+            self.report(baseline, results, options)
+
+    def report(self, baseline, results, options):
+        differs = benchmarks.incomparable(baseline, results)
+        if differs:
+            self.stderr.write(f"Внимание: прогоны различаются параметрами {', '.join(differs)} — "
+                              f"время сравнивать нельзя")
+        meta = baseline['meta']
+        self.stdout.write(f"\nСравнение с {options['compare']} ({meta.get('commit') or 'без версии'}, "
+                          f"{meta.get('created_at')}):")
+        rows = benchmarks.compare(baseline, results, options['threshold'] / 100)
+        width = max(len(row.name) for row in rows)
+        for row in rows:
+            if row.baseline_ms is None:
+                line = f"{row.name:<{width}}  {'—':>10}  {row.current_ms:>10.1f} мс  {'':>8}  запросов {row.current_queries}"
+            else:
+                line = (f"{row.name:<{width}}  {row.baseline_ms:>10.1f}  {row.current_ms:>10.1f} мс  "
+                        f"{row.change:>+8.1%}  запросов {row.baseline_queries} -> {row.current_queries}")
+            self.stdout.write(f"{line}  {row.verdict}".rstrip())
+
+        regressions = [row.name for row in rows if row.verdict == benchmarks.REGRESSION]
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"Регрессии: {', '.join(regressions)}")
@@ -0,0 +1,90 @@
+# store/management/commands/benchmark_startup.py
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном процессе: время запуска и память считаются с чистого интерпретатора
+WORKER = r'''
+import json, resource, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns  # импорт всех представлений, как при первом запросе
+ready = time.perf_counter()
+rss_ready = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+from django.db import connection
+from django.test import Client
+client = Client()
+paths = sys.argv[2].split(',')
+statuses = set()
+first = time.perf_counter()
+for path in paths:
+    statuses.add(client.get(path).status_code)
+served_first = time.perf_counter()
+for _ in range(int(sys.argv[1])):
+    for path in paths:
+        client.get(path)
+served = time.perf_counter()
+print(json.dumps({
+    'setup_ms': (ready - started) * 1000,
+    'first_ms': (served_first - first) * 1000,
+    'request_ms': (served - served_first) * 1000 / (int(sys.argv[1]) * len(paths) or 1),
+    'modules': len(sys.modules),
+    'rss_ready_kb': rss_ready,
+    'rss_served_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'queries_logged': len(connection.queries_log),
+    'statuses': sorted(statuses),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает профили настроек по времени запуска рабочего процесса, числу импортированных "
+            "модулей и памяти после N запросов. Каждый замер — в новом процессе Python.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default='store.settings.dev,store.settings.prod')
+        parser.add_argument('--requests', type=int, default=200, help='Проходов по страницам после запуска')
+        parser.add_argument('--paths', default='/,/goods/products/,/request/')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    @staticmethod
+    def run(args, env):
+        result = subprocess.run([sys.executable, *args], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f"{env['DJANGO_SETTINGS_MODULE']}: {result.stderr.strip().splitlines()[-1]}")
+        return result.stdout
+
+    def handle(self, *args, **options):
+        # Манифест статики боевого профиля собирается во временный каталог
+        static_root = tempfile.TemporaryDirectory(prefix='store-static-')
+        for profile in options['profiles'].split(','):
+            env = {
+                **os.environ,
+                'DJANGO_SETTINGS_MODULE': profile,
+                'STORE_SECRET_KEY': os.environ.get('STORE_SECRET_KEY', 'benchmark-startup-' + 'x' * 40),
+                'STORE_ALLOWED_HOSTS': 'testserver',
+                'STORE_STATIC_ROOT': static_root.name,
+                'STORE_LOG_LEVEL': 'WARNING',
+            }
+            self.run(['manage.py', 'collectstatic', '--noinput', '--clear'], env)
+            runs = [json.loads(self.run(['-c', WORKER, str(options['requests']), options['paths']], env)
+                               .strip().splitlines()[-1])
+                    for _ in range(options['repeat'])]
+            best = min(runs, key=lambda run: run['setup_ms'])
+            self.stdout.write(
+                f"{profile}: запуск {best['setup_ms']:.0f} мс, модулей {best['modules']}, "
+                f"первые запросы {best['first_ms']:.0f} мс, далее {min(r['request_ms'] for r in runs):.2f} мс/запрос; "
+                f"память {best['rss_ready_kb'] / 1024:.1f} МБ после запуска, "
+                f"{max(r['rss_served_kb'] for r in runs) / 1024:.1f} МБ после запросов, "
+                f"SQL в журнале {best['queries_logged']}; ответы {best['statuses']}"
+            )
+        static_root.cleanup()
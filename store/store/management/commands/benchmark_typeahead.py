@@ -0,0 +1,145 @@
+# store/management/commands/benchmark_typeahead.py
+import asyncio
+import itertools
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from importlib.util import find_spec
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from goods.models import Product
+
+try:
+    import httpx
+except ImportError:  # httpx нужен только для этого замера
+    httpx = None
+
+MODES = {
+    'sync': '0',   # синхронные представления под ASGI (каждый запрос — поток)
+    'async': '1',  # асинхронные подсказки поиска (профиль asgi по умолчанию)
+}
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает пропускную способность подсказок поиска (/goods/search/) под ASGI-сервером "
+            "с синхронными и асинхронными представлениями при большом числе одновременных запросов. "
+            "Сервер (uvicorn, профиль store.settings.asgi) запускается на текущей БД в отдельном процессе.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default='sync,async')
+        parser.add_argument('--concurrency', type=int, default=200, help='Одновременных запросов')
+        parser.add_argument('--requests', type=int, default=5000, help='Запросов на режим')
+        parser.add_argument('--workers', type=int, default=1, help='Процессов uvicorn')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--cold', action='store_true',
+                            help='Уникальный параметр в каждом запросе: мимо кэша ответов, каждый запрос идёт в БД')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if httpx is None or find_spec('uvicorn') is None:
+            raise CommandError("Для замера нужны пакеты uvicorn и httpx")
+        modes = options['modes'].split(',')
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Неизвестные режимы: {', '.join(sorted(unknown))}")
+        queries = self.typeahead_queries(options['requests'], random.Random(options['seed']))
+        if not queries:
+            raise CommandError("В каталоге нет товаров — нечего искать")
+
+        self.stdout.write(f"{len(queries)} запросов, {options['concurrency']} одновременно, "
+                          f"uvicorn x{options['workers']}, {'без кэша' if options['cold'] else 'с кэшем ответов'}")
+        for mode in modes:
+            server = self.start_server(mode, options)
+            try:
+                stats = asyncio.run(self.load(queries, options))
+            finally:
+                server.terminate()
+                server.wait(timeout=10)
+            self.report(mode, stats)
+
+    @staticmethod
+    def typeahead_queries(count, rng):
+        """Префиксы слов из названий товаров по мере набора: «клю», «ключ», «ключ р»..."""
+        names = list(Product.objects.order_by('?').values_list('name', flat=True)[:500])
+        queries = []
+        for name in itertools.cycle(names) if names else ():
+            for length in range(3, min(len(name), 12) + 1):
+                queries.append(name[:length])
+            if len(queries) >= count:
+                break
+        rng.shuffle(queries)
+        return queries[:count]
+
+    def start_server(self, mode, options):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'store.settings.asgi',
+            'STORE_ASYNC_VIEWS': MODES[mode],
+            'STORE_SECRET_KEY': os.environ.get('STORE_SECRET_KEY', 'benchmark-typeahead-' + 'x' * 40),
+            'STORE_ALLOWED_HOSTS': '127.0.0.1',
+            'STORE_LOG_LEVEL': 'WARNING',
+            'STORE_DB_NAME': str(settings.DATABASES['default']['NAME']),
+        }
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'store.asgi:application', '--host', '127.0.0.1',
+             '--port', str(options['port']), '--workers', str(options['workers']), '--log-level', 'warning',
+             '--backlog', str(max(options['concurrency'] * 2, 2048))],
+            cwd=settings.BASE_DIR, env=env,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                httpx.get(f"http://127.0.0.1:{options['port']}/goods/search/?q=", timeout=1)
+                return server
+            except httpx.TransportError:
+                if server.poll() is not None:
+                    break
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f"{mode}: сервер не запустился")
+
+    @staticmethod
+    async def load(queries, options):
+        url = f"http://127.0.0.1:{options['port']}/goods/search/"
+        latencies, errors = [], Counter()
+        pending = iter(enumerate(queries))
+        limits = httpx.Limits(max_connections=options['concurrency'], max_keepalive_connections=options['concurrency'])
+
+        async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+            async def user():
+                for number, query in pending:
+                    params = {'q': query, **({'_': number} if options['cold'] else {})}
+                    started = time.perf_counter()
+                    try:
+                        response = await client.get(url, params=params)
+                        if response.status_code != 200:
+                            errors[f'HTTP {response.status_code}'] += 1
+                    except httpx.HTTPError as e:
+                        errors[type(e).__name__] += 1
+                    latencies.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(user() for _ in range(options['concurrency'])))
+            elapsed = time.perf_counter() - started
+        return latencies, errors, elapsed
+
+    def report(self, mode, stats):
+        latencies, errors, elapsed = stats
+        latencies.sort()
+
+        def percentile(share):
+            return latencies[min(int(len(latencies) * share), len(latencies) - 1)]
+
+        style = self.style.WARNING if errors else self.style.SUCCESS
+        details = ', '.join(f'{kind}: {count}' for kind, count in errors.most_common())
+        self.stdout.write(style(
+            f"  {mode}: {len(latencies) / elapsed:.0f} запр/с, медиана {statistics.median(latencies):.1f} мс, "
+            f"p95 {percentile(0.95):.1f} мс, p99 {percentile(0.99):.1f} мс, "
+            f"ошибок {sum(errors.values())}" + (f" ({details})" if details else "")
+        ))
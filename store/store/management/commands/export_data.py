@@ -0,0 +1,55 @@
+# store/management/commands/export_data.py
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store import exporting
+
+
+class Command(BaseCommand):
+    help = ("Потоковая выгрузка единиц товара, поставок, продаж или позиций заявок в CSV/JSONL. "
+            "Строки читаются пачками, память не зависит от размера выгрузки.")
+    # Байтовый поток для вывода вместо stdout — для call_command(..., stream=io.BytesIO())
+    stealth_options = ('stream',)
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=list(exporting.EXPORTS), help='Что выгружать')
+        parser.add_argument('--format', dest='fmt', choices=list(exporting.FORMATS), default='csv')
+        parser.add_argument('--output', '-o', help='Файл (по умолчанию stdout)')
+        parser.add_argument('--gzip', action='store_true', help='Сжать gzip на лету')
+        parser.add_argument('--date-from', help='С даты ГГГГ-ММ-ДД включительно')
+        parser.add_argument('--date-to', help='По дату ГГГГ-ММ-ДД включительно')
+        parser.add_argument('--product', help='ID товара')
+        parser.add_argument('--delivery', help='ID поставки')
+        parser.add_argument('--chunk-size', type=int, default=exporting.EXPORT_CHUNK_SIZE,
+                            help='Строк в одной выборке из курсора')
+
+    def handle(self, *args, **options):
+        try:
+            filters = exporting.parse_filters(options['date_from'], options['date_to'],
+                                              options['product'], options['delivery'])
+        except exporting.ExportError as e:
+            raise CommandError(str(e))
+
+        rows = exporting.export_rows(options['name'], chunk_size=options['chunk_size'], **filters)
+        chunks = exporting.render_chunks(options['name'], rows, options['fmt'])
+        if options['gzip']:
+            chunks = exporting.gzip_chunks(chunks)
+
+        # Вывод — всегда байтовый поток: файл, stdout процесса или stream=, переданный в call_command
+        if options['output']:
+            stream = open(options['output'], 'wb')
+        else:
+            stream = options.get('stream') or sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in chunks:
+                stream.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                stream.close()
+            else:
+                stream.flush()
+        if options['output']:
+            self.stderr.write(f"{options['output']}: {written} байт")
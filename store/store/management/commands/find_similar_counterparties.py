@@ -0,0 +1,28 @@
+# store/management/commands/find_similar_counterparties.py
+from django.core.management.base import BaseCommand
+
+from customers.models import Customer
+from store.matching import DEFAULT_CUTOFF, similar_pairs
+from suppliers.models import Supplier
+
+
+class Command(BaseCommand):
+    help = ("Выводит пары поставщиков и покупателей с похожими наименованиями — возможные дубли, "
+            "например после перевода текстовых полей на справочники. Ничего не изменяет: "
+            "объединять записи нужно вручную.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cutoff', type=float, default=DEFAULT_CUTOFF,
+                            help='Порог схожести названий, от 0 до 1')
+
+    def handle(self, *args, **options):
+        found = 0
+        for title, model in (('Поставщики', Supplier), ('Покупатели', Customer)):
+            names = dict(model.objects.order_by('pk').values_list('pk', 'name'))
+            pairs = similar_pairs(names.items(), options['cutoff'])
+            found += len(pairs)
+            if pairs:
+                self.stdout.write(f"{title}:")
+            for first, second in pairs:
+                self.stdout.write(f"  #{first} «{names[first]}» ~ #{second} «{names[second]}»")
+        self.stdout.write(self.style.SUCCESS(f"Похожих пар: {found}"))
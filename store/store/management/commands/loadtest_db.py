@@ -0,0 +1,157 @@
+# store/management/commands/loadtest_db.py
+import queue
+import statistics
+import threading
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from delivery.models import Delivery
+from goods.models import Product
+from request.models import Request, RequestItem
+from sale.pos import record_sale
+from store import benchmarks
+from trading_day.models import Event
+from unit.issuing import issue_units
+
+RETRIES = 50
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный тест записи: параллельные поставки (Delivery + единицы товара) и продажи "
+            "через кассу. Нагрузка идёт в одноразовой базе той же СУБД, которая создаётся и удаляется "
+            "командой; рабочая база — только с --live. Для сравнения СУБД запустите команду "
+            "с разными STORE_DB_BACKEND.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Потоков каждого вида (поставки и продажи)')
+        parser.add_argument('--operations', type=int, default=50, help='Операций на поток')
+        parser.add_argument('--units', type=int, default=5, help='Единиц товара в каждой поставке')
+        parser.add_argument('--keep', action='store_true', help='Не удалять созданные данные (только с --live)')
+        parser.add_argument('--live', action='store_true',
+                            help='Нагружать рабочую базу: тест держит блокировки записи и добавляет в неё данные')
+
+    def handle(self, *args, **options):
+        if options['keep'] and not options['live']:
+            raise CommandError("--keep имеет смысл только с --live: одноразовая база удаляется после замера")
+        # Одноразовая база создаётся как тестовая (SQLite — файлом во временном каталоге, потокам это и нужно)
+        database = (nullcontext() if options['live'] or benchmarks.is_disposable()
+                    else benchmarks.disposable_database(progress=self.stdout.write))
+        with database:
+            self.run(options)
+
+    def run(self, options):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError("Потокам нужна файловая БД SQLite")
+        threads, operations = options['threads'], options['operations']
+
+        # Позиция заявки вмещает и запас для продаж, и все поставки потоков
+        product, item = self.prepare(threads * operations * (options['units'] + 1))
+        serials = queue.SimpleQueue()
+        stock = Delivery(request_item=item, quantity=threads * operations, delivery_date=timezone.localdate())
+        with transaction.atomic():
+            stock.save()
+            issue_units(stock)
+        for serial in stock.product_units.values_list('serial_number', flat=True):
+            serials.put(serial)
+
+        results = {'deliveries': [], 'sales': []}
+        retries = {'deliveries': 0, 'sales': 0}
+        errors = []
+
+        def deliver():
+            def operation():
+                delivery = Delivery(request_item=item, quantity=options['units'],
+                                    delivery_date=timezone.localdate())
+                with transaction.atomic():
+                    delivery.save()
+                    issue_units(delivery)
+            return operation
+
+        def sell():
+            serial = serials.get_nowait()  # при повторе продаётся та же единица
+            return lambda: record_sale(serial, '150')
+
+        def worker(kind, make_operation):
+            try:
+                for _ in range(operations):
+                    operation = make_operation()
+                    started = time.perf_counter()
+                    for _attempt in range(RETRIES):
+                        try:
+                            operation()
+                            break
+                        except OperationalError:
+                            # SQLite: блокировка записи не освободилась за busy timeout — повторяем транзакцию
+                            retries[kind] += 1
+                            time.sleep(0.005)
+                    else:
+                        raise RuntimeError(f"{kind}: не удалось записать за {RETRIES} попыток")
+                    results[kind].append((time.perf_counter() - started) * 1000)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(kind, make_operation))
+                   for kind, make_operation in (('deliveries', deliver), ('sales', sell)) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"{self.describe_backend()}; {threads} + {threads} потоков, {elapsed:.2f} с")
+        for kind, timings in results.items():
+            if not timings:
+                continue
+            timings.sort()
+            self.stdout.write(
+                f"  {kind}: {len(timings)} операций, {len(timings) / elapsed:.1f} оп/с, "
+                f"медиана {statistics.median(timings):.1f} мс, p95 {timings[int(len(timings) * 0.95) - 1]:.1f} мс, "
+                f"максимум {timings[-1]:.1f} мс, повторов {retries[kind]}"
+            )
+        for error in errors:
+            self.stderr.write(f"  ошибка: {error!r}")
+
+        if not options['keep']:
+            self.cleanup(product)
+        if errors:
+            raise CommandError(f"Ошибок при нагрузке: {len(errors)}")
+
+    @staticmethod
+    def prepare(quantity):
+        product = Product.objects.create(code=f'LOAD-{time.time_ns()}', name='Load test product')
+        request = Request.objects.create(status=Request.Status.IN_REQUEST)
+        Request.objects.filter(pk=request.pk).update(created_at=timezone.now() - timedelta(days=1))
+        item = RequestItem.objects.create(request=request, product=product, quantity=quantity, price_per_unit=100)
+        return product, item
+
+    @staticmethod
+    def describe_backend():
+        database = settings.DATABASES['default']
+        description = f"{connection.vendor}, CONN_MAX_AGE={database.get('CONN_MAX_AGE', 0)}"
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                description += f", journal_mode={cursor.fetchone()[0]}"
+        elif database.get('OPTIONS', {}).get('pool'):
+            description += ", пул соединений"
+        return description
+
+    @staticmethod
+    def cleanup(product):
+        """Удаляет данные теста через delete() моделей — сводки продаж и остатков возвращаются назад"""
+        for event in Event.objects.filter(sale__product_unit__product=product):
+            event.delete()
+        item = RequestItem.objects.select_related('request').get(product=product)
+        for delivery in Delivery.objects.filter(request_item=item):
+            delivery.delete()
+        item.request.delete()
+        product.delete()
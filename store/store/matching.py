@@ -0,0 +1,77 @@
+# store/matching
+"""
+Сопоставление наименований контрагентов (поставщиков, покупателей).
+
+Название нормализуется: регистр, ё/е, кавычки, пунктуация и организационно-правовая
+форма (ООО, ИП, АО...) не учитываются. Одной записью считаются только названия,
+совпавшие после нормализации. Похожие названия (опечатки, окончания) лишь предлагаются
+на проверку — «Альфа 1» и «Альфа 2», «ИП Иванов» и «ИП Иванова» могут быть разными
+контрагентами, поэтому автоматически не объединяются. Отчёт о похожих записях
+справочников — команда find_similar_counterparties.
+"""
+import difflib
+import re
+
+LEGAL_FORMS = ('ооо', 'оао', 'зао', 'пао', 'ао', 'ип', 'нко', 'llc', 'ltd', 'inc')
+_LEGAL_FORMS_RE = re.compile(r'\b(?:' + '|'.join(LEGAL_FORMS) + r')\b')
+_PUNCTUATION_RE = re.compile(r'[^\w\s]+')
+_DIGITS_RE = re.compile(r'\d+')
+
+DEFAULT_CUTOFF = 0.85
+# Короче этого нормализованные названия не сравниваются нечётко: одна буква в них — уже другое имя
+MIN_SIMILAR_LENGTH = 8
+
+
+def normalize_name(name):
+    name = (name or '').casefold().replace('ё', 'е')
+    name = _PUNCTUATION_RE.sub(' ', name)
+    name = _LEGAL_FORMS_RE.sub(' ', name)
+    return ' '.join(name.split())
+
+
+def comparable(key, other):
+    """Можно ли нормализованные названия сравнивать нечётко: числа в них совпадают, оба не слишком короткие"""
+    return (min(len(key), len(other)) >= MIN_SIMILAR_LENGTH
+            and _DIGITS_RE.findall(key) == _DIGITS_RE.findall(other))
+
+
+class NameMatcher:
+    """Сопоставляет строки со справочником {pk: наименование}"""
+
+    def __init__(self, names, cutoff=DEFAULT_CUTOFF):
+        self.cutoff = cutoff
+        self.by_key = {}
+        for pk, name in names:
+            self.add(pk, name)
+        self.by_key.pop('', None)
+
+    def add(self, pk, name):
+        self.by_key.setdefault(normalize_name(name), pk)
+
+    def match(self, name):
+        """pk записи с тем же нормализованным названием или None"""
+        key = normalize_name(name)
+        return self.by_key.get(key) if key else None
+
+    def similar(self, name, n=3):
+        """pk записей с похожими, но не совпадающими названиями — кандидаты для ручной проверки"""
+        key = normalize_name(name)
+        if not key:
+            return []
+        keys = [other for other in self.by_key if other != key and comparable(key, other)]
+        return [self.by_key[other] for other in difflib.get_close_matches(key, keys, n=n, cutoff=self.cutoff)]
+
+
+def similar_pairs(names, cutoff=DEFAULT_CUTOFF):
+    """
+    Пары (pk, pk) записей справочника [(pk, наименование)], названия которых похожи
+    или совпадают после нормализации. Каждая пара — один раз, меньший pk первым.
+    """
+    matcher = NameMatcher((), cutoff)
+    pairs = []
+    for pk, name in names:
+        same = matcher.match(name)
+        found = [same] if same is not None else []
+        pairs.extend((min(pk, other), max(pk, other)) for other in [*found, *matcher.similar(name)])
+        matcher.add(pk, name)
+    return sorted(set(pairs))
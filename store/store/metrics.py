@@ -0,0 +1,269 @@
+# store/metrics
+"""
+Метрики запросов в текстовом формате Prometheus (представление /metrics).
+
+MetricsMiddleware считает запросы по имени URL (goods:search_products,
+admin:goods_product_changelist...), методу и коду ответа, а для доли запросов
+METRICS_SAMPLE_RATE — гистограммы времени ответа, числа и времени SQL-запросов
+и размера ответа. Работает и в синхронном, и в асинхронном стеке.
+
+SQL считается обёрткой connection.execute_wrapper, которая ставится на каждое
+соединение при его открытии (сигнал connection_created): под ASGI запросы к БД
+идут из потока sync_to_async со своим соединением. Замер текущего запроса
+передаётся в обёртку через contextvar. Запросы, выполненные при отдаче
+потокового ответа (после выхода из представления), не учитываются.
+
+Значения хранятся в памяти процесса. При нескольких воркерах за одним портом
+каждый скрейп попадает в один из них — там воркеры стоит опрашивать по отдельности.
+"""
+import bisect
+import random
+import threading
+import time
+from contextvars import ContextVar
+from math import inf
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = tuple(1024 * 4 ** power for power in range(8))  # 1 КБ ... 16 МБ
+
+UNMATCHED = '<unmatched>'
+# Сама страница метрик в них не попадает
+EXCLUDED_VIEWS = {'metrics'}
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+_lock = threading.Lock()
+_query_stats = ContextVar('store_metrics_query_stats', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return '+Inf' if value == inf else repr(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with _lock:
+            values = sorted(self.values.items())
+        for labels, value in values:
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}  # метки -> [число наблюдений по корзинам (последняя — сверх всех), сумма]
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with _lock:
+            values = sorted((labels, list(counts), total) for labels, (counts, total) in self.values.items())
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, inf), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', _labels(self.labelnames, labels, [('le', _number(bound))]), cumulative
+            yield f'{self.name}_sum', _labels(self.labelnames, labels), total
+            yield f'{self.name}_count', _labels(self.labelnames, labels), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def reset(self):
+        with _lock:
+            for metric in self.metrics:
+                metric.values.clear()
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(f'{name}{labels} {_number(value)}' for name, labels, value in metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    'store_http_requests_total', 'Запросов по имени URL, методу и коду ответа', ('view', 'method', 'status')))
+LATENCY = registry.register(Histogram(
+    'store_http_request_duration_seconds', 'Время ответа, с', ('view',), LATENCY_BUCKETS))
+QUERIES = registry.register(Histogram(
+    'store_http_request_queries', 'SQL-запросов на запрос', ('view',), QUERY_COUNT_BUCKETS))
+QUERY_TIME = registry.register(Histogram(
+    'store_http_request_query_seconds', 'Время SQL-запросов на запрос, с', ('view',), LATENCY_BUCKETS))
+RESPONSE_SIZE = registry.register(Histogram(
+    'store_http_response_size_bytes', 'Размер ответа, байт', ('view',), SIZE_BUCKETS))
+
+
+class QueryStats:
+    """Число и суммарное время SQL-запросов одного HTTP-запроса"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка execute_wrapper: учитывает запрос, если текущий HTTP-запрос замеряется"""
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.duration += time.perf_counter() - started
+        stats.count += 1
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name or UNMATCHED) if match else UNMATCHED
+
+
+def _sampled():
+    rate = settings.METRICS_SAMPLE_RATE
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def _count_stream(response, view):
+    """Оборачивает потоковый ответ: размер учитывается, когда тело отдано целиком"""
+    content = response.streaming_content
+
+    if response.is_async:
+        async def counted():
+            size = 0
+            async for chunk in content:
+                size += len(chunk)
+                yield chunk
+            RESPONSE_SIZE.observe(size, view)
+    else:
+        def counted():
+            size = 0
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+            RESPONSE_SIZE.observe(size, view)
+
+    response.streaming_content = counted()
+
+
+def _record(request, response, stats=None, duration=None):
+    view = view_name(request)
+    if view in EXCLUDED_VIEWS:
+        return
+    method = request.method if request.method in METHODS else 'other'
+    REQUESTS.inc(view, method, str(response.status_code))
+    if stats is None:
+        return
+    LATENCY.observe(duration, view)
+    QUERIES.observe(stats.count, view)
+    QUERY_TIME.observe(stats.duration, view)
+    if not response.streaming:
+        RESPONSE_SIZE.observe(len(response.content), view)
+    elif response.has_header('Content-Length'):
+        RESPONSE_SIZE.observe(int(response['Content-Length']), view)
+    else:
+        _count_stream(response, view)
+
+
+class MetricsMiddleware:
+    """
+    Снимает метрики каждого запроса. Стоит первым в MIDDLEWARE, чтобы время
+    и размер ответа учитывали остальные middleware (в том числе сжатие).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not _sampled():
+            response = self.get_response(request)
+            _record(request, response)
+            return response
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_stats.reset(token)
+        _record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not _sampled():
+            response = await self.get_response(request)
+            _record(request, response)
+            return response
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_stats.reset(token)
+        _record(request, response, stats, time.perf_counter() - started)
+        return response
@@ -0,0 +1,17 @@
+"""
+Настройки проекта разделены на профили:
+base — общие, dev — разработка (DEBUG, панель отладки), prod — боевой,
+asgi — боевой под ASGI-сервером с асинхронными представлениями.
+DJANGO_SETTINGS_MODULE=store.settings выбирает профиль по STORE_ENV (dev по умолчанию),
+профиль можно указать и напрямую: DJANGO_SETTINGS_MODULE=store.settings.prod.
+"""
+import os
+
+STORE_ENV = os.environ.get('STORE_ENV', 'dev')
+
+if STORE_ENV == 'prod':
+    from .prod import *  # noqa: F401,F403
+elif STORE_ENV == 'asgi':
+    from .asgi import *  # noqa: F401,F403
+else:
+    from .dev import *  # noqa: F401,F403
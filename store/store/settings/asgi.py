@@ -0,0 +1,18 @@
+"""
+Профиль для ASGI-сервера: боевой профиль и асинхронное представление подсказок поиска.
+
+Запуск (uvicorn или gunicorn с воркером uvicorn):
+    STORE_ENV=asgi uvicorn store.asgi:application --workers 4
+    STORE_ENV=asgi gunicorn store.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+
+Под ASGI синхронный код ORM выполняется в потоках, которые живут один запрос,
+поэтому постоянные соединения не переиспользуются, а копятся — CONN_MAX_AGE = 0.
+Держать соединения с PostgreSQL стоит пулом (STORE_DB_POOL=1).
+"""
+from .prod import *  # noqa: F401,F403
+from .prod import DATABASES, os
+
+# STORE_ASYNC_VIEWS=0 — синхронный поиск под ASGI (для сравнения, см. benchmark_typeahead)
+ASYNC_VIEWS = os.environ.get('STORE_ASYNC_VIEWS', '1') == '1'
+
+DATABASES = {alias: {**database, 'CONN_MAX_AGE': 0} for alias, database in DATABASES.items()}
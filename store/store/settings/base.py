@@ -0,0 +1,276 @@
+"""
+Общие настройки проекта store для всех профилей (store.settings.dev, store.settings.prod).
+
+Generated by 'django-admin startproject' using Django 5.2.5.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/5.2/ref/settings/
+"""
+import os
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = os.environ.get('STORE_SECRET_KEY', 'django-insecure-@h3x8pfnnt)r69zetzz99obleb4*#9i#qr^k$cr5@6!fxq5+jm')
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+ALLOWED_HOSTS = [host for host in os.environ.get('STORE_ALLOWED_HOSTS', '').split(',') if host]
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    # проектные команды (store/management), выгрузки и метрики
+    'store.apps.StoreConfig',
+    # простые app
+    'goods.apps.GoodsConfig',
+    'files.apps.FilesConfig',
+    'suppliers.apps.SuppliersConfig',
+    'customers.apps.CustomersConfig',
+    # непростые app
+    'unit.apps.UnitConfig',
+    'request.apps.RequestConfig',
+    'delivery.apps.DeliveryConfig',
+    'sale.apps.SaleConfig',
+    'trading_day.apps.TradingDayConfig',
+]
+ADMIN_LOGS_BACKEND = 'admin_logs.backends.database.DatabaseBackend'
+
+MIDDLEWARE = [
+    'store.metrics.MetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'store.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [BASE_DIR / 'store/templates'],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'store.wsgi.application'
+ASGI_APPLICATION = 'store.asgi.application'
+# Асинхронное представление подсказок поиска (goods.views.asearch_products), остальные — синхронные.
+# Имеет смысл только под ASGI-сервером — см. профиль store.settings.asgi
+ASYNC_VIEWS = os.environ.get('STORE_ASYNC_VIEWS', '0') == '1'
+
+
+# Database
+# https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+
+# STORE_DB_BACKEND: sqlite (по умолчанию) или postgresql.
+# STORE_DB_CONN_MAX_AGE — сколько секунд держать соединение между запросами (0 — закрывать сразу)
+STORE_DB_BACKEND = os.environ.get('STORE_DB_BACKEND', 'sqlite')
+STORE_DB_CONN_MAX_AGE = int(os.environ.get('STORE_DB_CONN_MAX_AGE', 60))
+# PostgreSQL: STORE_DB_POOL=1 включает пул соединений psycopg (нужен psycopg[pool]);
+# с пулом соединения не держатся запросами, а возвращаются в пул, поэтому CONN_MAX_AGE = 0
+STORE_DB_POOL = os.environ.get('STORE_DB_POOL', '') in ('1', 'true', 'yes')
+
+DATABASE_BACKENDS = {
+    'sqlite': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('STORE_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': STORE_DB_CONN_MAX_AGE,
+        'OPTIONS': {
+            # busy timeout: писатель ждёт освобождения блокировки, а не получает «database is locked»
+            'timeout': int(os.environ.get('STORE_DB_BUSY_TIMEOUT', 20)),
+            # Транзакция сразу берёт блокировку записи — без взаимоблокировок при повышении чтения до записи
+            'transaction_mode': 'IMMEDIATE',
+            # WAL: читатели не ждут писателя; synchronous=NORMAL в WAL не теряет целостность при сбое,
+            # mmap и кэш страниц ускоряют чтение каталога. Режим WAL записывается в заголовок файла
+            # базы (db.sqlite3 в репозитории уже в нём); файлы -wal и -shm рядом с базой — в .gitignore
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                f"PRAGMA mmap_size={int(os.environ.get('STORE_DB_MMAP_SIZE', 256 * 1024 * 1024))};"
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+        # Файловая тестовая БД: многопоточные тесты (delivery.tests) открывают несколько соединений
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    },
+    'postgresql': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('STORE_DB_NAME', 'store'),
+        'USER': os.environ.get('STORE_DB_USER', 'store'),
+        'PASSWORD': os.environ.get('STORE_DB_PASSWORD', ''),
+        'HOST': os.environ.get('STORE_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('STORE_DB_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if STORE_DB_POOL else STORE_DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            **({'pool': {
+                'min_size': int(os.environ.get('STORE_DB_POOL_MIN', 2)),
+                'max_size': int(os.environ.get('STORE_DB_POOL_MAX', 10)),
+                'timeout': int(os.environ.get('STORE_DB_POOL_TIMEOUT', 10)),
+            }} if STORE_DB_POOL else {}),
+        },
+    },
+}
+DATABASES = {
+    'default': DATABASE_BACKENDS[STORE_DB_BACKEND],
+}
+
+# Кэш ответов витрины (goods.cache)
+# STORE_CACHE_BACKEND: locmem (по умолчанию), file или redis
+STORE_CACHE_BACKEND = os.environ.get('STORE_CACHE_BACKEND', 'locmem')
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'store',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('STORE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('STORE_CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+    },
+}
+CACHES = {
+    'default': CACHE_BACKENDS[STORE_CACHE_BACKEND],
+}
+VIEW_CACHE_ALIAS = 'default'
+# Время жизни закэшированных ответов, секунд
+VIEW_CACHE_TTL = {
+    'products_view': 300,
+    'product_detail': 600,
+    'search_products': 60,
+}
+
+MEDIA_URL = '/media/'  # URL-префикс для медиафайлов
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # Абсолютный путь к папке с медиа
+
+# Уменьшенные копии изображений товаров (files.renditions)
+IMAGE_RENDITION_WORKERS = 2
+IMAGE_RENDITIONS_SYNC = False  # True — создавать копии сразу после коммита, без пула потоков
+
+# Настройки для статических файлов (CSS, JS и т.д.)
+STATIC_URL = '/static/'
+STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = os.environ.get('STORE_STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+# Password validation
+# https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/5.2/topics/i18n/
+
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_TZ = True
+
+# Метрики запросов (store.metrics), отдаются на /metrics в формате Prometheus.
+# STORE_METRICS_SAMPLE_RATE — доля запросов (0..1), для которых снимаются время ответа,
+# SQL и размер ответа; счётчик запросов ведётся всегда.
+# /metrics открыт персоналу, адресам STORE_METRICS_ALLOWED_IPS (через запятую)
+# и запросам с заголовком Authorization: Bearer <STORE_METRICS_TOKEN>
+METRICS_SAMPLE_RATE = float(os.environ.get('STORE_METRICS_SAMPLE_RATE', 1))
+METRICS_ALLOWED_IPS = [ip for ip in os.environ.get('STORE_METRICS_ALLOWED_IPS', '').split(',') if ip]
+METRICS_TOKEN = os.environ.get('STORE_METRICS_TOKEN', '')
+
+# Журналирование (store.instrumentation)
+# STORE_LOG_LEVEL=DEBUG включает трассировку и замеры времени горячих путей,
+# STORE_LOG_FORMAT=json — вывод одной JSON-строкой на запись
+STORE_LOG_LEVEL = os.environ.get('STORE_LOG_LEVEL', 'INFO')
+STORE_LOG_FORMAT = os.environ.get('STORE_LOG_FORMAT', 'simple')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'verbose': {
+            'format': '{levelname} {asctime} {module} {message}',
+            'style': '{',
+        },
+        'simple': {
+            'format': '{levelname} {message}',
+            'style': '{',
+        },
+        'json': {
+            '()': 'store.instrumentation.JsonFormatter',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': STORE_LOG_FORMAT,
+        },
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': True,
+        },
+        'store': {
+            'handlers': ['console'],
+            'level': STORE_LOG_LEVEL,
+            'propagate': True,
+        },
+    },
+}
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/5.2/howto/static-files/
+
+STATIC_URL = 'static/'
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+LANGUAGE_CODE = 'en-us'
\ No newline at end of file
@@ -0,0 +1,16 @@
+"""Профиль разработки: DEBUG, панель отладки и подробное журналирование"""
+import sys
+
+from .base import *  # noqa: F401,F403
+from .base import INSTALLED_APPS, LOGGING, MIDDLEWARE, os
+
+DEBUG = True
+
+INSTALLED_APPS = [*INSTALLED_APPS, 'debug_toolbar']
+MIDDLEWARE = ['debug_toolbar.middleware.DebugToolbarMiddleware', *MIDDLEWARE]
+INTERNAL_IPS = ['127.0.0.1']
+
+# manage.py test: замеры времени (DEBUG) и итоги импортов (INFO) заглушили бы вывод тестов
+TESTING = sys.argv[1:2] == ['test']
+STORE_LOG_LEVEL = os.environ.get('STORE_LOG_LEVEL', 'WARNING' if TESTING else 'DEBUG')
+LOGGING['loggers']['store']['level'] = STORE_LOG_LEVEL
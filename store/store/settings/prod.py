@@ -0,0 +1,49 @@
+"""
+Боевой профиль: без DEBUG и инструментов отладки (DEBUG хранит в памяти текст каждого SQL-запроса),
+с кэшем скомпилированных шаблонов, хэшированными именами статики и сжатием ответов.
+Перед запуском: STORE_SECRET_KEY, STORE_ALLOWED_HOSTS и manage.py collectstatic.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import MIDDLEWARE, TEMPLATES, os
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('STORE_SECRET_KEY', '')
+if not SECRET_KEY:
+    raise ImproperlyConfigured("Для боевого профиля задайте STORE_SECRET_KEY")
+
+# Сжатие ответа и 304 по ETag/Last-Modified — до middleware, читающих тело ответа;
+# метрики — снаружи всех, чтобы видеть итоговый размер ответа
+_OUTER_MIDDLEWARE = [
+    'store.metrics.MetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.gzip.GZipMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
+]
+MIDDLEWARE = [*_OUTER_MIDDLEWARE, *(name for name in MIDDLEWARE if name not in _OUTER_MIDDLEWARE)]
+
+# Шаблоны компилируются один раз на процесс
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+# Имена статики с хэшем содержимого: браузер кэширует файлы бессрочно
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'},
+}
+
+SESSION_COOKIE_SECURE = os.environ.get('STORE_SECURE_COOKIES', '1') == '1'
+CSRF_COOKIE_SECURE = SESSION_COOKIE_SECURE
@@ -0,0 +1,383 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from customers.models import Customer
+from delivery.models import Delivery
+from files.models import ProductImage
+from goods.admin import ProductAdmin
+from goods.models import Category, Product
+from request.models import Request, RequestItem
+from sale.models import Sale
+from store import benchmarks, exporting, metrics, views
+from suppliers.models import Supplier
+from trading_day.models import Event, TradingDay
+from unit.models import ProductUnit
+
+
+class AdminChangelistQueryTests(TestCase):
+    """
+    Число запросов страницы списка каждой зарегистрированной модели зафиксировано
+    и не зависит от числа строк — так N+1 в колонках списка не вернутся незамеченными.
+    """
+    # Сессия, пользователь, count() по фильтру и общий, выборка строк;
+    # плюс запросы list_filter, date_hierarchy и prefetch главного изображения
+    EXPECTED_QUERIES = {
+        'auth.Group': 5,
+        'auth.User': 6,
+        'customers.Customer': 6,
+        'delivery.Delivery': 5,
+        'files.ProductImage': 6,
+        'goods.Category': 6,
+        'goods.Product': 6,
+        'request.Request': 5,
+        'request.RequestItem': 5,
+        'sale.DailySales': 9,
+        'sale.Sale': 5,
+        'suppliers.Supplier': 5,
+        'trading_day.Event': 5,
+        'trading_day.TradingDay': 7,
+        'unit.ProductUnit': 6,
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+
+    def seed(self, rows):
+        """Добавляет по rows объектов каждой модели со всеми связями, которые показывает список"""
+        offset = Product.objects.count()
+        for i in range(offset, offset + rows):
+            parent = Category.objects.create(name=f'Section {i}')
+            category = Category.objects.create(name=f'Category {i}', parent=parent)
+            product = Product.objects.create(code=f'RF-{i}', name=f'Ключ {i}', category=category)
+            ProductImage.objects.create(product=product, image=f'products/RF-{i}/rf-{i}.jpg', is_main=True)
+            ProductImage.objects.create(product=product, image=f'products/RF-{i}/rf-{i}-2.jpg')
+            Supplier.objects.create(name=f'Поставщик {i}', contact_person='Иван', phone=f'+7900{i:07d}')
+            Customer.objects.create(name=f'Покупатель {i}', phone=f'+7911{i:07d}')
+
+            request = Request.objects.create(status=Request.Status.IN_REQUEST)
+            Request.objects.filter(pk=request.pk).update(created_at=timezone.now() - timedelta(days=2))
+            item = RequestItem.objects.create(request=request, product=product, quantity=3,
+                                              price_per_unit=Decimal('100'))
+            RequestItem.objects.create(request=request, product=product, quantity=1, price_per_unit=Decimal('50'))
+            delivery = Delivery.objects.create(request_item=item, quantity=2,
+                                               delivery_date=timezone.localdate() - timedelta(days=1))
+            unit = ProductUnit.objects.create(product=product, delivery=delivery)
+            ProductUnit.objects.create(product=product, delivery=delivery)
+
+            day = TradingDay.objects.create(date=timezone.localdate() - timedelta(days=i))
+            event = Event.objects.create(trading_day=day, type=Event.EventType.SALE)
+            Event.objects.create(trading_day=day, type=Event.EventType.OTHER)
+            Sale.objects.create(event=event, product_unit=unit, price=Decimal('150'))
+
+    def changelist_queries(self, model):
+        url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(context)
+
+    def test_every_changelist_is_pinned(self):
+        registered = {model._meta.label for model in admin.site._registry}
+        self.assertEqual(registered, set(self.EXPECTED_QUERIES),
+                         "Новую модель в админке нужно добавить в EXPECTED_QUERIES")
+
+    def test_changelist_query_counts_do_not_grow_with_rows(self):
+        for rows in (2, 5):
+            self.seed(rows)
+            for model in admin.site._registry:
+                label = model._meta.label
+                with self.subTest(model=label, rows=rows):
+                    self.assertEqual(self.changelist_queries(model), self.EXPECTED_QUERIES[label])
+
+
+    def test_annotated_count_columns_are_sortable(self):
+        self.seed(2)
+        ProductImage.objects.create(product=Product.objects.get(code='RF-1'), image='products/RF-1/rf-1-3.jpg')
+        column = ProductAdmin.list_display.index('images_count') + 1
+        response = self.client.get(reverse('admin:goods_product_changelist'), {'o': f'-{column}'})
+        self.assertEqual([product.code for product in response.context['cl'].result_list], ['RF-1', 'RF-0'])
+
+
+class ImportAdminTests(TestCase):
+    """Импорт накладных и прайс-листов в админке: общий reader и шаблон store.importing"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+
+    def upload(self, url_name, text, filename='file.csv'):
+        upload = io.BytesIO(text.encode('utf-8'))
+        upload.name = filename
+        return self.client.post(reverse(url_name), {'file': upload, 'encoding': 'utf-8-sig', 'dry_run': 'on'})
+
+    def test_format_errors_are_shown_on_the_form(self):
+        for url_name in ('admin:delivery_delivery_import', 'admin:goods_product_import'):
+            with self.subTest(url_name=url_name):
+                self.assertContains(self.upload(url_name, 'name\nКлюч\n'), 'В файле нет обязательных столбцов')
+                self.assertContains(self.upload(url_name, 'code\n', 'file.txt'), 'Неподдерживаемый формат файла')
+
+    def test_delivery_import_reports_concurrent_over_delivery(self):
+        error = ValidationError({'quantity': 'Количество превышает остаток по позиции заявки'})
+        with mock.patch('delivery.admin.import_deliveries', side_effect=error):
+            response = self.upload('admin:delivery_delivery_import', 'code;quantity\nRF-1;2\n')
+        self.assertContains(response, 'Импорт прерван: Количество превышает остаток по позиции заявки')
+
+    def test_catalog_dry_run_reports_result(self):
+        response = self.upload('admin:goods_product_import', 'code;name\nRF-1;Ключ\n')
+        self.assertContains(response, 'Проверка без записи: строк 1, создано 1')
+        self.assertFalse(Product.objects.exists())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        self.today = timezone.localdate()
+        self.products = [Product.objects.create(code=f'EX-{i}', name=f'Ключ «{i}», 10 мм') for i in range(2)]
+        request = Request.objects.create(status=Request.Status.IN_REQUEST)
+        Request.objects.filter(pk=request.pk).update(created_at=timezone.now() - timedelta(days=10))
+        self.deliveries = []
+        for days, product in ((5, self.products[0]), (1, self.products[1])):
+            item = RequestItem.objects.create(request=request, product=product, quantity=3,
+                                              price_per_unit=Decimal('100'))
+            delivery = Delivery.objects.create(request_item=item, quantity=3,
+                                               delivery_date=self.today - timedelta(days=days))
+            for _ in range(3):
+                ProductUnit.objects.create(product=product, delivery=delivery)
+            self.deliveries.append(delivery)
+        day = TradingDay.objects.create(date=self.today)
+        unit = self.deliveries[1].product_units.first()
+        self.sale = Sale.objects.create(event=Event.objects.create(trading_day=day, type=Event.EventType.SALE),
+                                        product_unit=unit, price=Decimal('150.50'))
+
+    def export(self, name, fmt='csv', **params):
+        response = self.client.get(reverse('export', args=[name, fmt]), params)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, content
+
+    def test_csv_export_streams_header_and_rows(self):
+        response, content = self.export('units')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('units-', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(content.decode('utf-8'))))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]['product_name'], 'Ключ «0», 10 мм')
+        self.assertEqual(sorted({row['state'] for row in rows}), ['received', 'sold'])
+
+    def test_filters(self):
+        _response, content = self.export('units', product=self.products[1].pk)
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual([row['product_code'] for row in rows], ['EX-1'] * 3)
+        _response, content = self.export('deliveries', date_from=self.today - timedelta(days=2))
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual([int(row['id']) for row in rows], [self.deliveries[1].pk])
+        _response, content = self.export('request_items', delivery=self.deliveries[0].pk)
+        self.assertEqual(len(content.decode().splitlines()), 2)
+        _response, content = self.export('sales', date_to=self.today - timedelta(days=1))
+        self.assertEqual(len(content.decode().splitlines()), 1)  # только заголовок
+
+    def test_jsonl_and_gzip(self):
+        response, content = self.export('sales', 'jsonl', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.jsonl.gz"'))
+        [line] = gzip.decompress(content).decode('utf-8').splitlines()
+        sale = json.loads(line)
+        self.assertEqual((sale['id'], sale['price'], sale['date']),
+                         (self.sale.pk, '150.50', self.today.isoformat()))
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.export('nothing')[0].status_code, 400)
+        self.assertEqual(self.export('units', 'xml')[0].status_code, 400)
+        self.assertEqual(self.export('units', date_from='01.02.2025')[0].status_code, 400)
+        self.client.force_login(User.objects.create_user('clerk', is_staff=True))
+        self.assertEqual(self.export('units')[0].status_code, 403)
+
+    def test_output_is_flushed_in_chunks(self):
+        rows = exporting.export_rows('units', chunk_size=2)
+        chunks = list(exporting.render_chunks('units', rows, buffer_size=1))
+        self.assertEqual(len(chunks), 6)  # заголовок уходит вместе с первой строкой
+        self.assertEqual(len(b''.join(chunks).decode().splitlines()), 7)
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'deliveries.csv.gz')
+            call_command('export_data', 'deliveries', '--gzip', '--output', path,
+                         '--product', str(self.products[0].pk), stderr=io.StringIO())
+            with gzip.open(path, 'rt', encoding='utf-8') as stream:
+                rows = list(csv.DictReader(stream))
+        self.assertEqual([int(row['id']) for row in rows], [self.deliveries[0].pk])
+        out = io.BytesIO()
+        call_command('export_data', 'request_items', '--format', 'jsonl', '--gzip', stream=out)
+        self.assertEqual(len(gzip.decompress(out.getvalue()).splitlines()), 2)
+
+    async def test_asgi_export_streams_asynchronously(self):
+        user = await User.objects.aget(username='admin')
+        request = AsyncRequestFactory().get(reverse('export', args=['units', 'csv']))
+        request.user = user
+        response = await sync_to_async(views.export_view)(request, 'units', 'csv')
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response])
+        self.assertEqual(len(content.decode().splitlines()), 7)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.staff = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.product = Product.objects.create(code='MT-1', name='Ключ накидной')
+
+    def scrape(self, **headers):
+        response = self.client.get(reverse('metrics'), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if line and not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_records_latency_queries_and_size(self):
+        response = self.client.get(reverse('goods:product_detail', args=[self.product.pk]))
+        self.client.get('/no-such-page/')
+        self.client.force_login(self.staff)
+        samples = self.scrape()
+
+        view = '{view="goods:product_detail"}'
+        self.assertEqual(samples['store_http_requests_total{view="goods:product_detail",method="GET",status="200"}'], 1)
+        self.assertEqual(samples['store_http_requests_total{view="<unmatched>",method="GET",status="404"}'], 1)
+        self.assertEqual(samples[f'store_http_request_duration_seconds_count{view}'], 1)
+        self.assertGreater(samples[f'store_http_request_queries_sum{view}'], 0)
+        self.assertGreater(samples[f'store_http_request_query_seconds_sum{view}'], 0)
+        self.assertEqual(samples[f'store_http_response_size_bytes_sum{view}'], len(response.content))
+        self.assertEqual(samples['store_http_response_size_bytes_bucket{view="goods:product_detail",le="+Inf"}'], 1)
+        # Сама страница метрик не учитывается
+        self.assertFalse(any('view="metrics"' in name for name in samples))
+
+    def test_admin_views_are_named(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse('admin:goods_product_changelist'))
+        samples = self.scrape()
+        self.assertEqual(
+            samples['store_http_request_duration_seconds_count{view="admin:goods_product_changelist"}'], 1)
+
+    def test_streaming_response_size_is_counted_when_sent(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('export', args=['units', 'csv']))
+        size = len(b''.join(response.streaming_content))
+        self.assertEqual(self.scrape()['store_http_response_size_bytes_sum{view="export"}'], size)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_sampling(self):
+        self.client.get(reverse('goods:product_detail', args=[self.product.pk]))
+        self.client.force_login(self.staff)
+        samples = self.scrape()
+        self.assertEqual(
+            samples['store_http_requests_total{view="goods:product_detail",method="GET",status="200"}'], 1)
+        self.assertFalse(any(name.startswith('store_http_request_duration_seconds') for name in samples))
+
+    @override_settings(METRICS_TOKEN='secret', METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_access(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer wrong'}).status_code,
+                         403)
+        self.scrape(Authorization='Bearer secret')
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.5').status_code, 200)
+
+    async def test_async_middleware_counts_queries_from_sync_threads(self):
+        async def view(request):
+            await sync_to_async(lambda: list(Product.objects.all()))()
+            await Product.objects.acount()
+            return HttpResponse('ok')
+
+        middleware = metrics.MetricsMiddleware(view)
+        request = AsyncRequestFactory().get('/')
+        request.resolver_match = type('Match', (), {'view_name': 'async_view'})()
+        await middleware(request)
+        samples = dict(((name, labels), value) for name, labels, value in metrics.QUERIES.samples())
+        self.assertEqual(samples['store_http_request_queries_sum', '{view="async_view"}'], 2)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram('test_seconds', 'Тест', ('view',), buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, 'a')
+        self.assertEqual([value for _name, _labels, value in histogram.samples()], [2, 3, 4, 3.65, 4])
+
+
+class BenchmarkTests(TestCase):
+    def test_runs_every_benchmark_and_rolls_back(self):
+        results = benchmarks.run_benchmarks(scale=30, repeat=1)
+        self.assertEqual(set(results['benchmarks']), set(benchmarks.BENCHMARKS))
+        for name, result in results['benchmarks'].items():
+            with self.subTest(name):
+                self.assertGreater(result['queries'], 0)
+                self.assertGreater(result['operations'], 0)
+                self.assertEqual(len(result['times_ms']), 1)
+        self.assertEqual(results['meta']['scale'], 30)
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(Request.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+    def test_loadtest_keeps_data_only_in_the_live_database(self):
+        with self.assertRaisesMessage(CommandError, '--live'):
+            call_command('loadtest_db', keep=True, stdout=io.StringIO())
+        self.assertFalse(Product.objects.exists())
+
+    def test_refuses_a_live_database(self):
+        with mock.patch.dict(connection.settings_dict, NAME='db.sqlite3'):
+            with self.assertRaises(ValueError):
+                benchmarks.run_benchmarks(scale=30, repeat=1)
+
+    def test_compare(self):
+        def run(**medians):
+            return {'meta': {}, 'benchmarks': {name: {'median_ms': median, 'queries': queries}
+                                               for name, (median, queries) in medians.items()}}
+
+        baseline = run(slower=(100, 5), faster=(100, 5), same=(100, 5), more_queries=(100, 5))
+        current = run(slower=(130, 5), faster=(70, 5), same=(110, 5), more_queries=(100, 6), added=(1, 1))
+        verdicts = {row.name: row.verdict for row in benchmarks.compare(baseline, current, threshold=0.2)}
+        self.assertEqual(verdicts, {
+            'slower': benchmarks.REGRESSION, 'faster': benchmarks.IMPROVEMENT, 'same': '',
+            'more_queries': benchmarks.REGRESSION, 'added': benchmarks.NEW,
+        })
+
+    def test_command_saves_and_compares(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            call_command('benchmark', 'search_products', '--scale', '20', '--repeat', '1', '--output', path,
+                         stdout=io.StringIO(), stderr=io.StringIO())
+            with open(path, encoding='utf-8') as stream:
+                baseline = json.load(stream)
+            self.assertEqual(list(baseline['benchmarks']), ['search_products'])
+
+            baseline['benchmarks']['search_products']['queries'] -= 1
+            with open(path, 'w', encoding='utf-8') as stream:
+                json.dump(baseline, stream)
+            out = io.StringIO()
+            with self.assertRaisesMessage(CommandError, 'search_products'):
+                call_command('benchmark', 'search_products', '--scale', '20', '--repeat', '1', '--compare', path,
+                             '--fail-on-regression', stdout=out, stderr=io.StringIO())
+            self.assertIn(benchmarks.REGRESSION, out.getvalue())
+            with self.assertRaises(CommandError):
+                call_command('benchmark', 'nothing', stdout=io.StringIO(), stderr=io.StringIO())
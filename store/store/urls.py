@@ -37,20 +37,27 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from store import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('export/<str:name>.<str:fmt>', views.export_view, name='export'),
+    path('metrics', views.metrics_view, name='metrics'),
     path('', include('unit.urls')),
     path('goods/', include('goods.urls')),
     path('request/', include('request.urls')),
+    path('sale/', include('sale.urls')),
 ]
 
 
-if settings.DEBUG:
+# Панель отладки есть только в профиле разработки (store.settings.dev)
+if 'debug_toolbar' in settings.INSTALLED_APPS:
     import debug_toolbar
     urlpatterns = [
         path('__debug__/', include(debug_toolbar.urls)),
     ] + urlpatterns
 
+if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
 # if settings.DEBUG:
@@ -0,0 +1,61 @@
+# project store views
+from secrets import compare_digest
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+
+from store import exporting, metrics
+
+
+@require_GET
+@staff_member_required
+def export_view(request, name, fmt):
+    """
+    Потоковая выгрузка name (units, deliveries, sales, request_items) в формате fmt (csv, jsonl).
+    GET: date_from, date_to (ГГГГ-ММ-ДД), product, delivery (ID), gzip=1 — сжать на лету.
+    Нужно право просмотра выгружаемой модели.
+    """
+    try:
+        export = exporting.get_export(name)
+        filters = exporting.parse_filters(**{key: request.GET.get(key)
+                                             for key in ('date_from', 'date_to', 'product', 'delivery')})
+        compress = request.GET.get('gzip') in ('1', 'true', 'yes')
+        chunks = exporting.stream_export(name, fmt, compress=compress, **filters)
+    except exporting.ExportError as e:
+        return HttpResponseBadRequest(str(e))
+
+    opts = export.model._meta
+    if not request.user.has_perm(f'{opts.app_label}.view_{opts.model_name}'):
+        return HttpResponseForbidden()
+
+    # Сжатая выгрузка отдаётся файлом .gz, а не через Content-Encoding: так её и сохраняют
+    content_type = 'application/gzip' if compress else exporting.FORMATS[fmt] + '; charset=utf-8'
+    if isinstance(request, ASGIRequest):
+        chunks = exporting.async_chunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename="{exporting.filename(name, fmt, compress)}"')
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx: не копить ответ целиком
+    return response
+
+
+def _metrics_allowed(request):
+    if request.user.is_active and request.user.is_staff:
+        return True
+    if request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+        return True
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return bool(settings.METRICS_TOKEN) and scheme == 'Bearer' and compare_digest(token, settings.METRICS_TOKEN)
+
+
+@require_GET
+@never_cache
+def metrics_view(request):
+    """Метрики процесса в текстовом формате Prometheus (см. store.metrics)"""
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
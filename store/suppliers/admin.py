@@ -1,10 +1,12 @@
 from django.contrib import admin
+
+from store.counterparties import CounterpartyTotalsAdminMixin
 from .models import Supplier
 
 
 @admin.register(Supplier)
-class SupplierAdmin(admin.ModelAdmin):
-    list_display = ('name', 'contact_person', 'phone', 'notes_short')
+class SupplierAdmin(CounterpartyTotalsAdminMixin, admin.ModelAdmin):
+    list_display = ('name', 'contact_person', 'phone', 'open_quantity', 'delivered_value', 'notes_short')
     search_fields = ('name', 'contact_person', 'phone')
 
     fieldsets = (
@@ -1,5 +1,12 @@
 from django.db import models
 
+from store.counterparties import CounterpartyQuerySetMixin
+
+
+class SupplierQuerySet(CounterpartyQuerySetMixin, models.QuerySet):
+    counterparty_field = 'supplier'
+
+
 class Supplier(models.Model):
     """Поставщик"""
     name = models.CharField('Наименование', max_length=255)
@@ -17,6 +24,8 @@ class Supplier(models.Model):
     )
     notes = models.TextField('Примечания', blank=True)
 
+    objects = SupplierQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Поставщик'
         verbose_name_plural = 'Поставщики'
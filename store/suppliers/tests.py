@@ -1,3 +1,74 @@
+import io
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from customers.models import Customer
+from delivery.models import Delivery
+from goods.models import Product
+from request.models import Request, RequestItem
+from store.matching import NameMatcher, similar_pairs
+from suppliers.models import Supplier
+
+
+class NameMatcherTests(TestCase):
+    def test_only_normalised_names_match(self):
+        matcher = NameMatcher([(1, 'ООО «Автодеталь»'), (2, 'ИП Петров П.П.'), (3, 'Альфа 1'), (4, 'ИП Иванов')])
+        self.assertEqual(matcher.match('автодеталь'), 1)
+        self.assertEqual(matcher.match('Петров П. П., ИП'), 2)
+        self.assertIsNone(matcher.match('Автодетали ООО'))
+        self.assertIsNone(matcher.match('Альфа 2'))
+        self.assertIsNone(matcher.match('ИП Иванова'))
+        self.assertIsNone(matcher.match(' «» '))
+
+    def test_similar_names_skip_other_numbers_and_short_names(self):
+        matcher = NameMatcher([(1, 'ООО «Автодеталь»'), (2, 'Автодеталь 2'), (3, 'ИП Иванов')])
+        self.assertEqual(matcher.similar('Автодетали ООО'), [1])
+        self.assertEqual(matcher.similar('Автодеталь 3'), [])
+        self.assertEqual(matcher.similar('ИП Иванова'), [])
+        self.assertEqual(similar_pairs([(1, 'Автодеталь'), (2, 'Альфа 1'), (3, 'Альфа 2'), (4, 'автодеталь'),
+                                        (5, 'Автодетали')]), [(1, 4), (1, 5)])
+
+    def test_command_only_reports(self):
+        Supplier.objects.create(name='Автодеталь')
+        Supplier.objects.create(name='Автодетали')
+        Customer.objects.create(name='ИП Иванов')
+        Customer.objects.create(name='ИП Иванова')
+        stdout = io.StringIO()
+        call_command('find_similar_counterparties', stdout=stdout)
+        self.assertIn('«Автодеталь» ~', stdout.getvalue())
+        self.assertIn('Похожих пар: 1', stdout.getvalue())
+        self.assertEqual((Supplier.objects.count(), Customer.objects.count()), (2, 2))
+
+
+class CounterpartyTotalsTests(TestCase):
+    def test_open_quantity_and_delivered_value(self):
+        supplier = Supplier.objects.create(name='Автодеталь')
+        other = Supplier.objects.create(name='Запчасть-Сервис')
+        customer = Customer.objects.create(name='Иванов', phone='+79001234567')
+        product = Product.objects.create(code='RF-1', name='Ключ')
+        request = Request.objects.create(status=Request.Status.IN_REQUEST)
+        item = RequestItem.objects.create(request=request, product=product, quantity=10,
+                                          price_per_unit=Decimal('100'), supplier=supplier, customer=customer)
+        RequestItem.objects.create(request=request, product=product, quantity=3,
+                                   price_per_unit=Decimal('50'), supplier=supplier)
+        delivery = Delivery.objects.create(request_item=item, quantity=4, delivery_date=timezone.localdate())
+        self.assertEqual((delivery.supplier_id, delivery.customer_id), (supplier.pk, customer.pk))
+
+        with self.assertNumQueries(1):
+            totals = {s.pk: (s.open_quantity, s.delivered_value) for s in Supplier.objects.with_totals()}
+        self.assertEqual(totals, {supplier.pk: (9, Decimal('400')), other.pk: (0, Decimal('0'))})
+        customer = Customer.objects.with_totals().get()
+        self.assertEqual((customer.open_quantity, customer.delivered_value), (6, Decimal('400')))
 
-# Create your tests here.
+    def test_admin_lists_sort_by_totals(self):
+        Supplier.objects.create(name='Автодеталь')
+        Customer.objects.create(name='Иванов')
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+        for url in (reverse('admin:suppliers_supplier_changelist'), reverse('admin:customers_customer_changelist')):
+            response = self.client.get(url, {'o': '-4'})
+            self.assertContains(response, '0.00 ₽')
@@ -1,4 +1,6 @@
 from django.contrib import admin, messages
+from django.db import transaction
+from django.db.models import Count
 from django.utils.html import format_html
 from django.urls import reverse
 from .models import TradingDay, Event
@@ -53,9 +55,19 @@ class TradingDayAdmin(admin.ModelAdmin):
     search_fields = ('date',)
     inlines = [EventAdminInline]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(events_total=Count('events'))
+
     def events_count(self, obj):
-        return obj.events.count()
+        return obj.events_total
     events_count.short_description = "Количество событий"
+    events_count.admin_order_field = 'events_total'
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        # Удаляем по одной: TradingDay.delete снимает продажи дня со сводок и остатков
+        for obj in queryset:
+            obj.delete()
 
 
 @admin.register(Event)
@@ -71,3 +83,9 @@ class EventAdmin(admin.ModelAdmin):
             return obj.description[:50] + "..."
         return obj.description
     description_short.short_description = "Описание"
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        # Удаляем по одной: Event.delete снимает продажу события со сводок и остатков
+        for obj in queryset:
+            obj.delete()
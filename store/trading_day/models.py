@@ -1,7 +1,7 @@
 # trading_day/models.py
 from datetime import datetime
 
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
@@ -11,6 +11,15 @@ class TradingDay(models.Model):
     def __str__(self):
         return f"Торговый день {self.date}"
 
+    def delete(self, *args, **kwargs):
+        from sale.models import Sale
+
+        with transaction.atomic(savepoint=False):
+            # Продажи удаляются каскадно, минуя Sale.delete — снимаем их со сводок и остатков явно
+            for sale in Sale.objects.filter(event__trading_day=self).select_related('product_unit'):
+                sale.delete()
+            return super().delete(*args, **kwargs)
+
 
 class Event(models.Model):
     class EventType(models.TextChoices):
@@ -35,4 +44,26 @@ class Event(models.Model):
         # при сохранении подставляем дату из торгового дня
         if not self.created_at and self.trading_day:
             self.created_at = datetime.combine(self.trading_day.date, datetime.min.time())
-        super().save(*args, **kwargs)
\ No newline at end of file
+
+        from sale.models import Sale, SalesSummary
+        from unit.models import ProductStock, ProductUnit
+
+        with transaction.atomic(savepoint=False):
+            # Смена типа (продажа/возврат) или торгового дня переносит вклад продажи в сводках
+            old_entry = Sale.ledger_entries(event_id=self.pk)[:1] if self.pk else []
+            super().save(*args, **kwargs)
+            if old_entry:
+                new_entry = Sale.ledger_entries(event_id=self.pk)[0]
+                SalesSummary.replace(old_entry[0], new_entry)
+                if old_entry[0].is_return != new_entry.is_return:
+                    ProductStock.replace_sale(old_entry[0].stock_key, new_entry.stock_key)
+                    ProductUnit.refresh_states([new_entry.unit_id])
+
+    def delete(self, *args, **kwargs):
+        from sale.models import Sale
+
+        with transaction.atomic(savepoint=False):
+            sale = Sale.objects.filter(event_id=self.pk).select_related('product_unit').first()
+            if sale:
+                sale.delete()
+            return super().delete(*args, **kwargs)
\ No newline at end of file
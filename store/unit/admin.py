@@ -1,7 +1,11 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction
 from django.utils.html import format_html
 from django.urls import reverse
 from .models import ProductUnit
+from store.instrumentation import get_logger
+
+logger = get_logger('unit.admin')
 
 @admin.register(ProductUnit)
 class ProductUnitAdmin(admin.ModelAdmin):
@@ -9,23 +13,49 @@ class ProductUnitAdmin(admin.ModelAdmin):
         'serial_number',
         'product_link',
         'delivery_link',
+        'state',
         'created_at',
     )
-    list_filter = ('created_at', 'product__category')
+    list_filter = ('state', 'created_at', 'product__category')
     search_fields = ('serial_number', 'product__name', 'product__code', 'delivery__id')
     ordering = ('-created_at',)
+    list_select_related = ('product', 'delivery')
     autocomplete_fields = ['product', 'delivery']
-    readonly_fields = ('serial_number', 'created_at', 'product_link', 'delivery_link')
+    readonly_fields = ('serial_number', 'state', 'created_at', 'product_link', 'delivery_link')
+    actions = ['put_in_stock', 'write_off']
 
     fieldsets = (
         ('Основная информация', {
-            'fields': ('serial_number', 'product_link', 'delivery_link', 'created_at')
+            'fields': ('serial_number', 'product_link', 'delivery_link', 'state', 'created_at')
         }),
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        # Автодополнение единицы в продаже предлагает только доступные к продаже единицы
+        if request.GET.get('model_name') == 'sale' and request.GET.get('field_name') == 'product_unit':
+            queryset = queryset.available()
+        return queryset, may_have_duplicates
+
+    def put_in_stock(self, request, queryset):
+        count = queryset.put_in_stock()
+        self.message_user(request, f"На склад принято {count} единиц товара.", level=messages.SUCCESS)
+    put_in_stock.short_description = "Принять на склад"
+
+    def write_off(self, request, queryset):
+        count = queryset.write_off()
+        self.message_user(request, f"Списано {count} единиц товара.", level=messages.SUCCESS)
+    write_off.short_description = "Списать"
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        # Удаляем по одной, чтобы ProductUnit.delete снял единицу с остатков
+        for obj in queryset:
+            obj.delete()
+
     def save_model(self, request, obj, form, change):
         """Специальная обработка сохранения в админке"""
-        print(f"Админка: сохранение ProductUnit (изменение: {change})")
+        logger.debug("Админка: сохранение ProductUnit #%s (изменение: %s)", obj.pk, change)
         # Убедитесь, что объект полностью валиден
         obj.clean()
         super().save_model(request, obj, form, change)
@@ -0,0 +1,41 @@
+# app unit/issuing
+"""
+Пакетное создание единиц товара (ProductUnit) для поставки.
+
+Серийные номера резервируются одним блоком через SerialCounter, единицы пишутся
+пачками bulk_create (ProductUnit.save с его проверками и выдачей номера по одному
+не вызывается), сводка остатков сдвигается одним UPDATE на пачку. Повторных попыток
+при конфликте номеров нет: конфликтов не бывает.
+"""
+from django.db import transaction
+
+from store.instrumentation import get_logger, timed
+from unit.models import ProductUnit, ProductStock, SerialCounter
+
+logger = get_logger('unit.issuing')
+
+ISSUE_BATCH_SIZE = 5000
+
+
+def issue_units(delivery, quantity=None, batch_size=ISSUE_BATCH_SIZE):
+    """
+    Создаёт quantity (по умолчанию delivery.quantity) единиц товара поставки.
+    Возвращает количество созданных единиц.
+    """
+    quantity = delivery.quantity if quantity is None else quantity
+    if quantity < 1:
+        return 0
+
+    product = delivery.product
+    with timed(logger, 'issue_units', delivery_id=delivery.pk, quantity=quantity), transaction.atomic():
+        sequences = SerialCounter.allocate(product.pk, quantity)
+        for start in range(0, quantity, batch_size):
+            # Внешние ключи — по id: дескрипторы связей заметно дороже на десятках тысяч объектов
+            units = ProductUnit.objects.bulk_create([
+                ProductUnit(product_id=product.pk, delivery_id=delivery.pk, state=ProductUnit.State.RECEIVED,
+                            serial_number=ProductUnit.format_serial_number(
+                                product.code, delivery.price_per_unit, sequence))
+                for sequence in sequences[start:start + batch_size]
+            ], batch_size=batch_size)
+            ProductStock.register_receipt(product.pk, len(units))
+    return quantity
@@ -0,0 +1,57 @@
+# unit/management/commands/benchmark_issue_units.py
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from delivery.models import Delivery
+from goods.models import Product
+from request.models import Request, RequestItem
+from unit.issuing import issue_units
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Замеряет создание единиц товара для одной большой поставки через unit.issuing. "
+            "Все данные создаются во временной транзакции и откатываются.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quantity', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        quantity = options['quantity']
+        timings = []
+        for _ in range(options['repeat']):
+            try:
+                with transaction.atomic():
+                    delivery = self.make_delivery(quantity)
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        issue_units(delivery)
+                        timings.append((time.perf_counter() - started, len(queries)))
+                    raise Rollback
+            except Rollback:
+                pass
+
+        best_time, query_count = min(timings)
+        self.stdout.write(
+            f"{quantity} единиц: лучшее время {best_time * 1000:.1f} мс, "
+            f"{quantity / best_time:,.0f} единиц/с, запросов {query_count}"
+        )
+
+    @staticmethod
+    def make_delivery(quantity):
+        product = Product.objects.create(code=f'BENCH-{time.time_ns()}', name='Benchmark product')
+        request = Request.objects.create(status=Request.Status.IN_REQUEST)
+        Request.objects.filter(pk=request.pk).update(created_at=timezone.now() - timedelta(days=1))
+        item = RequestItem.objects.create(request=request, product=product, quantity=quantity, price_per_unit=100)
+        delivery = Delivery(request_item=item, quantity=quantity, delivery_date=timezone.now().date())
+        delivery.save()
+        return delivery
@@ -0,0 +1,78 @@
+# unit/management/commands/rebuild_stock.py
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Max
+
+from goods.cache import bump_catalog
+from unit.models import ProductUnit, ProductStock
+
+# Счётчики сводки в порядке вывода расхождений
+COUNTER_FIELDS = ('received', 'sold', 'returned', 'on_hand')
+
+
+class Command(BaseCommand):
+    help = ("Пересобирает сводку остатков (ProductStock) из ProductUnit и Sale. "
+            "С --check только сверяет сводку с фактическими данными.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Только проверить расхождения, ничего не изменяя')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def compute(self):
+        """Считает остатки по всем товарам двумя агрегирующими запросами"""
+        Sale = apps.get_model('sale', 'Sale')
+        Event = apps.get_model('trading_day', 'Event')
+        summary = {}
+
+        # Списанные единицы при списании снимаются с поступления
+        received = (ProductUnit.objects.exclude(state=ProductUnit.State.WRITTEN_OFF).order_by().values('product_id')
+                    .annotate(count=Count('id'), last=Max('created_at')))
+        for row in received:
+            summary[row['product_id']] = {
+                'received': row['count'], 'sold': 0, 'returned': 0, 'last_movement_at': row['last'],
+            }
+
+        # Возврат возвращает единицу в продажу (ProductUnit.AVAILABLE_STATES)
+        sold = (Sale.objects.order_by().values('product_unit__product_id', 'event__type')
+                .annotate(count=Count('id'), last=Max('event__created_at')))
+        for row in sold:
+            entry = summary.setdefault(row['product_unit__product_id'], {
+                'received': 0, 'sold': 0, 'returned': 0, 'last_movement_at': None,
+            })
+            entry['returned' if row['event__type'] == Event.EventType.RETURN else 'sold'] += row['count']
+            if row['last'] and (entry['last_movement_at'] is None or row['last'] > entry['last_movement_at']):
+                entry['last_movement_at'] = row['last']
+
+        for entry in summary.values():
+            entry['on_hand'] = max(entry['received'] - entry['sold'] + entry['returned'], 0)
+        return summary
+
+    def handle(self, *args, **options):
+        summary = self.compute()
+
+        if options['check']:
+            drift = []
+            stored = {s.product_id: s for s in ProductStock.objects.all()}
+            for product_id in set(summary) | set(stored):
+                expected = summary.get(product_id, {})
+                expected = tuple(expected.get(field, 0) for field in COUNTER_FIELDS)
+                current = stored.get(product_id)
+                actual = tuple(getattr(current, field) for field in COUNTER_FIELDS) if current else (0,) * 4
+                if actual != expected:
+                    drift.append(product_id)
+                    self.stdout.write(f"Товар #{product_id}: в сводке {actual}, фактически {expected}")
+            if drift:
+                raise CommandError(f"Расхождения найдены у {len(drift)} товаров")
+            self.stdout.write(self.style.SUCCESS("Сводка остатков совпадает с данными"))
+            return
+
+        with transaction.atomic():
+            ProductStock.objects.all().delete()
+            ProductStock.objects.bulk_create(
+                (ProductStock(product_id=product_id, **values) for product_id, values in summary.items()),
+                batch_size=options['batch_size'],
+            )
+            bump_catalog()  # сводка перезаписана целиком — сбрасываем все ответы витрины
+        self.stdout.write(self.style.SUCCESS(f"Сводка остатков пересобрана: {len(summary)} товаров"))
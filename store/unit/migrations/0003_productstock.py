@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def fill_product_stock(apps, schema_editor):
+    # Замороженная копия rebuild_stock на момент этой миграции: возвраты пока считаются
+    # продажами (их отделяет 0006_productstock_returned). Сверить сводку позже — rebuild_stock --check
+    ProductStock = apps.get_model('unit', 'ProductStock')
+    ProductUnit = apps.get_model('unit', 'ProductUnit')
+    Sale = apps.get_model('sale', 'Sale')
+    summary = {}
+    received = (ProductUnit.objects.order_by().values('product_id')
+                .annotate(count=Count('id'), last=Max('created_at')))
+    for row in received:
+        summary[row['product_id']] = {'received': row['count'], 'sold': 0, 'last_movement_at': row['last']}
+    sold = (Sale.objects.order_by().values('product_unit__product_id')
+            .annotate(count=Count('id'), last=Max('event__created_at')))
+    for row in sold:
+        entry = summary.setdefault(row['product_unit__product_id'],
+                                   {'received': 0, 'sold': 0, 'last_movement_at': None})
+        entry['sold'] = row['count']
+        if row['last'] and (entry['last_movement_at'] is None or row['last'] > entry['last_movement_at']):
+            entry['last_movement_at'] = row['last']
+    ProductStock.objects.bulk_create(
+        (ProductStock(product_id=product_id, on_hand=max(entry['received'] - entry['sold'], 0), **entry)
+         for product_id, entry in summary.items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0001_initial'),
+        ('sale', '0002_alter_sale_event_alter_sale_price_and_more'),
+        ('unit', '0002_alter_productunit_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('received', models.PositiveIntegerField(default=0, verbose_name='Получено')),
+                ('sold', models.PositiveIntegerField(default=0, verbose_name='Продано')),
+                ('on_hand', models.IntegerField(db_index=True, default=0, verbose_name='В наличии')),
+                ('last_movement_at', models.DateTimeField(blank=True, null=True, verbose_name='Последнее движение')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock', to='goods.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Остаток товара',
+                'verbose_name_plural': 'Остатки товаров',
+            },
+        ),
+        migrations.RunPython(fill_product_stock, migrations.RunPython.noop),
+    ]
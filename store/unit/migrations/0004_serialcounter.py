@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0004_product_search_index'),
+        ('unit', '0003_productstock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerialCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_value', models.PositiveBigIntegerField(default=0, verbose_name='Последний выданный номер')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='serial_counter', to='goods.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Счётчик серийных номеров',
+                'verbose_name_plural': 'Счётчики серийных номеров',
+            },
+        ),
+    ]
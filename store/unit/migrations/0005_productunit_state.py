@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_unit_states(apps, schema_editor):
+    ProductUnit = apps.get_model('unit', 'ProductUnit')
+    Sale = apps.get_model('sale', 'Sale')
+    # Единицы, созданные до появления состояний, уже лежат в магазине
+    ProductUnit.objects.update(state='in_stock')
+    last_event_type = Subquery(
+        Sale.objects.filter(product_unit=OuterRef('pk'))
+        .order_by('-event__created_at', '-pk').values('event__type')[:1]
+    )
+    units = ProductUnit.objects.annotate(last_event_type=last_event_type)
+    ProductUnit.objects.filter(
+        pk__in=units.filter(last_event_type='return').values('pk')
+    ).update(state='returned')
+    ProductUnit.objects.filter(
+        pk__in=units.filter(last_event_type__isnull=False).exclude(last_event_type='return').values('pk')
+    ).update(state='sold')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0001_initial'),
+        ('goods', '0004_product_search_index'),
+        ('sale', '0003_sales_summary'),
+        ('unit', '0004_serialcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productunit',
+            name='state',
+            field=models.CharField(choices=[('received', 'Получена'), ('in_stock', 'На складе'), ('sold', 'Продана'), ('returned', 'Возвращена'), ('written_off', 'Списана')], default='received', max_length=20, verbose_name='Состояние'),
+        ),
+        migrations.RunPython(fill_unit_states, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='productunit',
+            name='delivery',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='product_units', to='delivery.delivery', verbose_name='Поставка'),
+        ),
+        migrations.AlterField(
+            model_name='productunit',
+            name='product',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='units', to='goods.product', verbose_name='Товар'),
+        ),
+        migrations.AddIndex(
+            model_name='productunit',
+            index=models.Index(fields=['product', 'state'], name='unit_pu_product_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productunit',
+            index=models.Index(fields=['delivery', 'state'], name='unit_pu_delivery_state_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:20
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def split_returns(apps, schema_editor):
+    """Возвраты раньше считались продажами: переносим их в returned и пересчитываем остаток"""
+    ProductStock = apps.get_model('unit', 'ProductStock')
+    Sale = apps.get_model('sale', 'Sale')
+    returns = dict(Sale.objects.filter(event__type='return').order_by().values('product_unit__product_id')
+                   .annotate(count=Count('id')).values_list('product_unit__product_id', 'count'))
+    stocks = list(ProductStock.objects.filter(product_id__in=returns))
+    for stock in stocks:
+        stock.returned = returns[stock.product_id]
+        stock.sold = max(stock.sold - stock.returned, 0)
+        stock.on_hand = max(stock.received - stock.sold + stock.returned, 0)
+    ProductStock.objects.bulk_update(stocks, ['sold', 'returned', 'on_hand'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sale', '0003_sales_summary'),
+        ('unit', '0005_productunit_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productstock',
+            name='returned',
+            field=models.PositiveIntegerField(default=0, verbose_name='Возвращено'),
+        ),
+        migrations.RunPython(split_returns, migrations.RunPython.noop),
+    ]
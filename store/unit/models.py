@@ -1,12 +1,54 @@
-import uuid
-from datetime import datetime
-from django.db import models, IntegrityError
+from collections import Counter
+
+from django.apps import apps
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Greatest
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from goods.cache import bump_product_stock
+from store.instrumentation import get_logger
+
+logger = get_logger('unit')
+
+
+class ProductUnitQuerySet(models.QuerySet):
+    def available(self):
+        """Единицы, которые можно продать: на складе или возвращённые покупателем"""
+        return self.filter(state__in=ProductUnit.AVAILABLE_STATES)
+
+    def sold(self):
+        return self.filter(state=ProductUnit.State.SOLD)
+
+    def put_in_stock(self):
+        """Полученные единицы переводит на склад; возвращает число переведённых"""
+        return self.filter(state=ProductUnit.State.RECEIVED).update(state=ProductUnit.State.IN_STOCK)
+
+    def write_off(self):
+        """Списывает доступные единицы и уменьшает поступление в сводке остатков"""
+        with transaction.atomic():
+            units = list(self.available().select_for_update().values_list('pk', 'product_id'))
+            ProductUnit.objects.filter(pk__in=[pk for pk, _ in units]).update(state=ProductUnit.State.WRITTEN_OFF)
+            for product_id, count in Counter(product_id for _, product_id in units).items():
+                ProductStock.register_receipt(product_id, -count)
+        return len(units)
+
 
 class ProductUnit(models.Model):
     """Модель для хранения единиц товара из поставок"""
+
+    class State(models.TextChoices):
+        RECEIVED = 'received', _('Получена')
+        IN_STOCK = 'in_stock', _('На складе')
+        SOLD = 'sold', _('Продана')
+        RETURNED = 'returned', _('Возвращена')
+        WRITTEN_OFF = 'written_off', _('Списана')
+
+    # Состояния, в которых единицу можно продать
+    AVAILABLE_STATES = (State.RECEIVED, State.IN_STOCK, State.RETURNED)
+
     serial_number = models.CharField(
         _('Серийный номер'),
         max_length=100,
@@ -18,70 +60,80 @@ class ProductUnit(models.Model):
         'goods.Product',
         on_delete=models.PROTECT,
         verbose_name=_('Товар'),
-        related_name='units'
+        related_name='units',
+        db_index=False,  # покрыт составным индексом (product, state)
     )
     delivery = models.ForeignKey(
         'delivery.Delivery',
         on_delete=models.CASCADE,
         related_name='product_units',
-        verbose_name=_('Поставка')
+        verbose_name=_('Поставка'),
+        db_index=False,  # покрыт составным индексом (delivery, state)
+    )
+    state = models.CharField(
+        _('Состояние'),
+        max_length=20,
+        choices=State.choices,
+        default=State.RECEIVED,
     )
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name=_('Дата создания')
     )
 
+    objects = ProductUnitQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Единица товара')
         verbose_name_plural = _('Единицы товара')
         ordering = ['-created_at']
+        indexes = [
+            # Остатки и наличие товара, поиск в автодополнении продажи
+            models.Index(fields=['product', 'state'], name='unit_pu_product_state_idx'),
+            # Состояние единиц поставки
+            models.Index(fields=['delivery', 'state'], name='unit_pu_delivery_state_idx'),
+        ]
+
+    @property
+    def is_available(self):
+        return self.state in self.AVAILABLE_STATES
+
+    @staticmethod
+    def format_serial_number(product_code, delivery_price, sequence):
+        """
+        Серийный номер в формате {product_code}_{delivery_price:.2f}-{sequence:08d}.
+        sequence выдаётся счётчиком SerialCounter товара, поэтому номер уникален без повторных попыток.
+        """
+        return f"{product_code}_{delivery_price:.2f}-{sequence:08d}"
 
     @classmethod
     def generate_serial_number(cls, product, delivery):
         """
-        Генерация уникального серийного номера в формате:
-        {product_code}_{delivery_price}-{timestamp}-{random_uuid}
+        Генерация уникального серийного номера для одной единицы товара.
+        Для партий используйте unit.issuing.issue_units — номера выделяются блоком.
         """
         # Проверка наличия объектов
         if not product:
-            print(f"ОШИБКА ГЕНЕРАЦИИ: Не указан товар")
+            logger.warning("Генерация серийного номера: не указан товар")
             raise ValidationError("Не указан товар")
 
         if not delivery:
-            print(f"ОШИБКА ГЕНЕРАЦИИ: Не указана поставка")
+            logger.warning("Генерация серийного номера: не указана поставка")
             raise ValidationError("Не указана поставка")
 
         # Проверка сохранности объектов в БД
         if not product.pk:
-            print(f"ОШИБКА: Товар не сохранен! ID: {product.id if hasattr(product, 'id') else 'None'}")
+            logger.warning("Генерация серийного номера: товар %r не сохранён в БД", product)
             raise ValidationError("Товар должен быть сохранён в БД перед генерацией номера")
 
         if not delivery.pk:
-            print(f"ОШИБКА: Поставка не сохранена! ID: {delivery.id if hasattr(delivery, 'id') else 'None'}")
+            logger.warning("Генерация серийного номера: поставка не сохранена в БД")
             raise ValidationError("Поставка должна быть сохранена в БД перед генерацией номера")
 
-        try:
-            # Получаем необходимые данные
-            product_code = product.code
-            delivery_price = delivery.price_per_unit
-
-            # Форматируем данные
-            base_prefix = f"{product_code}_{delivery_price}-"
-            timestamp = datetime.now().strftime("%d%m%H%M%S")  # ДеньМесяцЧасыМинутыСекунды
-            unique_part = uuid.uuid4().hex[:8]  # Уникальная часть из UUID
-
-            # Собираем полный номер
-            serial_number = f"{base_prefix}{timestamp}-{unique_part}"
-
-            print(f"Сгенерирован серийник: {serial_number}")
-            return serial_number
-
-        except AttributeError as e:
-            print(f"ОШИБКА АТРИБУТА: {e}")
-            raise ValidationError(f"Ошибка генерации серийного номера: {e}")
-        except Exception as e:
-            print(f"НЕПРЕДВИДЕННАЯ ОШИБКА: {e}")
-            raise ValidationError("Системная ошибка генерации номера")
+        sequence = SerialCounter.allocate(product.pk, 1).start
+        serial_number = cls.format_serial_number(product.code, delivery.price_per_unit, sequence)
+        logger.debug("Сгенерирован серийный номер %s", serial_number)
+        return serial_number
 
     def clean(self):
         """Валидация перед сохранением"""
@@ -96,49 +148,187 @@ class ProductUnit(models.Model):
 
     def save(self, *args, **kwargs):
         """Переопределение сохранения с генерацией серийника"""
-        print(f"Сохранение ProductUnit (ID: {self.id or 'новый'})")
-
         # Генерируем серийный номер если он отсутствует
         if not self.serial_number:
-            print("Генерация серийного номера...")
-
             # Проверяем наличие связанных объектов
             if not hasattr(self, 'product'):
-                print("КРИТИЧЕСКАЯ ОШИБКА: Отсутствует продукт!")
                 raise ValidationError("Не указан товар")
 
             if not hasattr(self, 'delivery'):
-                print("КРИТИЧЕСКАЯ ОШИБКА: Отсутствует поставка!")
                 raise ValidationError("Не указана поставка")
 
             self.serial_number = self.generate_serial_number(
                 self.product,
                 self.delivery
             )
-            print(f"Присвоен серийник: {self.serial_number}")
-
-        # Сохраняем с обработкой конфликтов уникальности
-        max_attempts = 5
-        for attempt in range(1, max_attempts + 1):
-            try:
-                super().save(*args, **kwargs)
-                print(f"Успешное сохранение (попытка {attempt})")
-                return  # Выходим при успешном сохранении
-
-            except IntegrityError as e:
-                if 'serial_number' in str(e).lower() and attempt < max_attempts:
-                    # Перегенерируем номер при конфликте
-                    print(f"КОНФЛИКТ СЕРИЙНИКА! Попытка {attempt}/{max_attempts}")
-                    self.serial_number = self.generate_serial_number(
-                        self.product,
-                        self.delivery
-                    )
-                else:
-                    print(f"КРИТИЧЕСКАЯ ОШИБКА СОХРАНЕНИЯ: {e}")
-                    raise ValidationError(
-                        f"Ошибка сохранения после {max_attempts} попыток: {e}"
-                    )
+
+        is_new = self._state.adding
+        try:
+            super().save(*args, **kwargs)
+        except IntegrityError as e:
+            logger.error("Ошибка сохранения ProductUnit %s: %s", self.serial_number, e)
+            raise ValidationError(f"Ошибка сохранения единицы товара: {e}")
+        if is_new:
+            ProductStock.register_receipt(self.product_id)
+        logger.debug("ProductUnit #%s сохранён (новый: %s)", self.pk, is_new)
+
+    def delete(self, *args, **kwargs):
+        product_id = self.product_id
+        written_off = self.state == self.State.WRITTEN_OFF
+        result = super().delete(*args, **kwargs)
+        if not written_off:  # списанная единица уже снята с остатков
+            ProductStock.register_receipt(product_id, -1)
+        return result
+
+    @staticmethod
+    def last_event_type():
+        """Тип последнего события продажи/возврата единицы — подзапрос для аннотации"""
+        Sale = apps.get_model('sale', 'Sale')
+        return Subquery(
+            Sale.objects.filter(product_unit=OuterRef('pk'))
+            .order_by('-event__created_at', '-pk').values('event__type')[:1]
+        )
+
+    @classmethod
+    def state_after(cls, last_event_type):
+        """Состояние единицы по типу её последнего события; None — продаж нет"""
+        if last_event_type is None:
+            return cls.State.IN_STOCK
+        if last_event_type == apps.get_model('trading_day', 'Event').EventType.RETURN:
+            return cls.State.RETURNED
+        return cls.State.SOLD
+
+    @classmethod
+    def refresh_states(cls, unit_ids):
+        """
+        Пересчитывает состояние единиц по их последним продажам и возвратам:
+        одно чтение и по одному UPDATE на каждое изменившееся состояние.
+        Списанные единицы не трогаем, единица без продаж остаётся полученной.
+        """
+        changes = {}
+        units = (cls.objects.filter(pk__in=unit_ids).exclude(state=cls.State.WRITTEN_OFF)
+                 .annotate(last_event_type=cls.last_event_type())
+                 .values_list('pk', 'state', 'last_event_type'))
+        for pk, state, last_event_type in units:
+            target = cls.state_after(last_event_type)
+            if last_event_type is None and state == cls.State.RECEIVED:
+                target = state
+            if target != state:
+                changes.setdefault(target, []).append(pk)
+        for state, pks in changes.items():
+            cls.objects.filter(pk__in=pks).update(state=state)
+        return sum(len(pks) for pks in changes.values())
 
     def __str__(self):
         """Строковое представление объекта"""
-        return f"{self.product.name if hasattr(self, 'product') else 'No product'} [{self.serial_number}]"
\ No newline at end of file
+        return f"{self.product.name if hasattr(self, 'product') else 'No product'} [{self.serial_number}]"
+
+
+class ProductStock(models.Model):
+    """
+    Сводка остатков по товару.
+    Поддерживается инкрементально при создании единиц товара, продажах и возвратах,
+    пересобирается командой rebuild_stock. Возвращённая единица снова доступна
+    (ProductUnit.AVAILABLE_STATES), поэтому в наличии = получено − продано + возвращено
+    (не меньше нуля). Это учёт движений: с числом доступных единиц (ProductUnit.objects.available())
+    он совпадает, пока единица продаётся не больше раза между возвратами. В старых данных
+    встречаются повторные продажи одной единицы — каждая уменьшает остаток.
+    """
+    product = models.OneToOneField(
+        'goods.Product',
+        on_delete=models.CASCADE,
+        related_name='stock',
+        verbose_name=_('Товар')
+    )
+    received = models.PositiveIntegerField(_('Получено'), default=0)
+    sold = models.PositiveIntegerField(_('Продано'), default=0)
+    returned = models.PositiveIntegerField(_('Возвращено'), default=0)
+    on_hand = models.IntegerField(_('В наличии'), default=0, db_index=True)
+    last_movement_at = models.DateTimeField(_('Последнее движение'), blank=True, null=True)
+
+    class Meta:
+        verbose_name = _('Остаток товара')
+        verbose_name_plural = _('Остатки товаров')
+
+    def __str__(self):
+        return f"{self.product_id}: {self.on_hand} ({self.received}/{self.sold}/{self.returned})"
+
+    @classmethod
+    def _apply(cls, product_id, received=0, sold=0, returned=0):
+        """Атомарно сдвигает счётчики товара через F()-выражения"""
+        if not product_id or not (received or sold or returned):
+            return
+        new_received = Greatest(F('received') + received, 0)
+        new_sold = Greatest(F('sold') + sold, 0)
+        new_returned = Greatest(F('returned') + returned, 0)
+        changes = {
+            'received': new_received,
+            'sold': new_sold,
+            'returned': new_returned,
+            # Из тех же новых значений, что и счётчики (в SET видны значения до UPDATE), и не меньше 0
+            'on_hand': Greatest(new_received - new_sold + new_returned, 0),
+            'last_movement_at': timezone.now(),
+        }
+        # Обычно строка уже есть — один UPDATE; создаём её только для нового товара
+        if not cls.objects.filter(product_id=product_id).update(**changes):
+            cls.objects.get_or_create(product_id=product_id)
+            cls.objects.filter(product_id=product_id).update(**changes)
+        # Остаток показывает карточка товара — её версия сменится после коммита
+        bump_product_stock(product_id)
+
+    @classmethod
+    def register_receipt(cls, product_id, count=1):
+        """Учитывает поступление (или удаление при count < 0) единиц товара"""
+        cls._apply(product_id, received=count)
+
+    @classmethod
+    def register_sale(cls, product_id, count=1, is_return=False):
+        """Учитывает продажу или возврат (или их отмену при count < 0) единиц товара"""
+        if is_return:
+            cls._apply(product_id, returned=count)
+        else:
+            cls._apply(product_id, sold=count)
+
+    @classmethod
+    def replace_sale(cls, old=None, new=None):
+        """Заменяет вклад продажи: old и new — пары (product_id, возврат ли) или None"""
+        if old == new:
+            return
+        if old:
+            cls.register_sale(old[0], -1, is_return=old[1])
+        if new:
+            cls.register_sale(new[0], 1, is_return=new[1])
+
+
+class SerialCounter(models.Model):
+    """
+    Счётчик серийных номеров товара.
+    Номера выделяются блоками одним UPDATE, поэтому параллельные поставки
+    одного товара никогда не получают пересекающиеся диапазоны.
+    """
+    product = models.OneToOneField(
+        'goods.Product',
+        on_delete=models.CASCADE,
+        related_name='serial_counter',
+        verbose_name=_('Товар')
+    )
+    last_value = models.PositiveBigIntegerField(_('Последний выданный номер'), default=0)
+
+    class Meta:
+        verbose_name = _('Счётчик серийных номеров')
+        verbose_name_plural = _('Счётчики серийных номеров')
+
+    def __str__(self):
+        return f"{self.product_id}: {self.last_value}"
+
+    @classmethod
+    def allocate(cls, product_id, count):
+        """Резервирует count последовательных номеров товара и возвращает их как range"""
+        if count < 1:
+            return range(0)
+        with transaction.atomic():
+            cls.objects.get_or_create(product_id=product_id)
+            # Сначала UPDATE: строка блокируется до конца транзакции, затем читаем своё же значение
+            cls.objects.filter(product_id=product_id).update(last_value=F('last_value') + count)
+            end = cls.objects.filter(product_id=product_id).values_list('last_value', flat=True).get()
+        return range(end - count + 1, end + 1)
\ No newline at end of file
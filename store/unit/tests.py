@@ -1,3 +1,140 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from delivery.models import Delivery
+from goods.models import Product
+from request.models import Request, RequestItem
+from sale.models import Sale
+from trading_day.models import Event, TradingDay
+from unit.issuing import issue_units
+from unit.models import ProductStock, ProductUnit, SerialCounter
+
+
+class StockFixture(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(code='ST-1', name='Ключ')
+        request = Request.objects.create(status=Request.Status.IN_REQUEST)
+        Request.objects.filter(pk=request.pk).update(created_at=timezone.now() - timedelta(days=5))
+        self.item = RequestItem.objects.create(request=request, product=self.product, quantity=100,
+                                               price_per_unit=Decimal('50'))
+        self.delivery = self.deliver(10)
+        self.day = TradingDay.objects.create(date=timezone.localdate())
+
+    def deliver(self, quantity):
+        delivery = Delivery(request_item=self.item, quantity=quantity, delivery_date=timezone.localdate())
+        delivery.save()
+        return delivery
+
+    def sell(self, unit, event_type=Event.EventType.SALE):
+        event = Event.objects.create(trading_day=self.day, type=event_type)
+        return Sale.objects.create(event=event, product_unit=unit, price=Decimal('80'))
+
+    def stock(self):
+        stock = ProductStock.objects.get(product=self.product)
+        return stock.received, stock.sold, stock.on_hand
+
+    def check_stock(self):
+        call_command('rebuild_stock', check=True, stdout=io.StringIO())
+
+
+class StockCounterTests(StockFixture):
+    def test_counters_follow_receipts_sales_and_write_offs(self):
+        units = [ProductUnit.objects.create(product=self.product, delivery=self.delivery) for _ in range(3)]
+        self.assertEqual(self.stock(), (3, 0, 3))
+        sale = self.sell(units[0])
+        self.assertEqual(self.stock(), (3, 1, 2))
+        ProductUnit.objects.filter(pk=units[1].pk).write_off()
+        self.assertEqual(self.stock(), (2, 1, 1))
+        self.check_stock()
+
+        sale.delete()
+        self.assertEqual(self.stock(), (2, 0, 2))
+        units[2].delete()
+        self.assertEqual(self.stock(), (1, 0, 1))
+        self.check_stock()
+
+    def test_delivery_delete_takes_its_units_off(self):
+        ProductUnit.objects.create(product=self.product, delivery=self.delivery)
+        other = self.deliver(2)
+        for _ in range(2):
+            ProductUnit.objects.create(product=self.product, delivery=other)
+        other.delete()
+        self.assertEqual(self.stock(), (1, 0, 1))
+        self.check_stock()
+
+    def test_on_hand_is_never_negative(self):
+        ProductUnit.objects.create(product=self.product, delivery=self.delivery)
+        ProductStock.register_sale(self.product.pk, 3)
+        self.assertEqual(self.stock(), (1, 3, 0))
+        ProductStock.register_receipt(self.product.pk, -5)
+        self.assertEqual(self.stock(), (0, 3, 0))
+
+    def test_repeated_sales_of_one_unit_count_as_movements(self):
+        units = [ProductUnit.objects.create(product=self.product, delivery=self.delivery) for _ in range(3)]
+        self.sell(units[0])
+        self.sell(units[0])  # как в старых данных: одна единица продана дважды
+        self.assertEqual(self.stock(), (3, 2, 1))
+        self.assertEqual(ProductUnit.objects.filter(product=self.product).available().count(), 2)
+        call_command('rebuild_stock', stdout=io.StringIO())
+        self.assertEqual(self.stock(), (3, 2, 1))
+        self.check_stock()
+
+    def test_rebuild_stock_fixes_drift(self):
+        units = [ProductUnit.objects.create(product=self.product, delivery=self.delivery) for _ in range(2)]
+        self.sell(units[0])
+        ProductStock.objects.filter(product=self.product).update(received=7, sold=0, on_hand=7)
+        with self.assertRaises(CommandError):
+            self.check_stock()
+        call_command('rebuild_stock', stdout=io.StringIO())
+        self.assertEqual(self.stock(), (2, 1, 1))
+        self.check_stock()
+
+    def test_stock_changes_invalidate_only_product_responses(self):
+        cache.clear()
+        # Last-Modified с точностью до секунды: товар «правили» час назад
+        Product.objects.filter(pk=self.product.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        url = reverse('goods:product_detail', args=[self.product.pk])
+        first = self.client.get(url)
+        self.client.get('/goods/products/feed/')
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductUnit.objects.create(product=self.product, delivery=self.delivery)
+        # Каталог и поиск остатков не показывают — их ответы остаются в кэше
+        with self.assertNumQueries(0):
+            self.client.get('/goods/products/feed/')
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '1 шт.')
+        self.assertEqual(response['Last-Modified'],
+                         http_date(ProductStock.objects.get(product=self.product).last_movement_at.timestamp()))
+
+
+class IssueUnitsTests(StockFixture):
+    def test_serials_are_unique_and_counter_continues_across_batches(self):
+        self.assertEqual(issue_units(self.delivery, 7, batch_size=3), 7)
+        second = self.deliver(5)
+        self.assertEqual(issue_units(second, batch_size=2), 5)
+
+        serials = list(ProductUnit.objects.order_by('pk').values_list('serial_number', flat=True))
+        self.assertEqual(len(set(serials)), 12)
+        self.assertEqual([serial.rsplit('-', 1)[1] for serial in serials], [f'{n:08d}' for n in range(1, 13)])
+        self.assertEqual(serials[0], 'ST-1_50.00-00000001')
+        self.assertEqual(SerialCounter.objects.get(product=self.product).last_value, 12)
+        # Номер единицы, созданной поштучно, продолжает тот же счётчик
+        unit = ProductUnit.objects.create(product=self.product, delivery=second)
+        self.assertTrue(unit.serial_number.endswith('-00000013'))
+        self.assertEqual(self.stock(), (13, 0, 13))
 
-# Create your tests here.
+    def test_rows_match_model_defaults(self):
+        issue_units(self.delivery, 2)
+        unit = ProductUnit.objects.filter(delivery=self.delivery).first()
+        self.assertEqual((unit.product_id, unit.state), (self.product.pk, ProductUnit.State.RECEIVED))
+        self.assertIsNotNone(unit.created_at)
+        self.assertEqual(self.stock(), (2, 0, 2))